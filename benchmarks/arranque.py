@@ -0,0 +1,105 @@
+"""
+Mide el arranque en frío de prismov y prismov_gui con `python -X importtime`
+y lo compara con un presupuesto. También comprueba que las dependencias
+pesadas o de red no se cargan al importar (se importan al usarlas).
+
+Uso: python benchmarks/arranque.py [repeticiones]
+Devuelve un código de salida distinto de 0 si algún módulo se pasa del
+presupuesto o carga al arrancar algo que debería ser perezoso.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milisegundos de importación acumulada (el módulo y todo lo que importa).
+# Medido en Linux con QT_QPA_PLATFORM=offscreen: ~30 ms prismov y ~80 ms
+# prismov_gui (la mitad es PyQt5.QtWidgets); el presupuesto deja margen
+# para máquinas más lentas
+PRESUPUESTO_MS = {
+    "prismov": 150,
+    "prismov_gui": 250,
+}
+
+MODULOS_PEREZOSOS = ["requests", "reportlab", "webbrowser", "numpy", "supabase"]
+
+# Imprime los módulos perezosos que hayan acabado cargados tras el import
+COMPROBACION = (
+    "import sys, {modulo}; "
+    "print(','.join(m for m in {perezosos!r} if m in sys.modules))"
+)
+
+
+def medir_importacion(modulo, entorno):
+    """Devuelve (ms acumulados de `modulo`, [(ms, nombre)] más lentos, perezosos cargados)"""
+    codigo = COMPROBACION.format(modulo=modulo, perezosos=MODULOS_PEREZOSOS)
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=RAIZ, env=entorno, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1])
+
+    # importtime escribe los hijos antes que el padre; los módulos de primer
+    # nivel van sin sangría, así que el subárbol de `modulo` son las líneas
+    # entre el módulo de primer nivel anterior y el propio `modulo`
+    subarbol = []
+    total = None
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        if not acumulado.strip().isdigit():
+            continue  # Cabecera
+        primer_nivel = not nombre[1:].startswith(" ")
+        if primer_nivel and nombre.strip() == modulo:
+            total = int(acumulado) / 1000
+            break
+        if primer_nivel:
+            subarbol = []
+        else:
+            subarbol.append((int(acumulado) / 1000, nombre.strip()))
+
+    cargados = [m for m in resultado.stdout.strip().split(",") if m]
+    return total, sorted(subarbol, reverse=True)[:5], cargados
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    entorno = dict(os.environ)
+    entorno.setdefault("LOCALAPPDATA", tempfile.mkdtemp())
+    entorno.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    fallos = 0
+    for modulo, presupuesto in PRESUPUESTO_MS.items():
+        try:
+            mediciones = [medir_importacion(modulo, entorno) for _ in range(repeticiones)]
+        except RuntimeError as e:
+            print(f"{modulo}: no se puede importar en este entorno ({e})\n")
+            continue
+
+        # La primera ejecución incluye la compilación a .pyc: se toma la mediana
+        totales = sorted(m[0] for m in mediciones)
+        mediana = totales[len(totales) // 2]
+        _, lentos, cargados = mediciones[-1]
+
+        estado = "OK" if mediana <= presupuesto else "FUERA DE PRESUPUESTO"
+        print(f"{modulo}: {mediana:.1f} ms (presupuesto {presupuesto} ms) -> {estado}")
+        for ms, nombre in lentos:
+            print(f"    {ms:8.1f} ms  {nombre}")
+        if cargados:
+            print(f"    cargados al importar y deberían ser perezosos: {', '.join(cargados)}")
+        print()
+
+        if mediana > presupuesto or cargados:
+            fallos += 1
+
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
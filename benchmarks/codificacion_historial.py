@@ -0,0 +1,120 @@
+"""
+Compara el historial en el formato JSON antiguo (lista completa con indent=4)
+con el formato actual: una línea por snapshot y los procesos codificados en
+columnas con los nombres en una tabla compartida.
+
+Uso: python benchmarks/codificacion_historial.py [snapshots] [procesos_por_snapshot]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prismov
+
+
+NOMBRES_FRECUENTES = [
+    "svchost.exe", "chrome.exe", "RuntimeBroker.exe", "conhost.exe",
+    "msedge.exe", "explorer.exe", "dllhost.exe", "SearchHost.exe"
+]
+NOMBRES_RAROS = [f"aplicacion_{i}.exe" for i in range(150)]
+
+
+def generar_historial(n_snapshots, n_procesos):
+    random.seed(1234)
+    historial = []
+    for i in range(n_snapshots):
+        procesos = []
+        for pid in range(n_procesos):
+            if random.random() < 0.7:
+                nombre = random.choice(NOMBRES_FRECUENTES)
+            else:
+                nombre = random.choice(NOMBRES_RAROS)
+            procesos.append({
+                "pid": 1000 + pid,
+                "nombre": nombre,
+                "cpu": round(random.random() * 5, 2),
+                "ram_mb": round(random.random() * 300, 2)
+            })
+        historial.append({
+            "timestamp": f"2026-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+            "cpu_percent": round(random.random() * 100, 1),
+            "ram_percent": round(random.random() * 100, 1),
+            "procesos": procesos
+        })
+    return historial
+
+
+def medir(funcion, repeticiones=3):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, resultado
+
+
+def main():
+    n_snapshots = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_procesos = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    historial = generar_historial(n_snapshots, n_procesos)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Formato antiguo
+        ruta_antigua = os.path.join(tmp, "historial.json")
+        with open(ruta_antigua, "w", encoding="utf-8") as f:
+            json.dump(historial, f, indent=4, ensure_ascii=False)
+
+        def cargar_antiguo():
+            with open(ruta_antigua, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        # Una línea por snapshot, sin codificar
+        ruta_lineas = os.path.join(tmp, "lineas.jsonl")
+        with open(ruta_lineas, "w", encoding="utf-8") as f:
+            for snapshot in historial:
+                f.write(json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+        def cargar_lineas():
+            with open(ruta_lineas, "r", encoding="utf-8") as f:
+                return [json.loads(linea) for linea in f]
+
+        # Una línea por snapshot, codificada
+        ruta_tabla = os.path.join(tmp, "nombres.jsonl")
+        ruta_codificada = os.path.join(tmp, "codificado.jsonl")
+        tabla = prismov.TablaNombres(ruta_tabla)
+        with open(ruta_codificada, "w", encoding="utf-8") as f:
+            for snapshot in historial:
+                codificado = prismov.codificar_snapshot(snapshot, tabla)
+                f.write(json.dumps(codificado, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+        def cargar_codificado():
+            tabla_lectura = prismov.TablaNombres(ruta_tabla)
+            with open(ruta_codificada, "r", encoding="utf-8") as f:
+                return [prismov.decodificar_snapshot(json.loads(linea), tabla_lectura) for linea in f]
+
+        filas = [
+            ("JSON antiguo (indent=4)", os.path.getsize(ruta_antigua), cargar_antiguo),
+            ("JSON Lines sin codificar", os.path.getsize(ruta_lineas), cargar_lineas),
+            ("JSON Lines codificado", os.path.getsize(ruta_codificada) + os.path.getsize(ruta_tabla), cargar_codificado),
+        ]
+
+        print(f"{n_snapshots} snapshots x {n_procesos} procesos")
+        print(f"{'Formato':<28}{'Tamaño (MB)':>14}{'Carga (s)':>12}")
+        referencia = filas[0][1]
+        for nombre, tamano, cargar in filas:
+            duracion, cargado = medir(cargar)
+            if cargado != historial:
+                raise SystemExit(f"{nombre}: el historial cargado no coincide con el original")
+            print(f"{nombre:<28}{tamano / 1024 / 1024:>14.2f}{duracion:>12.3f}"
+                  f"   ({tamano / referencia:.0%} del tamaño antiguo)")
+
+
+if __name__ == "__main__":
+    main()
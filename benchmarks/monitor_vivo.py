@@ -0,0 +1,80 @@
+"""
+Mide el coste del monitor en vivo de la GUI: cuánto tarda una muestra de
+MonitorVivo, cuánto cuesta dibujar una muestra nueva desplazando el lienzo
+frente a redibujar el gráfico entero, y que la memoria no crece aunque se
+añadan muchas más muestras de las que caben en el buffer.
+
+Uso: python benchmarks/monitor_vivo.py [muestras]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOCALAPPDATA", tempfile.mkdtemp())
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import prismov
+
+POLITICA = {"refresco_ms": 1000, "capacidad": 600, "top_n": 5, "top_cada": 5}
+
+
+def medir(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    muestras = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    monitor = prismov.MonitorVivo(POLITICA)
+    t_muestra = medir(monitor.muestrear, 200)
+    print(f"Muestra (CPU + RAM, tabla de procesos cada {POLITICA['top_cada']}): {t_muestra * 1e3:8.3f} ms")
+
+    # Memoria del buffer: se llena una vez y se mide cuánto crece después
+    buffer = prismov.BufferCircular(POLITICA["capacidad"])
+    for i in range(POLITICA["capacidad"]):
+        buffer.agregar(float(i))
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    for i in range(muestras):
+        buffer.agregar(float(i % 100))
+    crecimiento = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(antes, "filename")
+                      if s.traceback[0].filename == prismov.__file__)
+    tracemalloc.stop()
+    print(f"Crecimiento del buffer tras {muestras} muestras más:      {crecimiento:8d} bytes")
+
+    try:
+        from PyQt5.QtWidgets import QApplication
+    except ImportError:
+        raise SystemExit("PyQt5 no está instalado: no se mide el dibujado")
+    import prismov_gui
+
+    app = QApplication(sys.argv)  # noqa: F841
+    valores = prismov.BufferCircular(POLITICA["capacidad"])
+    grafico = prismov_gui.GraficoVivo(
+        "CPU", "#4a90e2", lambda n, hasta: valores.ultimos(n, hasta)
+    )
+    grafico.resize(600, 120)
+    for i in range(POLITICA["capacidad"]):
+        valores.agregar(float(i % 100))
+    grafico.agregar([], valores.total)
+    grafico.reconstruir()
+
+    def una_muestra():
+        valores.agregar(float(valores.total % 100))
+        grafico.agregar([valores.ultimo()], valores.total)
+
+    t_incremental = medir(una_muestra, 2000)
+    t_completo = medir(grafico.reconstruir, 2000)
+    print(f"Dibujar una muestra nueva (desplazando el lienzo):      {t_incremental * 1e6:8.1f} µs")
+    print(f"Redibujar el gráfico completo ({grafico.muestras_visibles()} muestras):           {t_completo * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compara el motor de análisis de Python con el de NumPy sobre tablas de
+procesos sintéticas de 500, 5.000 y 50.000 procesos, y comprueba que los
+dos devuelven exactamente el mismo resultado.
+
+Uso: python benchmarks/motor_analisis.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prismov
+
+
+TAMANOS = [500, 5_000, 50_000]
+
+
+def generar_procesos(n):
+    random.seed(n)
+    procesos = []
+    for pid in range(n):
+        procesos.append({
+            "pid": pid,
+            "nombre": f"proceso_{pid % 97}.exe",
+            # Muchos valores repetidos para ejercitar los empates del ordenado
+            "cpu": round(random.choice([0.0, 0.0, 0.0, random.random() * 30]), 2),
+            "ram_mb": round(random.choice([0.0, 12.5, random.random() * 2000]), 2)
+        })
+    return procesos
+
+
+def medir(funcion, repeticiones=5):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, resultado
+
+
+def main():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        raise SystemExit("NumPy no está instalado: solo está disponible el motor de Python")
+
+    print(f"{'Procesos':>10}{'Python (ms)':>14}{'NumPy (ms)':>14}{'Aceleración':>14}")
+    for n in TAMANOS:
+        procesos = generar_procesos(n)
+        t_python, r_python = medir(lambda: prismov.estadisticas_procesos(procesos, motor="python"))
+        t_numpy, r_numpy = medir(lambda: prismov.estadisticas_procesos(procesos, motor="numpy"))
+
+        if r_python != r_numpy:
+            raise SystemExit(f"{n} procesos: los motores no dan el mismo resultado")
+
+        print(f"{n:>10}{t_python * 1000:>14.2f}{t_numpy * 1000:>14.2f}{t_python / t_numpy:>13.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Compara generar_reporte_html del árbol de trabajo con el de una revisión de
+git (por defecto HEAD) sobre el mismo snapshot: tiempo de generar el HTML,
+bytes en disco, tiempo de escribirlo y el total de generar y escribir cada
+reporte. La versión de la revisión se saca con `git show`, sin copiarla.
+
+Uso: python benchmarks/reportes.py [procesos_por_tabla] [revisión]
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ.setdefault("LOCALAPPDATA", tempfile.mkdtemp())
+
+import prismov
+
+
+def generar_snapshot(n):
+    analisis = {
+        "tendencias": {
+            "cpu": "estable",
+            "ram": "aumentando",
+            "procesos_crecientes": [
+                {"nombre": f"proceso_{i}.exe", "ram_anterior": 100.0 + i, "ram_actual": 180.5 + i, "mb_hora": 42.0}
+                for i in range(n)
+            ]
+        },
+        "sospechosos_persistentes": [
+            {"nombre": f"<sospechoso_{i}>.exe", "ram_mb": 1500.25, "cpu": 35.5, "razon": "Uso alto de RAM & CPU"}
+            for i in range(n)
+        ],
+        "huella_del_sistema": {
+            "cpu_promedio": 12.5, "ram_promedio": 48.3, "cpu_desviacion": 3.1, "ram_desviacion": 1.2,
+            "procesos_frecuentes": [f"frecuente_{i}.exe" for i in range(5)]
+        },
+        "cambios_procesos": {
+            "parcial": False, "iniciados": 3, "terminados": 1, "cambiados": 12,
+            "mayores_cambios_por_nombre": [
+                {"nombre": f"programa_{i}.exe", "delta_instancias": 1, "delta_ram_mb": 25.0} for i in range(5)
+            ]
+        },
+        "score_detallado": {"riesgo_sistema": "MEDIO"},
+        "resumen_historico": {
+            clave: {
+                "cpu_percent": {"avg": 12.0, "p95": 40.0, "max": 88.0},
+                "ram_percent": {"avg": 50.0, "p95": 61.0, "max": 70.0},
+                "muestras": 288
+            }
+            for clave in ("24h", "7d", "30d")
+        },
+        "recomendaciones": ["Revisar los procesos con consumo elevado"] * 4
+    }
+    return {
+        "timestamp": "2026-01-01 12:00:00",
+        "cpu_percent": 23.4,
+        "ram_percent": 51.2,
+        "procesos": [{}] * 35,
+        "otros_procesos": {"cantidad": 250},
+        "analisis_avanzado": analisis
+    }
+
+
+def cargar_revision(revision, destino):
+    """Importa prismov.py tal como está en `revision` con otro nombre de módulo"""
+    fuente = subprocess.run(
+        ["git", "show", f"{revision}:prismov.py"], cwd=RAIZ, capture_output=True, check=True
+    ).stdout
+    ruta = os.path.join(destino, "prismov_revision.py")
+    with open(ruta, "wb") as f:
+        f.write(fuente)
+    spec = importlib.util.spec_from_file_location("prismov_revision", ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def medir_alternando(funciones, repeticiones, rondas=21):
+    """
+    Mejor tiempo por llamada de cada función. Las funciones se alternan en
+    cada ronda para que el ruido de la máquina afecte a todas por igual.
+    """
+    mejores = [None] * len(funciones)
+    for _ in range(rondas):
+        for i, funcion in enumerate(funciones):
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                funcion()
+            duracion = (time.perf_counter() - inicio) / repeticiones
+            mejores[i] = duracion if mejores[i] is None else min(mejores[i], duracion)
+    return mejores
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    revision = sys.argv[2] if len(sys.argv) > 2 else "HEAD"
+    snapshot = generar_snapshot(n)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generar_revision = cargar_revision(revision, tmp).generar_reporte_html
+        anterior = generar_revision(snapshot)
+        actual = prismov.generar_reporte_html(snapshot)
+        ruta = os.path.join(tmp, "reporte.html")
+
+        def escribir(contenido):
+            with open(ruta, "w", encoding="utf-8") as f:
+                f.write(contenido)
+
+        renderizadores = [
+            (revision, generar_revision, anterior),
+            ("Árbol de trabajo", prismov.generar_reporte_html, actual),
+        ]
+        t_generar = medir_alternando([lambda g=g: g(snapshot) for _, g, _ in renderizadores], 500)
+        t_escribir = medir_alternando([lambda c=c: escribir(c) for _, _, c in renderizadores], 200)
+        t_total = medir_alternando([lambda g=g: escribir(g(snapshot)) for _, g, _ in renderizadores], 200)
+
+        filas = [
+            (nombre, t_generar[i], len(contenido.encode()), t_escribir[i], t_total[i])
+            for i, (nombre, _, contenido) in enumerate(renderizadores)
+        ]
+
+    print(f"{n} filas por tabla")
+    print(f"{'':<42}{'Generar (µs)':>14}{'Bytes':>9}{'Escribir (µs)':>15}{'Total (µs)':>12}")
+    for nombre, t_generar, tamano, t_escribir, t_total in filas:
+        print(f"{nombre:<42}{t_generar * 1e6:>14.1f}{tamano:>9}{t_escribir * 1e6:>15.1f}{t_total * 1e6:>12.1f}")
+
+    (_, g0, b0, _, t0), (_, g1, b1, _, t1) = filas
+    print(f"\nGenerar: {g0 / g1:.2f}x   Bytes: {b1 / b0:.0%}   Total: {t0 / t1:.2f}x  (>1x = actual más rápido)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,24 @@ import psutil
 import time
 import json
 import os
+import copy
+import functools
 import datetime
-import requests
+import heapq
+import itertools
+import bisect
+import math
+import operator
 import random
 import string
-import webbrowser
+import threading
+import queue
 import io
-from reportlab.platypus import Paragraph, SimpleDocTemplate
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-from reportlab.pdfbase import pdfmetrics
+import gzip
+import shutil
+import tempfile
+import html
+import re
 
 
 
@@ -25,379 +33,2754 @@ os.makedirs(DATA_DIR, exist_ok=True)
 HISTORIAL_PATH = os.path.join(DATA_DIR, "historial.json")
 CONFIG_PATH = os.path.join(DATA_DIR, "config.json")
 
+# Almacén de historial de solo-añadir: un snapshot por línea (JSON Lines),
+# repartido en segmentos que rotan al alcanzar un tamaño máximo.
+HISTORIAL_DIR = os.path.join(DATA_DIR, "historial")
+os.makedirs(HISTORIAL_DIR, exist_ok=True)
+
+HISTORIAL_SEGMENTO_MAX_BYTES = 8 * 1024 * 1024
+
+# Tabla compartida de nombres de proceso (un nombre por línea, id = nº de línea)
+NOMBRES_PATH = os.path.join(HISTORIAL_DIR, "nombres.jsonl")
+
+FORMATO_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+
+# Agregados por minuto, hora y día. Cada nivel: (longitud de la clave del cubo
+# dentro del timestamp, longitud de la clave del archivo de partición).
+AGREGADOS_DIR = os.path.join(HISTORIAL_DIR, "agregados")
+AGREGADOS_ABIERTOS_PATH = os.path.join(AGREGADOS_DIR, "abiertos.json")
+
+# Diario de solo-añadir con lo sumado a los cubos abiertos desde que se
+# guardó abiertos.json; este se reescribe solo cada tantas líneas
+AGREGADOS_DIARIO_PATH = os.path.join(AGREGADOS_DIR, "abiertos.diario.jsonl")
+AGREGADOS_DIARIO_MAX_LINEAS = 64
+
+NIVELES_AGREGADOS = {
+    "minuto": (16, 10),  # cubos "AAAA-MM-DD HH:MM", un archivo por día
+    "hora": (13, 7),     # cubos "AAAA-MM-DD HH", un archivo por mes
+    "dia": (10, 4),      # cubos "AAAA-MM-DD", un archivo por año
+}
+
+for _nivel in NIVELES_AGREGADOS:
+    os.makedirs(os.path.join(AGREGADOS_DIR, _nivel), exist_ok=True)
+
+TOP_PROCESOS_AGREGADOS = 5
+
 # ============================================================
 # CARGA Y GUARDADO DE HISTORIAL
 # ============================================================
 
-def cargar_historial():
-    if not os.path.exists(HISTORIAL_PATH):
-        return []
-    try:
-        with open(HISTORIAL_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data if isinstance(data, list) else []
-    except:
-        return []
+_historial_lock = threading.RLock()
 
-def guardar_historial(historial):
-    with open(HISTORIAL_PATH, "w", encoding="utf-8") as f:
-        json.dump(historial, f, indent=4, ensure_ascii=False)
+# Timestamp del último snapshot persistido (None = aún no leído del disco) y
+# cuántos de los últimos snapshots guardados comparten ese timestamp
+_ultimo_timestamp_guardado = None
+_ultimos_iguales_guardados = 0
 
-# ============================================================
-# CARGA Y GUARDADO DE CONFIGURACIÓN
-# ============================================================
 
-def cargar_config():
-    default_config = {
-        "chat_id": None,
-        "programacion": {},
-        "supabase_activo": False
-    }
+def _segmentos_historial():
+    """Devuelve las rutas de los segmentos del historial, del más antiguo al más reciente"""
+    nombres = [
+        n for n in os.listdir(HISTORIAL_DIR)
+        if n.startswith("segmento_") and n.endswith(".jsonl")
+    ]
+    return [os.path.join(HISTORIAL_DIR, n) for n in sorted(nombres)]
 
-    try:
-        if not os.path.exists(CONFIG_PATH):
-            return default_config
 
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            contenido = f.read().strip()
+def _ruta_segmento(numero):
+    return os.path.join(HISTORIAL_DIR, f"segmento_{numero:06d}.jsonl")
 
-            if not contenido:
-                return default_config
 
-            data = json.loads(contenido)
+def _numero_segmento(ruta):
+    return int(os.path.basename(ruta)[len("segmento_"):-len(".jsonl")])
 
-            # Asegurar campos mínimos
-            for k, v in default_config.items():
-                if k not in data:
-                    data[k] = v
 
-            return data
+def _leer_segmento(ruta):
+    """Lee los snapshots de un segmento, ignorando líneas corruptas (p. ej. una escritura cortada)"""
+    snapshots = []
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    snapshots.append(json.loads(linea))
+                except ValueError:
+                    pass
+    except OSError:
+        pass
+    return snapshots
 
-    except:
-        return default_config
 
-def guardar_config(config):
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(config, f, indent=4, ensure_ascii=False)
+def _leer_hacia_atras(ruta, bloque=64 * 1024):
+    """Genera los registros de un archivo JSON Lines desde el final, leyendo por bloques"""
+    try:
+        with open(ruta, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            posicion = f.tell()
+            resto = b""
 
+            while posicion > 0:
+                leer = min(bloque, posicion)
+                posicion -= leer
+                f.seek(posicion)
+                lineas = (f.read(leer) + resto).split(b"\n")
 
-def cargar_programacion():
-    config = cargar_config()
-    prog = config.get("programacion", {})
+                # La primera línea del bloque puede estar cortada: se completa en la siguiente vuelta
+                resto = lineas[0]
+                for linea in reversed(lineas[1:]):
+                    registro = _decodificar_linea(linea)
+                    if registro is not None:
+                        yield registro
 
-    # Valores por defecto si no existen
-    return {
-        "activo": prog.get("activo", False),
-        "dias": prog.get("dias", []),
-        "hora_inicio": prog.get("hora_inicio", "00:00"),
-        "hora_fin": prog.get("hora_fin", "23:59"),
-        "intervalo_minutos": prog.get("intervalo_minutos", 60)
-    }
+            registro = _decodificar_linea(resto)
+            if registro is not None:
+                yield registro
+    except OSError:
+        return
 
-def guardar_programacion(nueva_prog):
-    config = cargar_config()
-    config["programacion"] = nueva_prog
-    guardar_config(config)
 
-# ============================================================
-# CÓDIGO DE VINCULACIÓN DE USUARIOS
-# ============================================================
+def _decodificar_linea(linea):
+    if not linea.strip():
+        return None
+    try:
+        return json.loads(linea)
+    except ValueError:
+        return None
 
-def generar_codigo_vinculacion():
-    """Genera un código aleatorio de 6 caracteres para vincular usuarios"""
-    caracteres = string.ascii_uppercase + string.digits
-    codigo = ''.join(random.choices(caracteres, k=6))
-    return codigo
 
-def cargar_codigo_vinculacion():
-    """Carga el código de vinculación actual"""
-    config = cargar_config()
-    codigo = config.get("codigo_vinculacion")
-    
-    # Si no hay código, generar uno nuevo
-    if not codigo:
-        codigo = generar_codigo_vinculacion()
-        config["codigo_vinculacion"] = codigo
-        guardar_config(config)
-    
-    return codigo
+def _leer_ultimo_registro(ruta):
+    """Lee solo el final del archivo para devolver su último registro JSON válido"""
+    return next(_leer_hacia_atras(ruta), None)
 
-def generar_nuevo_codigo():
-    """Genera un nuevo código de vinculación"""
-    codigo = generar_codigo_vinculacion()
-    config = cargar_config()
-    config["codigo_vinculacion"] = codigo
-    guardar_config(config)
-    return codigo
 
-def configurar_programacion_consola():
-    print("\n=== CONFIGURAR PROGRAMACIÓN ===")
+def _segmento_para_escribir():
+    """Devuelve el segmento activo, rotando a uno nuevo si el actual está lleno"""
+    segmentos = _segmentos_historial()
+    if not segmentos:
+        return _ruta_segmento(1)
 
-    dias_validos = ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]
+    actual = segmentos[-1]
+    if os.path.getsize(actual) >= HISTORIAL_SEGMENTO_MAX_BYTES:
+        return _ruta_segmento(_numero_segmento(actual) + 1)
+    return actual
 
-    print("Introduce los días separados por comas (ej: lunes,martes,viernes):")
-    dias = input("Días: ").lower().replace(" ", "").split(",")
-    dias = [d for d in dias if d in dias_validos]
 
-    hora_inicio = input("Hora inicio (HH:MM): ")
-    hora_fin = input("Hora fin (HH:MM): ")
+def _migrar_historial_antiguo():
+    """
+    Importa el historial.json completo de versiones anteriores al almacén
+    segmentado. Se hace en bloque: los segmentos se escriben de corrido y los
+    agregados se calculan en memoria y se guardan una sola vez al final, en
+    lugar de pasar cada snapshot por agregar_snapshot.
+    """
+    global _agregados_abiertos, _secuencia_agregados, _lineas_diario_agregados
+    global _ultimo_timestamp_guardado, _ultimos_iguales_guardados
 
-    intervalo = int(input("Intervalo en minutos: "))
+    with _historial_lock:
+        if not os.path.exists(HISTORIAL_PATH) or _segmentos_historial():
+            return
 
-    nueva = {
-        "activo": True,
-        "dias": dias,
-        "hora_inicio": hora_inicio,
-        "hora_fin": hora_fin,
-        "intervalo_minutos": intervalo
-    }
+        try:
+            with open(HISTORIAL_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
 
-    guardar_programacion(nueva)
-    print("✔ Programación guardada correctamente.")
+        if isinstance(data, list) and data:
+            tabla = _obtener_tabla_nombres()
+            abiertos = {}
+            cerrados = {}
 
-# ============================================================
-# TELEGRAM
-# ============================================================
+            numero, escritos = 1, 0
+            f = open(_ruta_segmento(numero), "w", encoding="utf-8")
+            try:
+                for snapshot in data:
+                    if not isinstance(snapshot, dict):
+                        continue
+                    linea = json.dumps(codificar_snapshot(snapshot, tabla), ensure_ascii=False, separators=(",", ":")) + "\n"
+                    if escritos >= HISTORIAL_SEGMENTO_MAX_BYTES:
+                        f.close()
+                        numero, escritos = numero + 1, 0
+                        f = open(_ruta_segmento(numero), "w", encoding="utf-8")
+                    f.write(linea)
+                    escritos += len(linea.encode("utf-8"))
+                    _sumar_a_cubos(abiertos, _registro_agregados(snapshot), cerrados)
+            finally:
+                f.close()
 
-TELEGRAM_TOKEN = ""
+            for ruta, lineas in cerrados.items():
+                with open(ruta, "a", encoding="utf-8") as destino:
+                    destino.write("".join(lineas))
+            _agregados_abiertos = abiertos
+            _secuencia_agregados = 0
+            _lineas_diario_agregados = 0
+            _guardar_agregados_abiertos()
 
-def cargar_chat_id():
-    return cargar_config().get("chat_id")
+            # El índice se reconstruye de una vez a partir de los segmentos nuevos
+            _cargar_indice()
+            _ultimo_timestamp_guardado = None
+            _ultimos_iguales_guardados = 0
 
-def guardar_chat_id(chat_id):
-    config = cargar_config()
-    config["chat_id"] = chat_id
-    guardar_config(config)
+        os.replace(HISTORIAL_PATH, HISTORIAL_PATH + ".migrado")
 
-def telegram_configurado():
-    """Verifica si Telegram está configurado"""
-    return cargar_chat_id() is not None
 
+def _escribir_snapshot(snapshot):
+    snapshot = codificar_snapshot(snapshot, _obtener_tabla_nombres())
+    linea = json.dumps(snapshot, ensure_ascii=False, separators=(",", ":"))
+    ruta = _segmento_para_escribir()
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write(linea + "\n")
+    _actualizar_indice(ruta, snapshot.get("timestamp", ""))
 
-def borrar_chat_id():
-    """Elimina el chat_id almacenado (cierra sesión de Telegram)"""
-    config = cargar_config()
-    config["chat_id"] = None
-    guardar_config(config)
 
-def obtener_chat_id_y_validar_codigo():
+def _obtener_ultimo_timestamp():
     """
-    Obtiene el chat_id pero verificando que el último mensaje contenga el código de vinculación correcto
-    Retorna: (chat_id, código_valido) o (None, False)
+    Devuelve (timestamp del último snapshot guardado, cuántos snapshots
+    seguidos al final del historial tienen ese mismo timestamp). Los
+    timestamps van por segundos, así que dos análisis pueden compartirlo.
     """
-    codigo_esperado = cargar_codigo_vinculacion()
-    
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getUpdates"
-        r = requests.get(url).json()
-        
-        if "result" in r and len(r["result"]) > 0:
-            ultimo_mensaje = r["result"][-1].get("message", {})
-            texto_mensaje = ultimo_mensaje.get("text", "").upper()
-            chat_id = ultimo_mensaje.get("chat", {}).get("id")
-            
-            # Verificar si el mensaje contiene el código
-            if codigo_esperado in texto_mensaje:
-                return chat_id, True
+    global _ultimo_timestamp_guardado, _ultimos_iguales_guardados
+
+    if _ultimo_timestamp_guardado is None:
+        _ultimo_timestamp_guardado = ""
+        _ultimos_iguales_guardados = 0
+        for ruta in reversed(_segmentos_historial()):
+            for registro in _leer_hacia_atras(ruta):
+                timestamp = registro.get("timestamp", "")
+                if _ultimos_iguales_guardados and timestamp != _ultimo_timestamp_guardado:
+                    break
+                _ultimo_timestamp_guardado = timestamp
+                _ultimos_iguales_guardados += 1
             else:
-                return None, False
-        
-        return None, False
-    except:
-        return None, False
+                continue
+            break
+    return _ultimo_timestamp_guardado, _ultimos_iguales_guardados
 
-def obtener_chat_id():
-    """Obtiene solo el chat_id del último mensaje"""
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getUpdates"
-        r = requests.get(url).json()
-        if "result" in r and len(r["result"]) > 0:
-            return r["result"][-1]["message"]["chat"]["id"]
-        return None
-    except:
-        return None
 
-def enviar_telegram(mensaje):
-    chat_id = cargar_chat_id()
-    if not chat_id:
-        return
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        data = {"chat_id": chat_id, "text": mensaje, "parse_mode": "Markdown"}
-        requests.post(url, data=data)
-    except:
-        pass
+def cargar_historial():
+    """Carga todos los snapshots guardados, del más antiguo al más reciente"""
+    with _historial_lock:
+        _migrar_historial_antiguo()
+
+        tabla = _obtener_tabla_nombres()
+        historial = []
+        for ruta in _segmentos_historial():
+            for snapshot in _leer_segmento(ruta):
+                historial.append(decodificar_snapshot(snapshot, tabla))
+        return historial
+
+
+def agregar_snapshot(snapshot):
+    """Añade un snapshot al final del historial sin reescribir los anteriores"""
+    global _ultimo_timestamp_guardado, _ultimos_iguales_guardados
+
+    with _historial_lock:
+        _migrar_historial_antiguo()
+        ultimo, iguales = _obtener_ultimo_timestamp()
+        _escribir_snapshot(snapshot)
+        _acumular_agregados(snapshot)
+
+        timestamp = snapshot.get("timestamp", "")
+        _ultimos_iguales_guardados = iguales + 1 if timestamp == ultimo else 1
+        _ultimo_timestamp_guardado = timestamp
+
+
+def guardar_historial(historial):
+    """
+    Persiste los snapshots de `historial` que aún no están guardados.
+    El historial es de solo-añadir: solo se escriben los snapshots posteriores
+    al último guardado, recorriendo la lista desde el final. De los que
+    comparten segundo con el último guardado se saltan los que ya están en
+    disco y se guardan los demás.
+    """
+    with _historial_lock:
+        _migrar_historial_antiguo()
+        ultimo, iguales = _obtener_ultimo_timestamp()
+
+        nuevos = []
+        mismo_segundo = []
+        for snapshot in reversed(historial):
+            timestamp = snapshot.get("timestamp", "")
+            if timestamp < ultimo:
+                break
+            (mismo_segundo if timestamp == ultimo else nuevos).append(snapshot)
+
+        pendientes = mismo_segundo[::-1][iguales:] + nuevos[::-1]
+        for snapshot in pendientes:
+            agregar_snapshot(snapshot)
+
+def _escribir_json_atomico(ruta, data):
+    """Escribe un JSON pequeño de estado sin dejar el archivo a medias si se corta"""
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temporal, ruta)
 
 # ============================================================
-# ANÁLISIS DEL SISTEMA
+# CODIFICACIÓN COMPACTA DE SNAPSHOTS
 # ============================================================
 
-def analizar_procesos():
-    procesos = []
-    for p in psutil.process_iter(["pid", "name", "cpu_percent", "memory_info"]):
+class TablaNombres:
+    """
+    Diccionario de nombres de proceso compartido por todo el historial.
+    El archivo es de solo-añadir y el id de cada nombre es su número de línea,
+    así que los ids ya escritos no cambian nunca.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.nombres = []
+        self.ids = {}
+        self._bytes_leidos = 0
+        self._recargar()
+
+    def _recargar(self):
+        """Lee solo los nombres añadidos desde la última lectura (también por otros procesos)"""
         try:
-            info = p.info
-            procesos.append({
-                "pid": info["pid"],
-                "nombre": info["name"],
-                "cpu": round(info["cpu_percent"], 2),
-                "ram_mb": round(info["memory_info"].rss / (1024 * 1024), 2)
-            })
-        except:
+            with open(self.ruta, "rb") as f:
+                f.seek(self._bytes_leidos)
+                for linea in f:
+                    if not linea.endswith(b"\n"):
+                        break  # Escritura a medias: se leerá cuando esté completa
+                    self._bytes_leidos += len(linea)
+                    nombre = json.loads(linea)
+                    self.ids.setdefault(nombre, len(self.nombres))
+                    self.nombres.append(nombre)
+        except OSError:
             pass
-    return sorted(procesos, key=lambda x: x["ram_mb"], reverse=True)
 
-def analizar_tendencias(historial):
-    """Analiza tendencias en el historial"""
-    if len(historial) < 2:
-        return "Datos insuficientes", "Datos insuficientes", []
-    
-    # Comparar últimos dos registros
-    ultimo = historial[-1]
-    anterior = historial[-2]
-    
-    cpu_actual = ultimo["cpu_percent"]
-    cpu_anterior = anterior["cpu_percent"]
-    ram_actual = ultimo["ram_percent"]
-    ram_anterior = anterior["ram_percent"]
-    
-    # Determinar tendencia de CPU
-    if cpu_actual > cpu_anterior + 10:
-        tendencia_cpu = "↑ Creciente"
-    elif cpu_actual < cpu_anterior - 10:
-        tendencia_cpu = "↓ Decreciente"
-    else:
-        tendencia_cpu = "→ Estable"
-    
-    # Determinar tendencia de RAM
-    if ram_actual > ram_anterior + 5:
-        tendencia_ram = "↑ Creciente"
-    elif ram_actual < ram_anterior - 5:
-        tendencia_ram = "↓ Decreciente"
-    else:
-        tendencia_ram = "→ Estable"
-    
-    # Detectar procesos con consumo creciente
-    procesos_crecientes = []
-    procesos_actuales = {p["nombre"]: p for p in ultimo["procesos"]}
-    procesos_anteriores = {p["nombre"]: p for p in anterior["procesos"]}
-    
-    for nombre, proc_actual in procesos_actuales.items():
-        if nombre in procesos_anteriores:
-            proc_anterior = procesos_anteriores[nombre]
-            if proc_actual["ram_mb"] > proc_anterior["ram_mb"] + 50:  # Más de 50MB de aumento
-                procesos_crecientes.append({
-                    "nombre": nombre,
-                    "ram_anterior": proc_anterior["ram_mb"],
-                    "ram_actual": proc_actual["ram_mb"]
-                })
-    
-    return tendencia_cpu, tendencia_ram, procesos_crecientes
+    def ids_de(self, nombres):
+        """Devuelve el id de cada nombre, dando de alta los que no existan en una sola escritura"""
+        nuevos = [n for n in dict.fromkeys(nombres) if n not in self.ids]
+        if nuevos:
+            self._recargar()
+            nuevos = [n for n in nuevos if n not in self.ids]
+        if nuevos:
+            bloque = "".join(json.dumps(n, ensure_ascii=False) + "\n" for n in nuevos)
+            with open(self.ruta, "a", encoding="utf-8") as f:
+                f.write(bloque)
+            self._recargar()
+        return [self.ids[n] for n in nombres]
 
-def detectar_procesos_sospechosos(procesos):
-    """Detecta procesos que consumen recursos anormales"""
-    sospechosos = []
-    
-    # Obtener estadísticas
+    def nombres_de(self, ids):
+        if ids and max(ids) >= len(self.nombres):
+            self._recargar()
+        nombres = self.nombres
+        return [nombres[i] for i in ids]
+
+
+_tabla_nombres = None
+
+
+def _obtener_tabla_nombres():
+    global _tabla_nombres
+    if _tabla_nombres is None:
+        _tabla_nombres = TablaNombres(NOMBRES_PATH)
+    return _tabla_nombres
+
+
+def codificar_procesos(procesos, tabla):
+    """
+    Pasa la lista de dicts de procesos a columnas paralelas, con los nombres
+    sustituidos por su id en `tabla`. Si las filas no tienen todas las mismas
+    claves en el mismo orden se deja la lista tal cual.
+    """
     if not procesos:
-        return sospechosos
-    
-    # Procesos procesados
-    procesos_con_recursos = [p for p in procesos if p["ram_mb"] > 0 or p["cpu"] > 0]
-    
-    if not procesos_con_recursos:
-        return sospechosos
-    
-    ram_values = [p["ram_mb"] for p in procesos_con_recursos]
-    ram_promedio = sum(ram_values) / len(ram_values)
-    ram_desv = (sum((x - ram_promedio) ** 2 for x in ram_values) / len(ram_values)) ** 0.5
-    
-    cpu_values = [p["cpu"] for p in procesos_con_recursos if p["cpu"] > 0]
-    cpu_promedio = sum(cpu_values) / len(cpu_values) if cpu_values else 0
-    
-    # Procesos que consumen >30% del RAM promedio o >5% CPU
-    for proc in procesos_con_recursos:
-        razon_ram = proc["ram_mb"] / ram_promedio if ram_promedio > 0 else 0
-        
-        if (proc["ram_mb"] > 500 and razon_ram > 2) or proc["cpu"] > 10:
-            sospechosos.append({
-                "nombre": proc["nombre"],
-                "ram_mb": proc["ram_mb"],
-                "cpu": proc["cpu"],
-                "razon": f"Alto consumo de {'RAM' if proc['ram_mb'] > 500 else 'CPU'}"
-            })
-    
-    return sorted(sospechosos, key=lambda x: x["ram_mb"], reverse=True)
+        return procesos
 
-def analisis_avanzado(snapshot, historial):
-    """Análisis avanzado y preciso del sistema"""
-    tendencia_cpu, tendencia_ram, procesos_crecientes = analizar_tendencias(historial)
-    sospechosos = detectar_procesos_sospechosos(snapshot["procesos"])
-    
-    # Procesos frecuentes (top 5 por RAM)
-    procesos_frecuentes = [p["nombre"] for p in snapshot["procesos"][:5]]
-    
-    # Calcular promedios históricos
-    if len(historial) > 1:
-        cpu_promedio = sum(s["cpu_percent"] for s in historial[-10:]) / min(10, len(historial))
-        ram_promedio = sum(s["ram_percent"] for s in historial[-10:]) / min(10, len(historial))
-    else:
-        cpu_promedio = snapshot["cpu_percent"]
-        ram_promedio = snapshot["ram_percent"]
-    
-    # Determinar riesgo
-    riesgo = "BAJO"
-    if len(sospechosos) > 3:
-        riesgo = "ALTO"
-    elif len(sospechosos) > 0:
-        riesgo = "MEDIO"
-    elif snapshot["cpu_percent"] > 80 or snapshot["ram_percent"] > 85:
-        riesgo = "MEDIO"
-    
-    # Recomendaciones
-    recomendaciones = []
-    if snapshot["cpu_percent"] > 80:
-        recomendaciones.append("CPU muy alta. Considera cerrar aplicaciones innecesarias.")
-    if snapshot["ram_percent"] > 85:
-        recomendaciones.append("RAM muy alta. Reinicia el sistema si es posible.")
-    if len(sospechosos) > 0:
-        recomendaciones.append(f"Detectados {len(sospechosos)} proceso(s) con alto consumo de recursos.")
-    if not recomendaciones:
-        recomendaciones.append("El sistema funciona correctamente.")
-    
-    return {
-        "tendencias": {
-            "cpu": tendencia_cpu,
-            "ram": tendencia_ram,
-            "procesos_crecientes": procesos_crecientes
-        },
-        "sospechosos_persistentes": sospechosos,
-        "huella_del_sistema": {
-            "cpu_promedio": round(cpu_promedio, 2),
-            "ram_promedio": round(ram_promedio, 2),
-            "procesos_frecuentes": procesos_frecuentes,
-            "procesos_pesados_constantes": [p["nombre"] for p in snapshot["procesos"][:3]]
-        },
-        "procesos_nuevos": [p["nombre"] for p in snapshot["procesos"][:3]],
-        "score_detallado": {
-            "riesgo_sistema": riesgo
-        },
-        "recomendaciones": recomendaciones
-    }
+    columnas = list(procesos[0])
+    if "nombre" not in columnas or any(list(p) != columnas for p in procesos):
+        return procesos
+
+    codificado = {"columnas": columnas}
+    for columna in columnas:
+        if columna == "nombre":
+            codificado[columna] = tabla.ids_de([p["nombre"] for p in procesos])
+        else:
+            codificado[columna] = [p[columna] for p in procesos]
+    return codificado
+
+
+def decodificar_procesos(procesos, tabla):
+    """Inverso de codificar_procesos; las listas sin codificar se devuelven igual"""
+    if not isinstance(procesos, dict):
+        return procesos
+
+    columnas = procesos["columnas"]
+    valores = [
+        tabla.nombres_de(procesos[c]) if c == "nombre" else procesos[c]
+        for c in columnas
+    ]
+    return [dict(zip(columnas, fila)) for fila in zip(*valores)]
+
+
+def codificar_snapshot(snapshot, tabla):
+    if "procesos" not in snapshot:
+        return snapshot
+    return dict(snapshot, procesos=codificar_procesos(snapshot["procesos"], tabla))
+
+
+def decodificar_snapshot(snapshot, tabla):
+    if not isinstance(snapshot.get("procesos"), dict):
+        return snapshot
+    return dict(snapshot, procesos=decodificar_procesos(snapshot["procesos"], tabla))
 
 # ============================================================
-# GENERAR REPORTES HTML
+# LECTURA PEREZOSA DEL HISTORIAL
 # ============================================================
 
-REPORTES_DIR = os.path.join(DATA_DIR, "reportes")
-os.makedirs(REPORTES_DIR, exist_ok=True)
+HISTORIAL_INDICE_PATH = os.path.join(HISTORIAL_DIR, "indice.json")
 
-def generar_reporte_html(snapshot):
-    """Genera un reporte HTML detallado y atractivo"""
-    a = snapshot["analisis_avanzado"]
-    timestamp = snapshot["timestamp"]
-    
-    # Determinar color según riesgo
+# Índice por segmento: {nombre: {"desde", "hasta", "bytes"}}, cacheado en memoria
+_indice_historial = None
+
+
+def _entrada_indice(ruta):
+    """Reconstruye la entrada del índice de un segmento leyendo solo su primera y última línea"""
+    primero = None
+    try:
+        with open(ruta, "rb") as f:
+            primero = _decodificar_linea(f.readline())
+    except OSError:
+        pass
+    ultimo = _leer_ultimo_registro(ruta)
+
+    return {
+        "desde": (primero or {}).get("timestamp", ""),
+        "hasta": (ultimo or {}).get("timestamp", ""),
+        "bytes": os.path.getsize(ruta)
+    }
+
+
+def _cargar_indice():
+    """Devuelve el índice de segmentos, corrigiendo las entradas que no cuadran con el disco"""
+    global _indice_historial
+
+    with _historial_lock:
+        if _indice_historial is None:
+            try:
+                with open(HISTORIAL_INDICE_PATH, "r", encoding="utf-8") as f:
+                    _indice_historial = json.load(f)
+            except (OSError, ValueError):
+                _indice_historial = {}
+
+        segmentos = {os.path.basename(r): r for r in _segmentos_historial()}
+        cambiado = False
+
+        for nombre in list(_indice_historial):
+            if nombre not in segmentos:
+                del _indice_historial[nombre]
+                cambiado = True
+
+        for nombre, ruta in segmentos.items():
+            entrada = _indice_historial.get(nombre)
+            if entrada is None or entrada["bytes"] != os.path.getsize(ruta):
+                _indice_historial[nombre] = _entrada_indice(ruta)
+                cambiado = True
+
+        if cambiado:
+            _escribir_json_atomico(HISTORIAL_INDICE_PATH, _indice_historial)
+        return _indice_historial
+
+
+def _actualizar_indice(ruta, timestamp):
+    nombre = os.path.basename(ruta)
+    with _historial_lock:
+        indice = _cargar_indice()
+        entrada = indice.setdefault(nombre, {"desde": timestamp, "hasta": timestamp, "bytes": 0})
+        entrada["hasta"] = timestamp
+        entrada["bytes"] = os.path.getsize(ruta)
+        _escribir_json_atomico(HISTORIAL_INDICE_PATH, indice)
+
+
+def _buscar_offset(f, desde, tamano):
+    """
+    Búsqueda binaria por bytes dentro de un segmento ordenado por timestamp.
+    Devuelve un offset de inicio de línea anterior o igual a la primera línea
+    con timestamp >= `desde`.
+    """
+    bajo, alto = 0, tamano
+    while bajo < alto:
+        medio = (bajo + alto) // 2
+        f.seek(medio)
+        if medio > 0:
+            f.readline()  # Saltar la línea cortada y alinearse al inicio de la siguiente
+        linea = f.readline()
+        registro = _decodificar_linea(linea)
+
+        if not linea or (registro is not None and registro.get("timestamp", "") >= desde):
+            alto = medio
+        else:
+            bajo = f.tell()
+    return bajo
+
+
+class LectorHistorial:
+    """
+    Acceso al historial sin cargarlo entero en memoria. Usa el índice de
+    segmentos para saltar directamente a los que contienen el rango pedido
+    y lee cada segmento por bloques, hacia atrás (ultimos) o desde un offset
+    encontrado por búsqueda binaria (rango).
+    """
+
+    def _segmentos(self):
+        # Una instalación actualizada puede tener aún el historial.json antiguo:
+        # se importa antes de listar segmentos para que ninguna lectura lo vea vacío
+        _migrar_historial_antiguo()
+        indice = _cargar_indice()
+        return [(r, indice[os.path.basename(r)]) for r in _segmentos_historial()
+                if os.path.basename(r) in indice]
+
+    def ultimos(self, n):
+        """Los `n` snapshots más recientes, del más antiguo al más reciente"""
+        if n <= 0:
+            return []
+
+        tabla = _obtener_tabla_nombres()
+        resultado = []
+        for ruta, _ in reversed(self._segmentos()):
+            for snapshot in _leer_hacia_atras(ruta):
+                resultado.append(decodificar_snapshot(snapshot, tabla))
+                if len(resultado) == n:
+                    return resultado[::-1]
+        return resultado[::-1]
+
+    def ultimo(self):
+        recientes = self.ultimos(1)
+        return recientes[0] if recientes else None
+
+    def rango(self, desde=None, hasta=None):
+        """Genera los snapshots con timestamp en [desde, hasta] en orden cronológico"""
+        tabla = _obtener_tabla_nombres()
+        for ruta, entrada in self._segmentos():
+            if desde and entrada["hasta"] < desde:
+                continue
+            if hasta and entrada["desde"] > hasta:
+                break
+
+            try:
+                with open(ruta, "rb") as f:
+                    if desde:
+                        f.seek(_buscar_offset(f, desde, entrada["bytes"]))
+                    for linea in f:
+                        snapshot = _decodificar_linea(linea)
+                        if snapshot is None:
+                            continue
+                        timestamp = snapshot.get("timestamp", "")
+                        if desde and timestamp < desde:
+                            continue
+                        if hasta and timestamp > hasta:
+                            return
+                        yield decodificar_snapshot(snapshot, tabla)
+            except OSError:
+                continue
+
+    def __iter__(self):
+        return self.rango()
+
+# ============================================================
+# RETENCIÓN Y AGREGADOS DEL HISTORIAL
+# ============================================================
+
+# Cubos aún abiertos (minuto, hora y día en curso), cacheados en memoria
+_agregados_abiertos = None
+
+# Registros sumados a los cubos abiertos desde siempre, y cuántos de ellos
+# están solo en el diario (aún no en abiertos.json)
+_secuencia_agregados = 0
+_lineas_diario_agregados = 0
+
+# Última vez que se aplicó la retención (se guarda en abiertos.json). Solo
+# se borra por días, así que basta con revisarla cada RETENCION_INTERVALO_SEGUNDOS
+_ultima_retencion = None
+RETENCION_INTERVALO_SEGUNDOS = 3600
+
+# Cubos cerrados de cada nivel hasta ahora: los resúmenes de periodo
+# cacheados valen mientras no se cierre otro cubo de su nivel
+_cierres_agregados = dict.fromkeys(NIVELES_AGREGADOS, 0)
+_resumenes_periodo = {}
+
+
+def cargar_retencion():
+    config = cargar_config()
+    ret = config.get("retencion", {})
+
+    # Días que se conserva cada nivel
+    return {
+        "crudo_dias": ret.get("crudo_dias", 7),
+        "minuto_dias": ret.get("minuto_dias", 30),
+        "hora_dias": ret.get("hora_dias", 365),
+        "dia_dias": ret.get("dia_dias", 3650)
+    }
+
+
+def _cargar_agregados_abiertos():
+    """
+    Cubos abiertos: los de abiertos.json más los registros del diario
+    posteriores a él. Los cubos que se cerraron al sumar esos registros ya
+    se escribieron en su partición, así que aquí no se vuelven a escribir.
+    """
+    global _agregados_abiertos, _secuencia_agregados, _lineas_diario_agregados, _ultima_retencion
+
+    if _agregados_abiertos is None:
+        try:
+            with open(AGREGADOS_ABIERTOS_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+
+        # Formato antiguo: solo los cubos, sin número de secuencia
+        if "cubos" not in data:
+            data = {"secuencia": 0, "cubos": data}
+        _agregados_abiertos = {nivel: _normalizar_cubo(cubo) for nivel, cubo in data["cubos"].items()}
+        _secuencia_agregados = data["secuencia"]
+        _ultima_retencion = data.get("retencion")
+        _lineas_diario_agregados = 0
+
+        for registro in _leer_segmento(AGREGADOS_DIARIO_PATH):
+            _lineas_diario_agregados += 1
+            if registro["secuencia"] > _secuencia_agregados:
+                _sumar_a_cubos(_agregados_abiertos, registro, {})
+                _secuencia_agregados = registro["secuencia"]
+    return _agregados_abiertos
+
+
+def _percentil(valores_ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not valores_ordenados:
+        return 0
+    k = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[k]
+
+
+def _resumen_metrica(valores):
+    ordenados = sorted(valores)
+    return {
+        "min": ordenados[0],
+        "avg": round(sum(ordenados) / len(ordenados), 2),
+        "max": ordenados[-1],
+        "p95": _percentil(ordenados, 95)
+    }
+
+
+def _nueva_metrica():
+    """
+    Resumen de tamaño fijo de un % en un cubo: mínimo, máximo, suma e
+    histograma de 101 casillas de 1 punto, del que sale el p95.
+    """
+    return {"min": None, "max": None, "suma": 0.0, "hist": [0] * 101}
+
+
+def _sumar_a_metrica(metrica, valor):
+    metrica["min"] = valor if metrica["min"] is None else min(metrica["min"], valor)
+    metrica["max"] = valor if metrica["max"] is None else max(metrica["max"], valor)
+    metrica["suma"] += valor
+    metrica["hist"][min(100, max(0, int(valor)))] += 1
+
+
+def _resumen_de_metrica(metrica, n):
+    """Como _resumen_metrica; el p95 es el límite superior de su casilla del histograma"""
+    k = max(1, math.ceil(0.95 * n))
+    acumulado = 0
+    p95 = metrica["max"]
+    for casilla, cuenta in enumerate(metrica["hist"]):
+        acumulado += cuenta
+        if acumulado >= k:
+            p95 = casilla + 1
+            break
+    return {
+        "min": metrica["min"],
+        "avg": round(metrica["suma"] / n, 2),
+        "max": metrica["max"],
+        "p95": max(metrica["min"], min(metrica["max"], p95))
+    }
+
+
+def _nuevo_cubo(clave):
+    return {"clave": clave, "n": 0, "cpu": _nueva_metrica(), "ram": _nueva_metrica(), "procesos": {}}
+
+
+def _normalizar_cubo(cubo):
+    # Los cubos de versiones anteriores guardaban todas las muestras en listas
+    for metrica in ("cpu", "ram"):
+        if isinstance(cubo[metrica], list):
+            resumen = _nueva_metrica()
+            for valor in cubo[metrica]:
+                _sumar_a_metrica(resumen, valor)
+            cubo[metrica] = resumen
+    return cubo
+
+
+def _registro_agregados(snapshot):
+    """Lo que aporta un snapshot a los agregados, con los procesos ya agrupados por nombre"""
+    return {
+        "timestamp": snapshot.get("timestamp"),
+        "cpu_percent": snapshot["cpu_percent"],
+        "ram_percent": snapshot["ram_percent"],
+        "por_nombre": _agrupar_por_nombre(snapshot.get("procesos", []))
+    }
+
+
+def _acumular_en_cubo(cubo, registro):
+    cubo["n"] += 1
+    _sumar_a_metrica(cubo["cpu"], registro["cpu_percent"])
+    _sumar_a_metrica(cubo["ram"], registro["ram_percent"])
+
+    # Por nombre: [suma RAM, RAM máxima, CPU máxima, apariciones]
+    for nombre, (ram, cpu) in registro["por_nombre"].items():
+        acum = cubo["procesos"].setdefault(nombre, [0.0, 0.0, 0.0, 0])
+        acum[0] += ram
+        acum[1] = max(acum[1], ram)
+        acum[2] = max(acum[2], cpu)
+        acum[3] += 1
+
+
+def _agrupar_por_nombre(procesos):
+    """{nombre: [RAM total, CPU total]}: varias instancias con el mismo nombre cuentan como un solo programa"""
+    por_nombre = {}
+    for p in procesos:
+        totales = por_nombre.setdefault(p["nombre"] or "?", [0.0, 0.0])
+        totales[0] += p["ram_mb"]
+        totales[1] += p["cpu"]
+    return por_nombre
+
+
+def _cerrar_cubo(cubo):
+    top = heapq.nlargest(
+        TOP_PROCESOS_AGREGADOS,
+        cubo["procesos"].items(),
+        key=lambda item: item[1][0] / item[1][3]
+    )
+    return {
+        "inicio": cubo["clave"],
+        "muestras": cubo["n"],
+        "cpu_percent": _resumen_de_metrica(cubo["cpu"], cubo["n"]),
+        "ram_percent": _resumen_de_metrica(cubo["ram"], cubo["n"]),
+        "top_procesos": [
+            {
+                "nombre": nombre,
+                "ram_mb_avg": round(acum[0] / acum[3], 2),
+                "ram_mb_max": round(acum[1], 2),
+                "cpu_max": round(acum[2], 2),
+                "apariciones": acum[3]
+            }
+            for nombre, acum in top
+        ]
+    }
+
+
+def _ruta_agregados(nivel, clave):
+    largo_particion = NIVELES_AGREGADOS[nivel][1]
+    return os.path.join(AGREGADOS_DIR, nivel, clave[:largo_particion] + ".jsonl")
+
+
+def _sumar_a_cubos(abiertos, registro, cerrados):
+    """
+    Suma un registro de _registro_agregados a los cubos de `abiertos`. Los
+    cubos que terminan se añaden, ya cerrados y como línea JSON, a
+    `cerrados` ({ruta: [líneas]}).
+    """
+    timestamp = registro.get("timestamp")
+    if not timestamp:
+        return
+
+    for nivel, (largo_clave, _) in NIVELES_AGREGADOS.items():
+        clave = timestamp[:largo_clave]
+        cubo = abiertos.get(nivel)
+
+        if cubo and cubo["clave"] != clave:
+            linea = json.dumps(_cerrar_cubo(cubo), ensure_ascii=False, separators=(",", ":"))
+            cerrados.setdefault(_ruta_agregados(nivel, cubo["clave"]), []).append(linea + "\n")
+            _cierres_agregados[nivel] += 1
+            cubo = None
+
+        if cubo is None:
+            cubo = abiertos[nivel] = _nuevo_cubo(clave)
+        _acumular_en_cubo(cubo, registro)
+
+
+def _guardar_agregados_abiertos():
+    """Guarda los cubos abiertos completos y vacía el diario, que ya está incluido en ellos"""
+    global _lineas_diario_agregados
+
+    abiertos = _cargar_agregados_abiertos()
+    _escribir_json_atomico(AGREGADOS_ABIERTOS_PATH, {
+        "secuencia": _secuencia_agregados,
+        "retencion": _ultima_retencion,
+        "cubos": abiertos
+    })
+    # Si se corta aquí, el diario se descarta al cargar por su número de secuencia
+    try:
+        os.remove(AGREGADOS_DIARIO_PATH)
+    except OSError:
+        pass
+    _lineas_diario_agregados = 0
+
+
+def _acumular_agregados(snapshot):
+    """
+    Suma el snapshot a los cubos abiertos y cierra los que ya han terminado.
+    Lo normal es añadir una línea al diario; abiertos.json, que tiene tamaño
+    fijo, solo se reescribe cada AGREGADOS_DIARIO_MAX_LINEAS snapshots.
+    """
+    global _secuencia_agregados, _lineas_diario_agregados
+
+    if not snapshot.get("timestamp"):
+        return
+
+    abiertos = _cargar_agregados_abiertos()
+    registro = _registro_agregados(snapshot)
+    registro["secuencia"] = _secuencia_agregados + 1
+
+    cerrados = {}
+    _sumar_a_cubos(abiertos, registro, cerrados)
+    for ruta, lineas in cerrados.items():
+        with open(ruta, "a", encoding="utf-8") as f:
+            f.write("".join(lineas))
+    _secuencia_agregados = registro["secuencia"]
+
+    if _lineas_diario_agregados + 1 >= AGREGADOS_DIARIO_MAX_LINEAS:
+        _guardar_agregados_abiertos()
+    else:
+        with open(AGREGADOS_DIARIO_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n")
+        _lineas_diario_agregados += 1
+
+
+def _leer_agregados(nivel, desde, hasta, incluir_abierto=True):
+    """Lee los cubos de un nivel cuyo inicio está en [desde, hasta], con el abierto al final"""
+    largo_clave, largo_particion = NIVELES_AGREGADOS[nivel]
+    desde, hasta = desde[:largo_clave], hasta[:largo_clave]
+    directorio = os.path.join(AGREGADOS_DIR, nivel)
+
+    cubos = []
+    for nombre in sorted(os.listdir(directorio)):
+        particion = nombre[:-len(".jsonl")]
+        if not nombre.endswith(".jsonl") or particion < desde[:largo_particion] or particion > hasta[:largo_particion]:
+            continue
+        for cubo in _leer_segmento(os.path.join(directorio, nombre)):
+            if desde <= cubo["inicio"] <= hasta:
+                cubos.append(cubo)
+
+    if incluir_abierto:
+        cubos.extend(_cubo_abierto(nivel, desde, hasta))
+    return cubos
+
+
+def _cubo_abierto(nivel, desde, hasta):
+    """El cubo en curso de un nivel, ya cerrado, si su inicio está en [desde, hasta]"""
+    largo_clave = NIVELES_AGREGADOS[nivel][0]
+    with _historial_lock:
+        abierto = _cargar_agregados_abiertos().get(nivel)
+        if abierto and abierto["n"] and desde[:largo_clave] <= abierto["clave"] <= hasta[:largo_clave]:
+            return [_cerrar_cubo(abierto)]
+    return []
+
+
+def _snapshot_como_cubo(snapshot):
+    return {
+        "inicio": snapshot["timestamp"],
+        "muestras": 1,
+        "cpu_percent": _resumen_metrica([snapshot["cpu_percent"]]),
+        "ram_percent": _resumen_metrica([snapshot["ram_percent"]]),
+        "top_procesos": [
+            {
+                "nombre": p["nombre"],
+                "ram_mb_avg": p["ram_mb"],
+                "ram_mb_max": p["ram_mb"],
+                "cpu_max": p["cpu"],
+                "apariciones": 1
+            }
+            for p in snapshot.get("procesos", [])[:TOP_PROCESOS_AGREGADOS]
+        ]
+    }
+
+
+def elegir_nivel(desde, hasta, ahora=None):
+    """
+    Elige el nivel más barato que cubre el rango: cuanto más largo es el rango,
+    más grueso el nivel, y nunca uno cuya retención ya no alcanza a `desde`.
+    """
+    ahora = ahora or datetime.datetime.now()
+    retencion = cargar_retencion()
+    inicio = datetime.datetime.strptime(desde, FORMATO_TIMESTAMP)
+    duracion = datetime.datetime.strptime(hasta, FORMATO_TIMESTAMP) - inicio
+
+    candidatos = [
+        ("crudo", datetime.timedelta(hours=2)),
+        ("minuto", datetime.timedelta(days=2)),
+        ("hora", datetime.timedelta(days=60)),
+        ("dia", None)
+    ]
+    for nivel, duracion_maxima in candidatos:
+        cubre = inicio >= ahora - datetime.timedelta(days=retencion[f"{nivel}_dias"])
+        if cubre and (duracion_maxima is None or duracion <= duracion_maxima):
+            return nivel
+    return "dia"
+
+
+def consultar_metricas(desde, hasta, nivel=None):
+    """
+    Devuelve la serie de CPU/RAM entre `desde` y `hasta` (timestamps en
+    FORMATO_TIMESTAMP) leyendo del nivel más barato para ese rango.
+    Cada punto tiene min/avg/max/p95 de `cpu_percent` y `ram_percent`.
+    """
+    nivel = nivel or elegir_nivel(desde, hasta)
+    if nivel == "crudo":
+        return nivel, [_snapshot_como_cubo(s) for s in LectorHistorial().rango(desde, hasta)]
+    return nivel, _leer_agregados(nivel, desde, hasta)
+
+
+def resumen_periodo(horas, ahora=None):
+    """
+    Resumen de CPU/RAM de las últimas `horas` horas, o None si no hay datos.
+    Se hace con cubos de hora o de día: los cerrados se leen una vez y se
+    guardan en memoria hasta que se cierra otro cubo de ese nivel, y el
+    abierto se suma en cada llamada.
+    """
+    ahora = ahora or datetime.datetime.now()
+    desde = (ahora - datetime.timedelta(hours=horas)).strftime(FORMATO_TIMESTAMP)
+    hasta = ahora.strftime(FORMATO_TIMESTAMP)
+
+    nivel = elegir_nivel(desde, hasta)
+    if nivel in ("crudo", "minuto"):
+        nivel = "hora"
+    vigencia = (nivel, desde[:NIVELES_AGREGADOS[nivel][0]], _cierres_agregados[nivel])
+
+    with _historial_lock:
+        cache = _resumenes_periodo.get(horas)
+        if cache is None or cache[0] != vigencia:
+            cache = _resumenes_periodo[horas] = (vigencia, _leer_agregados(nivel, desde, hasta, incluir_abierto=False))
+        puntos = cache[1] + _cubo_abierto(nivel, desde, hasta)
+    if not puntos:
+        return None
+
+    muestras = sum(p["muestras"] for p in puntos)
+    resumen = {"nivel": nivel, "muestras": muestras}
+    for metrica in ("cpu_percent", "ram_percent"):
+        resumen[metrica] = {
+            "min": min(p[metrica]["min"] for p in puntos),
+            "avg": round(sum(p[metrica]["avg"] * p["muestras"] for p in puntos) / muestras, 2),
+            "max": max(p[metrica]["max"] for p in puntos),
+            # Aproximado: percentil 95 de los p95 de cada cubo
+            "p95": _percentil(sorted(p[metrica]["p95"] for p in puntos), 95)
+        }
+    return resumen
+
+
+def aplicar_retencion_si_toca(ahora=None):
+    """
+    Aplica la retención si han pasado RETENCION_INTERVALO_SEGUNDOS desde la
+    última vez. Devuelve True si se ha aplicado.
+    """
+    global _ultima_retencion
+
+    ahora = ahora or datetime.datetime.now()
+    with _historial_lock:
+        _cargar_agregados_abiertos()
+        if _ultima_retencion is not None:
+            ultima = datetime.datetime.strptime(_ultima_retencion, FORMATO_TIMESTAMP)
+            if 0 <= (ahora - ultima).total_seconds() < RETENCION_INTERVALO_SEGUNDOS:
+                return False
+
+        aplicar_retencion(ahora)
+        _ultima_retencion = ahora.strftime(FORMATO_TIMESTAMP)
+        _guardar_agregados_abiertos()
+    return True
+
+
+def aplicar_retencion(ahora=None):
+    """
+    Borra los datos que han salido de su ventana de retención. Los snapshots
+    crudos ya están resumidos en los agregados, así que se eliminan segmentos
+    enteros; los agregados se borran por archivo de partición.
+    """
+    ahora = ahora or datetime.datetime.now()
+    retencion = cargar_retencion()
+
+    with _historial_lock:
+        limite = (ahora - datetime.timedelta(days=retencion["crudo_dias"])).strftime(FORMATO_TIMESTAMP)
+
+        # El segmento activo nunca se borra
+        for ruta in _segmentos_historial()[:-1]:
+            ultimo = _leer_ultimo_registro(ruta)
+            if ultimo is not None and ultimo.get("timestamp", "") >= limite:
+                break
+            os.remove(ruta)
+
+        for nivel, (_, largo_particion) in NIVELES_AGREGADOS.items():
+            limite = ahora - datetime.timedelta(days=retencion[f"{nivel}_dias"])
+            limite = limite.strftime(FORMATO_TIMESTAMP)[:largo_particion]
+            directorio = os.path.join(AGREGADOS_DIR, nivel)
+
+            for nombre in os.listdir(directorio):
+                # Solo se borra una partición cuando entera es anterior al límite
+                if nombre.endswith(".jsonl") and nombre[:-len(".jsonl")] < limite:
+                    os.remove(os.path.join(directorio, nombre))
+                    _resumenes_periodo.clear()
+
+# ============================================================
+# CARGA Y GUARDADO DE CONFIGURACIÓN
+# ============================================================
+
+# Caché de config.json en memoria, válida mientras no cambien su mtime y tamaño
+_config_lock = threading.RLock()
+_config_cache = {"firma": None, "data": None}
+
+CONFIG_POR_DEFECTO = {
+    "chat_id": None,
+    "programacion": {},
+    "supabase_activo": False
+}
+
+
+def _firma_config():
+    try:
+        st = os.stat(CONFIG_PATH)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _completar_config(data):
+    # Asegurar campos mínimos
+    for k, v in CONFIG_POR_DEFECTO.items():
+        if k not in data:
+            data[k] = copy.deepcopy(v)
+    return data
+
+
+def _leer_config_disco():
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            contenido = f.read().strip()
+
+        if not contenido:
+            return copy.deepcopy(CONFIG_POR_DEFECTO)
+
+        data = json.loads(contenido)
+        if not isinstance(data, dict):
+            return copy.deepcopy(CONFIG_POR_DEFECTO)
+        return _completar_config(data)
+
+    except (OSError, ValueError):
+        return copy.deepcopy(CONFIG_POR_DEFECTO)
+
+
+def cargar_config():
+    """
+    Devuelve una copia de la configuración. Solo se vuelve a leer config.json
+    si su mtime o su tamaño han cambiado (p. ej. lo ha editado otro proceso).
+    """
+    with _config_lock:
+        firma = _firma_config()
+        if firma is None:
+            return copy.deepcopy(CONFIG_POR_DEFECTO)
+
+        if firma != _config_cache["firma"]:
+            _config_cache["data"] = _leer_config_disco()
+            _config_cache["firma"] = firma
+
+        return copy.deepcopy(_config_cache["data"])
+
+def guardar_config(config):
+    with _config_lock:
+        temporal = CONFIG_PATH + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=4, ensure_ascii=False)
+        os.replace(temporal, CONFIG_PATH)
+
+        # Escritura directa a la caché: la siguiente lectura no toca el disco
+        _config_cache["data"] = _completar_config(copy.deepcopy(config))
+        _config_cache["firma"] = _firma_config()
+
+
+# En el orden de datetime.weekday(): no depende del idioma del sistema, a diferencia de strftime("%A")
+DIAS_SEMANA = ("lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo")
+# En "dias" de la programación: se analiza todos los días. Sin días no se analiza nunca
+DIAS_TODOS = "todos"
+
+
+def cargar_programacion():
+    config = cargar_config()
+    prog = config.get("programacion", {})
+
+    # Valores por defecto si no existen
+    return {
+        "activo": prog.get("activo", False),
+        "dias": prog.get("dias", []),
+        "hora_inicio": prog.get("hora_inicio", "00:00"),
+        "hora_fin": prog.get("hora_fin", "23:59"),
+        "intervalo_minutos": prog.get("intervalo_minutos", 60)
+    }
+
+def guardar_programacion(nueva_prog):
+    config = cargar_config()
+    config["programacion"] = nueva_prog
+    guardar_config(config)
+    # Los planificadores en marcha recalculan el próximo disparo sin esperar
+    avisar_planificadores()
+
+# ============================================================
+# CÓDIGO DE VINCULACIÓN DE USUARIOS
+# ============================================================
+
+def generar_codigo_vinculacion():
+    """Genera un código aleatorio de 6 caracteres para vincular usuarios"""
+    caracteres = string.ascii_uppercase + string.digits
+    codigo = ''.join(random.choices(caracteres, k=6))
+    return codigo
+
+def cargar_codigo_vinculacion():
+    """Carga el código de vinculación actual"""
+    config = cargar_config()
+    codigo = config.get("codigo_vinculacion")
+    
+    # Si no hay código, generar uno nuevo
+    if not codigo:
+        codigo = generar_codigo_vinculacion()
+        config["codigo_vinculacion"] = codigo
+        guardar_config(config)
+    
+    return codigo
+
+def generar_nuevo_codigo():
+    """Genera un nuevo código de vinculación"""
+    codigo = generar_codigo_vinculacion()
+    config = cargar_config()
+    config["codigo_vinculacion"] = codigo
+    guardar_config(config)
+    return codigo
+
+def configurar_programacion_consola():
+    print("\n=== CONFIGURAR PROGRAMACIÓN ===")
+
+    print(f"Introduce los días separados por comas (ej: lunes,martes,viernes) o '{DIAS_TODOS}':")
+    while True:
+        dias = [_normalizar_dia(d) for d in input("Días: ").split(",") if d.strip()]
+        desconocidos = dias_desconocidos(dias)
+        if desconocidos:
+            print("❌ Días no reconocidos:", ", ".join(desconocidos))
+        elif not dias:
+            print(f"❌ Indica al menos un día o '{DIAS_TODOS}'.")
+        else:
+            break
+    if DIAS_TODOS in dias:
+        dias = [DIAS_TODOS]
+
+    hora_inicio = input("Hora inicio (HH:MM): ")
+    hora_fin = input("Hora fin (HH:MM): ")
+
+    intervalo = int(input("Intervalo en minutos: "))
+
+    nueva = {
+        "activo": True,
+        "dias": dias,
+        "hora_inicio": hora_inicio,
+        "hora_fin": hora_fin,
+        "intervalo_minutos": intervalo
+    }
+
+    guardar_programacion(nueva)
+    print("✔ Programación guardada correctamente.")
+
+# ============================================================
+# TELEGRAM
+# ============================================================
+
+TELEGRAM_TOKEN = ""
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+
+class ErrorTelegram(Exception):
+    """La API de Telegram devolvió un error o no respondió tras los reintentos"""
+
+
+class ClienteTelegram:
+    """
+    Cliente de la API de bots de Telegram. Reutiliza las conexiones con una
+    sesión de requests, limita cada petición con timeouts de conexión y
+    lectura, y reintenta los fallos de red, los 5xx y los 429 con espera
+    exponencial (o el `retry_after` que indique Telegram). Cualquier otro
+    error de requests se devuelve como ErrorTelegram.
+
+    `base_url` y `dormir` se pueden sustituir para probarlo contra un
+    servidor local sin esperar de verdad.
+    """
+
+    def __init__(self, token=None, base_url=TELEGRAM_API_URL, timeout=(5, 15),
+                 reintentos=3, espera_base=1.0, espera_maxima=30.0, dormir=time.sleep):
+        self.token = TELEGRAM_TOKEN if token is None else token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self._dormir = dormir
+        self._sesion = None
+        self._lock = threading.Lock()
+
+    def _obtener_sesion(self):
+        with self._lock:
+            if self._sesion is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                self._sesion = requests.Session()
+                self._sesion.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+                self._sesion.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            return self._sesion
+
+    def cerrar(self):
+        with self._lock:
+            if self._sesion is not None:
+                self._sesion.close()
+                self._sesion = None
+
+    def llamar(self, metodo, parametros=None, timeout=None):
+        """Llama a un método de la API y devuelve su `result`"""
+        import requests
+
+        sesion = self._obtener_sesion()
+        url = f"{self.base_url}/bot{self.token}/{metodo}"
+        error = None
+
+        for intento in range(self.reintentos + 1):
+            espera = self.espera_base * 2 ** intento
+            try:
+                respuesta = sesion.post(url, data=parametros, timeout=timeout or self.timeout)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                error = f"sin respuesta de Telegram ({e.__class__.__name__})"
+            except requests.RequestException as e:
+                # URL mal formada, demasiadas redirecciones...: reintentar no los va a arreglar
+                raise ErrorTelegram(f"{metodo}: {e.__class__.__name__}: {e}") from e
+            else:
+                try:
+                    datos = respuesta.json()
+                except ValueError:
+                    datos = {}
+
+                if respuesta.status_code == 429:
+                    error = "demasiadas peticiones (429)"
+                    espera = datos.get("parameters", {}).get("retry_after", espera)
+                elif respuesta.status_code >= 500:
+                    error = f"error del servidor ({respuesta.status_code})"
+                elif not datos.get("ok"):
+                    # Errores 4xx: reintentar no los va a arreglar
+                    raise ErrorTelegram(datos.get("description") or f"HTTP {respuesta.status_code}")
+                else:
+                    return datos.get("result")
+
+            # Si Telegram pide esperar más de lo razonable, mejor fallar que bloquear el análisis
+            if intento == self.reintentos or espera > self.espera_maxima:
+                break
+            self._dormir(espera)
+
+        raise ErrorTelegram(f"{metodo}: {error}")
+
+    def enviar_mensaje(self, chat_id, texto, parse_mode="Markdown"):
+        return self.llamar("sendMessage", {"chat_id": chat_id, "text": texto, "parse_mode": parse_mode})
+
+    def obtener_actualizaciones(self, offset=None, espera=0, tipos=None):
+        """getUpdates; con `espera` > 0 el servidor retiene la petición (long polling)"""
+        parametros = {"timeout": espera}
+        if offset is not None:
+            parametros["offset"] = offset
+        if tipos is not None:
+            parametros["allowed_updates"] = json.dumps(tipos)
+        conexion, lectura = self.timeout
+        return self.llamar("getUpdates", parametros, timeout=(conexion, lectura + espera))
+
+
+_cliente_telegram = None
+
+
+def obtener_cliente_telegram():
+    global _cliente_telegram
+    if _cliente_telegram is None:
+        _cliente_telegram = ClienteTelegram()
+    return _cliente_telegram
+
+
+def cargar_chat_id():
+    return cargar_config().get("chat_id")
+
+def guardar_chat_id(chat_id):
+    config = cargar_config()
+    config["chat_id"] = chat_id
+    guardar_config(config)
+
+def telegram_configurado():
+    """Verifica si Telegram está configurado"""
+    return cargar_chat_id() is not None
+
+
+def borrar_chat_id():
+    """Elimina el chat_id almacenado (cierra sesión de Telegram)"""
+    config = cargar_config()
+    config["chat_id"] = None
+    guardar_config(config)
+
+# Segundos que se espera (long polling) a que llegue el mensaje con el código
+TELEGRAM_ESPERA_VINCULACION = 10
+
+
+def consumir_actualizaciones(espera=0):
+    """
+    Devuelve los mensajes que han llegado al bot desde la última llamada.
+    El offset (último update_id + 1) se guarda en la configuración: al
+    pedirlo, Telegram da por leídas las anteriores y no las vuelve a enviar.
+    """
+    offset = cargar_config().get("telegram_offset")
+    actualizaciones = obtener_cliente_telegram().obtener_actualizaciones(
+        offset, espera, tipos=["message", "edited_message"]
+    )
+
+    if actualizaciones:
+        config = cargar_config()
+        config["telegram_offset"] = actualizaciones[-1]["update_id"] + 1
+        guardar_config(config)
+    return actualizaciones
+
+
+def _mensaje_de(actualizacion):
+    return actualizacion.get("message") or actualizacion.get("edited_message") or {}
+
+
+def obtener_chat_id_y_validar_codigo(espera=TELEGRAM_ESPERA_VINCULACION):
+    """
+    Obtiene el chat_id del mensaje que contiene el código de vinculación.
+    Revisa todas las actualizaciones nuevas, no solo la última, y si el
+    código aún no ha llegado lo espera hasta `espera` segundos.
+    Retorna: (chat_id, código_valido) o (None, False)
+    """
+    codigo_esperado = cargar_codigo_vinculacion()
+    limite = time.monotonic() + espera
+
+    try:
+        while True:
+            restante = max(0, int(limite - time.monotonic()))
+            for actualizacion in consumir_actualizaciones(restante):
+                mensaje = _mensaje_de(actualizacion)
+                if codigo_esperado in mensaje.get("text", "").upper():
+                    return mensaje.get("chat", {}).get("id"), True
+            if restante == 0:
+                return None, False
+    except ErrorTelegram as e:
+        print("❌ Error al consultar Telegram:", e)
+        return None, False
+
+def obtener_chat_id(espera=TELEGRAM_ESPERA_VINCULACION):
+    """Obtiene el chat_id del último mensaje nuevo"""
+    try:
+        actualizaciones = consumir_actualizaciones(espera)
+        if actualizaciones:
+            return _mensaje_de(actualizaciones[-1]).get("chat", {}).get("id")
+        return None
+    except ErrorTelegram as e:
+        print("❌ Error al consultar Telegram:", e)
+        return None
+
+def enviar_telegram(mensaje):
+    """Envía un mensaje al chat vinculado. Devuelve True si Telegram lo aceptó"""
+    chat_id = cargar_chat_id()
+    if not chat_id:
+        return False
+    try:
+        obtener_cliente_telegram().enviar_mensaje(chat_id, mensaje)
+        return True
+    except ErrorTelegram as e:
+        print("❌ Error al enviar a Telegram:", e)
+        return False
+
+# ============================================================
+# NOTIFICACIONES DE TELEGRAM
+# ============================================================
+
+NOTIFICACIONES_PATH = os.path.join(DATA_DIR, "notificaciones.json")
+
+NIVELES_RIESGO = {"BAJO": 0, "MEDIO": 1, "ALTO": 2}
+
+# Si el resumen no se puede enviar se reintenta pasado este tiempo
+NOTIFICACIONES_REINTENTO_SEGUNDOS = 60
+# Análisis que se guardan como mucho a la espera del resumen
+NOTIFICACIONES_MAX_PENDIENTES = 1000
+
+
+def cargar_notificaciones():
+    config = cargar_config()
+    notif = config.get("notificaciones", {})
+
+    return {
+        # Cada cuánto se envía el resumen de los análisis (0 = un mensaje por análisis)
+        "digest_minutos": notif.get("digest_minutos", 60),
+        # Análisis seguidos en el nuevo nivel antes de avisar del cambio de riesgo:
+        # las subidas se avisan enseguida, las bajadas cuando se confirman
+        "confirmaciones_subida": notif.get("confirmaciones_subida", 1),
+        "confirmaciones_bajada": notif.get("confirmaciones_bajada", 3),
+        # Cubo de fichas por chat: ráfaga máxima y ritmo sostenido
+        "rafaga": notif.get("rafaga", 3),
+        "mensajes_por_minuto": notif.get("mensajes_por_minuto", 20)
+    }
+
+
+class CuboFichas:
+    """Limitador de ritmo: cada mensaje gasta una ficha y se recuperan `ritmo` por segundo"""
+
+    def __init__(self, capacidad, ritmo, reloj=time.monotonic):
+        self.capacidad = capacidad
+        self.ritmo = ritmo
+        self._reloj = reloj
+        self._fichas = float(capacidad)
+        self._momento = reloj()
+
+    def _rellenar(self):
+        ahora = self._reloj()
+        self._fichas = min(self.capacidad, self._fichas + (ahora - self._momento) * self.ritmo)
+        self._momento = ahora
+
+    def espera(self):
+        """Segundos hasta que haya una ficha (0 si ya la hay)"""
+        self._rellenar()
+        return 0.0 if self._fichas >= 1 else (1 - self._fichas) / self.ritmo
+
+    def consumir(self):
+        self._rellenar()
+        self._fichas -= 1
+
+
+class NotificadorTelegram:
+    """
+    Envía las notificaciones desde un hilo propio para que el análisis nunca
+    espere a la red. Los análisis se acumulan y se resumen en un único
+    mensaje cada `digest_minutos`; solo un cambio confirmado del nivel de
+    riesgo se envía en el momento. Todos los envíos pasan por un cubo de
+    fichas por chat.
+    """
+
+    def __init__(self, enviar=None, reloj=time.time, dormir=time.sleep, ruta=NOTIFICACIONES_PATH):
+        self._enviar = enviar or enviar_telegram
+        self._reloj = reloj
+        self._dormir = dormir
+        self.ruta = ruta
+        self._cola = queue.Queue()
+        self._cubos = {}
+        self._hilo = None
+        self._lock = threading.Lock()
+
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            estado = {}
+        self.riesgo_notificado = estado.get("riesgo_notificado")
+        self.candidato = estado.get("candidato")
+        self.confirmaciones = estado.get("confirmaciones", 0)
+        self.pendientes = estado.get("pendientes", [])
+        self.ultimo_digest = estado.get("ultimo_digest") or reloj()
+        self._reintentar_en = 0
+
+    def _guardar(self):
+        _escribir_json_atomico(self.ruta, {
+            "riesgo_notificado": self.riesgo_notificado,
+            "candidato": self.candidato,
+            "confirmaciones": self.confirmaciones,
+            "pendientes": self.pendientes,
+            "ultimo_digest": self.ultimo_digest
+        })
+
+    # --- Lado del análisis ---
+
+    def encolar(self, snapshot):
+        """Registra un análisis. Vuelve al instante; el envío lo hace el hilo"""
+        a = snapshot["analisis_avanzado"]
+        self._cola.put({
+            "timestamp": snapshot["timestamp"],
+            "cpu": snapshot["cpu_percent"],
+            "ram": snapshot["ram_percent"],
+            "riesgo": a["score_detallado"]["riesgo_sistema"],
+            "tendencia_cpu": a["tendencias"]["cpu"],
+            "tendencia_ram": a["tendencias"]["ram"]
+        })
+        self._asegurar_hilo()
+
+    def _asegurar_hilo(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            politica = cargar_notificaciones()
+            restante = self._proximo_digest(politica) - self._reloj()
+            try:
+                evento = self._cola.get(timeout=max(1.0, restante) if self.pendientes else None)
+            except queue.Empty:
+                evento = None
+            try:
+                self.procesar(evento, politica)
+            except Exception as e:
+                print("❌ Error en las notificaciones de Telegram:", e)
+
+    # --- Lado del hilo ---
+
+    def _proximo_digest(self, politica):
+        return max(self.ultimo_digest + politica["digest_minutos"] * 60, self._reintentar_en)
+
+    def procesar(self, evento, politica=None):
+        """Aplica un análisis (o solo el temporizador si `evento` es None) y envía lo que toque"""
+        politica = politica or cargar_notificaciones()
+
+        if evento is not None:
+            self.pendientes.append(evento)
+            del self.pendientes[:-NOTIFICACIONES_MAX_PENDIENTES]
+            cambio = self._histeresis(evento["riesgo"], politica)
+            # El cambio solo se da por notificado si el mensaje sale; si no, la
+            # confirmación se mantiene y se reintenta con el siguiente análisis
+            if cambio is not None and self._enviar_limitado(self._mensaje_cambio(cambio, evento), politica):
+                self.riesgo_notificado = cambio[1]
+                self.candidato, self.confirmaciones = None, 0
+                # El mensaje de cambio ya lleva este análisis: si es lo único
+                # pendiente, no se repite en un resumen
+                if self.pendientes == [evento]:
+                    self.pendientes = []
+
+        if self.pendientes and self._reloj() >= self._proximo_digest(politica):
+            if self._enviar_limitado(self._mensaje_digest(self.pendientes), politica):
+                self.pendientes = []
+                self.ultimo_digest = self._reloj()
+            else:
+                self._reintentar_en = self._reloj() + NOTIFICACIONES_REINTENTO_SEGUNDOS
+
+        self._guardar()
+
+    def _histeresis(self, riesgo, politica):
+        """
+        Devuelve (anterior, nuevo) si el cambio de nivel se confirma, o None.
+        No actualiza `riesgo_notificado`: eso se hace cuando el aviso se envía.
+        """
+        if self.riesgo_notificado is None:
+            self.riesgo_notificado = riesgo
+            return None
+        if riesgo == self.riesgo_notificado:
+            self.candidato, self.confirmaciones = None, 0
+            return None
+
+        if riesgo == self.candidato:
+            self.confirmaciones += 1
+        else:
+            self.candidato, self.confirmaciones = riesgo, 1
+
+        sube = NIVELES_RIESGO.get(riesgo, 2) > NIVELES_RIESGO.get(self.riesgo_notificado, 2)
+        necesarias = politica["confirmaciones_subida"] if sube else politica["confirmaciones_bajada"]
+        if self.confirmaciones < necesarias:
+            return None
+        return self.riesgo_notificado, riesgo
+
+    def _enviar_limitado(self, mensaje, politica):
+        chat_id = cargar_chat_id()
+        if not chat_id:
+            return False
+
+        cubo = self._cubos.get(chat_id)
+        if cubo is None:
+            cubo = self._cubos[chat_id] = CuboFichas(
+                politica["rafaga"], politica["mensajes_por_minuto"] / 60, reloj=self._reloj
+            )
+        espera = cubo.espera()
+        if espera:
+            self._dormir(espera)
+        cubo.consumir()
+        return self._enviar(mensaje)
+
+    def _mensaje_cambio(self, cambio, evento):
+        anterior, nuevo = cambio
+        icono = "🔺" if NIVELES_RIESGO.get(nuevo, 2) > NIVELES_RIESGO.get(anterior, 2) else "🔻"
+        return f"""
+{icono} *PRISMOV - Cambio de riesgo: {anterior} → {nuevo}*
+📅 {evento["timestamp"]}
+
+🖥 *Recursos*
+• CPU: {evento["cpu"]:.1f}%
+• RAM: {evento["ram"]:.1f}%
+
+📈 *Tendencias*
+• CPU: {evento["tendencia_cpu"]}
+• RAM: {evento["tendencia_ram"]}
+        """
+
+    def _mensaje_digest(self, pendientes):
+        cpu = [p["cpu"] for p in pendientes]
+        ram = [p["ram"] for p in pendientes]
+        riesgos = {}
+        for p in pendientes:
+            riesgos[p["riesgo"]] = riesgos.get(p["riesgo"], 0) + 1
+        ultimo = pendientes[-1]
+
+        return f"""
+📊 *PRISMOV - Resumen*
+📅 {pendientes[0]["timestamp"]} → {ultimo["timestamp"]}
+{len(pendientes)} análisis
+
+🖥 *Recursos (media / máx)*
+• CPU: {sum(cpu) / len(cpu):.1f}% / {max(cpu):.1f}%
+• RAM: {sum(ram) / len(ram):.1f}% / {max(ram):.1f}%
+
+📈 *Tendencias*
+• CPU: {ultimo["tendencia_cpu"]}
+• RAM: {ultimo["tendencia_ram"]}
+
+⚠️ *Riesgo actual: {ultimo["riesgo"]}*
+{" · ".join(f"{nivel}: {n}" for nivel, n in sorted(riesgos.items(), key=lambda r: NIVELES_RIESGO.get(r[0], 3)))}
+
+💾 Reporte completo guardado localmente.
+        """
+
+
+_notificador_telegram = None
+
+
+def obtener_notificador_telegram():
+    global _notificador_telegram
+    if _notificador_telegram is None:
+        _notificador_telegram = NotificadorTelegram()
+    return _notificador_telegram
+
+# ============================================================
+# MUESTREO DE CPU
+# ============================================================
+
+def cargar_muestreo_cpu():
+    config = cargar_config()
+    muestreo = config.get("muestreo_cpu", {})
+
+    return {
+        "alta_resolucion": muestreo.get("alta_resolucion", False),
+        "intervalo_segundos": muestreo.get("intervalo_segundos", 0.5)
+    }
+
+
+def _porcentaje_cpu(anterior, actual):
+    """% de CPU ocupada entre dos lecturas de psutil.cpu_times()"""
+    total = sum(actual) - sum(anterior)
+    if total <= 0:
+        return 0.0
+
+    inactivo = actual.idle - anterior.idle
+    inactivo += getattr(actual, "iowait", 0) - getattr(anterior, "iowait", 0)
+    return round(min(100.0, max(0.0, (total - inactivo) / total * 100)), 1)
+
+
+class MuestreadorCPU:
+    """
+    Mide el uso de CPU del sistema sin bloquear. Guarda los contadores de
+    psutil.cpu_times() entre llamadas, así que leer() devuelve al instante el
+    uso medio desde la lectura anterior. En modo de alta resolución un hilo
+    toma muestras continuas y leer() devuelve su media desde la última lectura.
+    """
+
+    # Por debajo de este intervalo el delta de los contadores es solo ruido
+    INTERVALO_MINIMO = 0.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ultima = psutil.cpu_times()
+        self._momento = time.monotonic()
+
+        self._hilo = None
+        self._parar = threading.Event()
+        self._suma = 0.0
+        self._muestras = 0
+
+    def leer(self):
+        with self._lock:
+            transcurrido = time.monotonic() - self._momento
+            if transcurrido < self.INTERVALO_MINIMO:
+                time.sleep(self.INTERVALO_MINIMO - transcurrido)
+
+            actual = psutil.cpu_times()
+            porcentaje = _porcentaje_cpu(self._ultima, actual)
+            self._ultima = actual
+            self._momento = time.monotonic()
+
+            if self._muestras:
+                porcentaje = round(self._suma / self._muestras, 1)
+                self._suma = 0.0
+                self._muestras = 0
+            return porcentaje
+
+    def iniciar_continuo(self, intervalo):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._bucle_continuo, args=(intervalo,), daemon=True)
+        self._hilo.start()
+
+    def detener_continuo(self):
+        if not self._hilo:
+            return
+        self._parar.set()
+        self._hilo.join()
+        self._hilo = None
+        with self._lock:
+            self._suma = 0.0
+            self._muestras = 0
+
+    def _bucle_continuo(self, intervalo):
+        anterior = psutil.cpu_times()
+        while not self._parar.wait(intervalo):
+            actual = psutil.cpu_times()
+            porcentaje = _porcentaje_cpu(anterior, actual)
+            anterior = actual
+            with self._lock:
+                self._suma += porcentaje
+                self._muestras += 1
+
+
+# Se crea al importar para que los contadores ya estén cebados en el primer análisis
+_muestreador_cpu = MuestreadorCPU()
+
+
+def leer_cpu():
+    """Uso de CPU desde el análisis anterior, según la configuración de muestreo"""
+    muestreo = cargar_muestreo_cpu()
+    if muestreo["alta_resolucion"]:
+        _muestreador_cpu.iniciar_continuo(muestreo["intervalo_segundos"])
+    else:
+        _muestreador_cpu.detener_continuo()
+    return _muestreador_cpu.leer()
+
+# ============================================================
+# ESTADÍSTICAS INCREMENTALES (LÍNEA BASE)
+# ============================================================
+
+ESTADISTICAS_PATH = os.path.join(HISTORIAL_DIR, "estadisticas.json")
+
+
+class EstadisticasIncrementales:
+    """
+    Línea base del sistema que se actualiza en O(1) por snapshot, sin releer
+    el historial. Para CPU, RAM y la RAM de cada proceso (por nombre) guarda
+    media y varianza acumuladas (Welford) y una media y varianza exponenciales
+    (EWMA), que son las que siguen los cambios recientes.
+    """
+
+    # Equivale a una ventana de unas 10 muestras, como los antiguos promedios
+    ALFA = 2 / (10 + 1)
+    MIN_MUESTRAS = 5
+    # Procesos que no aparecen en tantos snapshots se olvidan
+    OLVIDAR_TRAS = 500
+    # Desviación mínima considerada, para no alarmar por cambios mínimos en series planas
+    DESVIACION_MINIMA = {"cpu_percent": 2.0, "ram_percent": 1.0, "proceso": 20.0}
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.snapshots = data.get("snapshots", 0)
+        self.metricas = data.get("metricas", {})
+        self.procesos = data.get("procesos", {})
+
+    def a_dict(self):
+        return {"snapshots": self.snapshots, "metricas": self.metricas, "procesos": self.procesos}
+
+    def _actualizar_serie(self, serie, x):
+        # Welford
+        serie["n"] += 1
+        delta = x - serie["media"]
+        serie["media"] += delta / serie["n"]
+        serie["m2"] += delta * (x - serie["media"])
+
+        # EWMA
+        if serie["n"] == 1:
+            serie["ewma"] = x
+            serie["ewmv"] = 0.0
+        else:
+            diferencia = x - serie["ewma"]
+            serie["ewma"] += self.ALFA * diferencia
+            serie["ewmv"] = (1 - self.ALFA) * (serie["ewmv"] + self.ALFA * diferencia * diferencia)
+
+    @staticmethod
+    def _nueva_serie():
+        return {"n": 0, "media": 0.0, "m2": 0.0, "ewma": 0.0, "ewmv": 0.0}
+
+    def actualizar(self, cpu, ram, procesos):
+        self.snapshots += 1
+
+        for nombre, valor in (("cpu_percent", cpu), ("ram_percent", ram)):
+            self._actualizar_serie(self.metricas.setdefault(nombre, self._nueva_serie()), valor)
+
+        for nombre, (ram_mb, _) in _agrupar_por_nombre(procesos).items():
+            serie = self.procesos.setdefault(nombre, self._nueva_serie())
+            self._actualizar_serie(serie, ram_mb)
+            serie["visto"] = self.snapshots
+
+        # Limpieza amortizada de procesos que ya no existen
+        if self.snapshots % 50 == 0:
+            limite = self.snapshots - self.OLVIDAR_TRAS
+            self.procesos = {n: s for n, s in self.procesos.items() if s.get("visto", 0) >= limite}
+
+    def media(self, metrica):
+        serie = self.metricas.get(metrica)
+        return serie["ewma"] if serie and serie["n"] else None
+
+    def desviacion(self, metrica):
+        serie = self.metricas.get(metrica)
+        return math.sqrt(serie["ewmv"]) if serie and serie["n"] else None
+
+    def _puntuacion(self, serie, x, minima):
+        """Desviaciones típicas (EWMA) entre `x` y la línea base, o None si aún hay pocos datos"""
+        if not serie or serie["n"] < self.MIN_MUESTRAS:
+            return None
+        return (x - serie["ewma"]) / max(math.sqrt(serie["ewmv"]), minima)
+
+    def tendencia(self, metrica, x):
+        z = self._puntuacion(self.metricas.get(metrica), x, self.DESVIACION_MINIMA[metrica])
+        if z is None:
+            return "Datos insuficientes"
+        if z > 1:
+            return "↑ Creciente"
+        if z < -1:
+            return "↓ Decreciente"
+        return "→ Estable"
+
+    def anomalias(self, cpu, ram, procesos, umbral=3):
+        """Valores a más de `umbral` desviaciones típicas por encima de su línea base"""
+        anomalias = []
+
+        for metrica, x in (("cpu_percent", cpu), ("ram_percent", ram)):
+            serie = self.metricas.get(metrica)
+            z = self._puntuacion(serie, x, self.DESVIACION_MINIMA[metrica])
+            if z is not None and z > umbral:
+                anomalias.append({
+                    "nombre": metrica,
+                    "valor": x,
+                    "media": round(serie["ewma"], 2),
+                    "desviacion": round(math.sqrt(serie["ewmv"]), 2),
+                    "z": round(z, 1)
+                })
+
+        for nombre, (ram_mb, _) in _agrupar_por_nombre(procesos).items():
+            serie = self.procesos.get(nombre)
+            z = self._puntuacion(serie, ram_mb, self.DESVIACION_MINIMA["proceso"])
+            if z is not None and z > umbral:
+                anomalias.append({
+                    "nombre": nombre,
+                    "valor": round(ram_mb, 2),
+                    "media": round(serie["ewma"], 2),
+                    "desviacion": round(math.sqrt(serie["ewmv"]), 2),
+                    "z": round(z, 1)
+                })
+
+        return anomalias
+
+
+_estadisticas_incrementales = None
+
+
+def obtener_estadisticas_incrementales():
+    """
+    Devuelve la línea base persistida junto al historial. Si el archivo no existe
+    (primera ejecución tras actualizar) se reconstruye recorriendo el historial crudo.
+    """
+    global _estadisticas_incrementales
+
+    if _estadisticas_incrementales is None:
+        try:
+            with open(ESTADISTICAS_PATH, "r", encoding="utf-8") as f:
+                _estadisticas_incrementales = EstadisticasIncrementales(json.load(f))
+        except (OSError, ValueError):
+            _estadisticas_incrementales = EstadisticasIncrementales()
+            for snapshot in LectorHistorial():
+                _estadisticas_incrementales.actualizar(
+                    snapshot["cpu_percent"], snapshot["ram_percent"], snapshot.get("procesos", [])
+                )
+    return _estadisticas_incrementales
+
+
+def guardar_estadisticas_incrementales():
+    if _estadisticas_incrementales is not None:
+        _escribir_json_atomico(ESTADISTICAS_PATH, _estadisticas_incrementales.a_dict())
+
+# ============================================================
+# DETECCIÓN DE FUGAS DE MEMORIA
+# ============================================================
+
+FUGAS_PATH = os.path.join(HISTORIAL_DIR, "fugas.json")
+
+
+def cargar_deteccion_fugas():
+    config = cargar_config()
+    fugas = config.get("deteccion_fugas", {})
+
+    return {
+        "ventana": fugas.get("ventana", 12),               # snapshots en la regresión
+        "umbral_mb_hora": fugas.get("umbral_mb_hora", 50),
+        "min_muestras": fugas.get("min_muestras", 4),
+        "ram_minima_mb": fugas.get("ram_minima_mb", 20)    # por debajo no se empieza a seguir
+    }
+
+
+class DetectorFugas:
+    """
+    Pendiente de mínimos cuadrados de la RAM de cada proceso (identificado por
+    pid y create_time) sobre sus últimos N snapshots. Las sumas de la regresión
+    se actualizan al entrar y salir cada punto de la ventana, así que cada
+    snapshot cuesta O(1) por proceso sin volver a leer el historial.
+    """
+
+    def __init__(self, data=None):
+        self.series = (data or {}).get("series", {})
+
+    def a_dict(self):
+        return {"series": self.series}
+
+    @staticmethod
+    def _recalcular_sumas(serie):
+        # Se rehacen de vez en cuando para que no se acumule error de redondeo
+        puntos = serie["puntos"]
+        serie["sx"] = math.fsum(x for x, _ in puntos)
+        serie["sy"] = math.fsum(y for _, y in puntos)
+        serie["sxx"] = math.fsum(x * x for x, _ in puntos)
+        serie["sxy"] = math.fsum(x * y for x, y in puntos)
+
+    def actualizar(self, momento, procesos, ventana, ram_minima_mb=0):
+        vivos = set()
+
+        for p in procesos:
+            if p.get("create_time") is None:
+                continue
+            clave = f"{p['pid']}:{p['create_time']}"
+            serie = self.series.get(clave)
+
+            if serie is None:
+                if p["ram_mb"] < ram_minima_mb:
+                    continue
+                serie = self.series[clave] = {
+                    "pid": p["pid"], "nombre": p["nombre"], "origen": p["create_time"],
+                    "puntos": [], "sx": 0.0, "sy": 0.0, "sxx": 0.0, "sxy": 0.0, "altas": 0
+                }
+            vivos.add(clave)
+
+            # x en horas desde que arrancó el proceso: números pequeños, regresión estable
+            x = (momento - serie["origen"]) / 3600
+            y = p["ram_mb"]
+            serie["puntos"].append([x, y])
+            serie["sx"] += x
+            serie["sy"] += y
+            serie["sxx"] += x * x
+            serie["sxy"] += x * y
+
+            if len(serie["puntos"]) > ventana:
+                x0, y0 = serie["puntos"].pop(0)
+                serie["sx"] -= x0
+                serie["sy"] -= y0
+                serie["sxx"] -= x0 * x0
+                serie["sxy"] -= x0 * y0
+
+            serie["altas"] += 1
+            if serie["altas"] % ventana == 0:
+                self._recalcular_sumas(serie)
+
+        # Los procesos que ya no existen dejan de seguirse
+        for clave in list(self.series):
+            if clave not in vivos:
+                del self.series[clave]
+
+    @staticmethod
+    def pendiente(serie):
+        """MB por hora, o None si no hay puntos suficientes o todos son del mismo instante"""
+        n = len(serie["puntos"])
+        if n < 2:
+            return None
+        denominador = n * serie["sxx"] - serie["sx"] ** 2
+        if denominador <= 1e-12:
+            return None
+        return (n * serie["sxy"] - serie["sx"] * serie["sy"]) / denominador
+
+    def pendientes_por_pid(self):
+        resultado = {}
+        for serie in self.series.values():
+            pendiente = self.pendiente(serie)
+            if pendiente is not None:
+                resultado[serie["pid"]] = round(pendiente, 1) + 0.0  # evita mostrar "-0.0"
+        return resultado
+
+    def fugas(self, umbral_mb_hora, min_muestras):
+        """Procesos cuya RAM crece más rápido que el umbral, de mayor a menor ritmo"""
+        fugas = []
+        for serie in self.series.values():
+            if len(serie["puntos"]) < min_muestras:
+                continue
+            pendiente = self.pendiente(serie)
+            if pendiente is not None and pendiente > umbral_mb_hora:
+                fugas.append({
+                    "nombre": serie["nombre"],
+                    "pid": serie["pid"],
+                    "mb_hora": round(pendiente, 1),
+                    "ram_inicial": serie["puntos"][0][1],
+                    "ram_actual": serie["puntos"][-1][1],
+                    "muestras": len(serie["puntos"])
+                })
+        return sorted(fugas, key=lambda f: f["mb_hora"], reverse=True)
+
+
+_detector_fugas = None
+
+
+def obtener_detector_fugas():
+    global _detector_fugas
+
+    if _detector_fugas is None:
+        try:
+            with open(FUGAS_PATH, "r", encoding="utf-8") as f:
+                _detector_fugas = DetectorFugas(json.load(f))
+        except (OSError, ValueError):
+            _detector_fugas = DetectorFugas()
+    return _detector_fugas
+
+
+def guardar_detector_fugas():
+    if _detector_fugas is not None:
+        _escribir_json_atomico(FUGAS_PATH, _detector_fugas.a_dict())
+
+# ============================================================
+# ANÁLISIS DEL SISTEMA
+# ============================================================
+
+class RegistroProcesos:
+    """
+    Registro de larga duración de los procesos vistos, identificados por
+    (pid, create_time). Reutiliza los objetos psutil.Process entre análisis,
+    así el nombre y el create_time se consultan una sola vez por proceso y el
+    % de CPU es el delta real de sus tiempos de CPU desde el recorrido anterior.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # pid -> {"proceso", "create_time", "nombre", "cpu_total", "momento", "denegado"}
+        self._entradas = {}
+
+    def _alta(self, pid):
+        proceso = psutil.Process(pid)
+        entrada = {
+            "proceso": proceso,
+            "create_time": None,
+            "nombre": None,
+            "cpu_total": None,
+            "momento": None,
+            "denegado": False
+        }
+        # Se registra antes de consultar nada: si se deniega el acceso, la
+        # entrada denegada conserva el proceso para detectar si se reutiliza el pid
+        self._entradas[pid] = entrada
+        with proceso.oneshot():
+            entrada["create_time"] = proceso.create_time()
+            entrada["nombre"] = proceso.name()
+        return entrada
+
+    def _vigente(self, pid):
+        """
+        Entrada del pid si sigue siendo el mismo proceso. is_running() compara
+        el create_time actual del pid con el del objeto cacheado, así que un
+        pid reutilizado se detecta aunque el proceso nuevo tenga más tiempo de CPU.
+        """
+        entrada = self._entradas.get(pid)
+        if entrada is None:
+            return None
+        proceso = entrada.get("proceso")
+        if proceso is not None and not proceso.is_running():
+            del self._entradas[pid]
+            return None
+        return entrada
+
+    def recorrer(self):
+        """Devuelve {"pid", "nombre", "cpu", "ram_mb", "create_time"} de cada proceso vivo y olvida los terminados"""
+        procesos = []
+
+        with self._lock:
+            vivos = set(psutil.pids())
+            for pid in list(self._entradas):
+                if pid not in vivos:
+                    del self._entradas[pid]
+
+            for pid in vivos:
+                try:
+                    entrada = self._vigente(pid) or self._alta(pid)
+                    if entrada["denegado"]:
+                        continue
+
+                    proceso = entrada["proceso"]
+                    with proceso.oneshot():
+                        tiempos = proceso.cpu_times()
+                        rss = proceso.memory_info().rss
+                    ahora = time.time()
+                    cpu_total = tiempos.user + tiempos.system
+
+                    if entrada["cpu_total"] is None:
+                        # Primera vez que lo vemos: media desde que arrancó el proceso
+                        desde, cpu_previo = entrada["create_time"], 0.0
+                    else:
+                        desde, cpu_previo = entrada["momento"], entrada["cpu_total"]
+
+                    transcurrido = ahora - desde
+                    cpu = (cpu_total - cpu_previo) / transcurrido * 100 if transcurrido > 0 else 0.0
+
+                    entrada["cpu_total"] = cpu_total
+                    entrada["momento"] = ahora
+
+                    procesos.append({
+                        "pid": pid,
+                        "nombre": entrada["nombre"],
+                        "cpu": round(cpu, 2),
+                        "ram_mb": round(rss / (1024 * 1024), 2),
+                        "create_time": entrada["create_time"]
+                    })
+                except psutil.AccessDenied:
+                    # Sin permisos no cambiará en el siguiente análisis: no volver a
+                    # intentarlo mientras el pid sea del mismo proceso
+                    self._entradas.setdefault(pid, {"proceso": None})["denegado"] = True
+                except psutil.NoSuchProcess:
+                    self._entradas.pop(pid, None)
+
+        return procesos
+
+
+_registro_procesos = RegistroProcesos()
+
+
+def analizar_procesos():
+    """Tabla completa de procesos, sin ordenar"""
+    return _registro_procesos.recorrer()
+
+
+def cargar_captura_procesos():
+    config = cargar_config()
+    captura = config.get("captura_procesos", {})
+
+    # Cuántos procesos se guardan en cada snapshot
+    return {
+        "top_ram": captura.get("top_ram", 25),
+        "top_cpu": captura.get("top_cpu", 10)
+    }
+
+
+def capturar_procesos(procesos, politica=None):
+    """
+    Elige qué procesos se guardan en el snapshot: los top-K por RAM y los
+    top-K por CPU, seleccionados con heapq sin ordenar la lista completa.
+    El resto se resume en un agregado con su número y sus totales.
+    Devuelve (procesos elegidos ordenados por RAM, agregado del resto).
+    """
+    politica = politica or cargar_captura_procesos()
+
+    por_ram = heapq.nlargest(politica["top_ram"], procesos, key=lambda p: p["ram_mb"])
+    por_cpu = heapq.nlargest(politica["top_cpu"], procesos, key=lambda p: p["cpu"])
+
+    elegidos = {id(p): p for p in por_ram + por_cpu}
+    capturados = sorted(elegidos.values(), key=lambda p: p["ram_mb"], reverse=True)
+
+    otros = {"cantidad": 0, "cpu": 0.0, "ram_mb": 0.0}
+    for p in procesos:
+        if id(p) not in elegidos:
+            otros["cantidad"] += 1
+            otros["cpu"] += p["cpu"]
+            otros["ram_mb"] += p["ram_mb"]
+    otros["cpu"] = round(otros["cpu"], 2)
+    otros["ram_mb"] = round(otros["ram_mb"], 2)
+
+    return capturados, otros
+
+def _resumir_por_nombre(procesos, campos):
+    """Una fila por nombre con los campos sumados y el número de instancias"""
+    resumen = {}
+    for p in procesos:
+        fila = resumen.get(p["nombre"])
+        if fila is None:
+            fila = resumen[p["nombre"]] = {"nombre": p["nombre"], "instancias": 0, **{c: 0.0 for c in campos}}
+        fila["instancias"] += 1
+        for c in campos:
+            fila[c] += p[c]
+    return list(resumen.values())
+
+
+def diferenciar_procesos(anteriores, actuales, por_nombre=False, campos=("cpu", "ram_mb")):
+    """
+    Compara dos tablas de procesos en una sola pasada (hash join).
+    Cada proceso se identifica por (pid, create_time), así las instancias con
+    el mismo nombre no se mezclan; si alguna fila antigua no tiene create_time
+    se usa (pid, nombre). Con `por_nombre` se comparan los totales por nombre.
+    Devuelve {"iniciados", "terminados", "cambiados"}; cada cambio lleva los
+    valores anteriores, los actuales y el delta de cada campo.
+    """
+    if por_nombre:
+        campos = tuple(campos) + ("instancias",)
+        anteriores = _resumir_por_nombre(anteriores, campos[:-1])
+        actuales = _resumir_por_nombre(actuales, campos[:-1])
+        clave = operator.itemgetter("nombre")
+    elif all("create_time" in p for p in anteriores):
+        clave = operator.itemgetter("pid", "create_time")
+    else:
+        clave = operator.itemgetter("pid", "nombre")
+
+    pendientes = {clave(p): p for p in anteriores}
+    iniciados = []
+    cambiados = []
+
+    for actual in actuales:
+        anterior = pendientes.pop(clave(actual), None)
+        if anterior is None:
+            iniciados.append(actual)
+            continue
+
+        delta = {c: round(actual.get(c, 0) - anterior.get(c, 0), 2) for c in campos}
+        if any(delta.values()):
+            cambio = {k: actual[k] for k in ("pid", "create_time", "nombre") if k in actual}
+            cambio["anterior"] = {c: anterior.get(c, 0) for c in campos}
+            cambio["actual"] = {c: actual.get(c, 0) for c in campos}
+            cambio["delta"] = delta
+            cambiados.append(cambio)
+
+    return {
+        "iniciados": iniciados,
+        "terminados": list(pendientes.values()),
+        "cambiados": cambiados
+    }
+
+def analizar_tendencias(snapshot, incrementales, diferencias):
+    """
+    Tendencia de CPU y RAM del snapshot actual frente a su línea base
+    (EWMA ± desviación), y procesos cuya RAM ha crecido desde el análisis anterior
+    """
+    tendencia_cpu = incrementales.tendencia("cpu_percent", snapshot["cpu_percent"])
+    tendencia_ram = incrementales.tendencia("ram_percent", snapshot["ram_percent"])
+
+    # Detectar procesos con consumo creciente (mismo proceso, no solo mismo nombre)
+    procesos_crecientes = []
+    for cambio in diferencias["cambiados"]:
+        if cambio["delta"]["ram_mb"] > 50:  # Más de 50MB de aumento
+            procesos_crecientes.append({
+                "nombre": cambio["nombre"],
+                "pid": cambio["pid"],
+                "ram_anterior": cambio["anterior"]["ram_mb"],
+                "ram_actual": cambio["actual"]["ram_mb"]
+            })
+
+    return tendencia_cpu, tendencia_ram, procesos_crecientes
+
+def _razon_sospecha(ram_mb):
+    return f"Alto consumo de {'RAM' if ram_mb > 500 else 'CPU'}"
+
+
+def _estadisticas_python(procesos, top):
+    estadisticas = {"ram_promedio": 0, "ram_desv": 0, "cpu_promedio": 0, "sospechosos": [], "top_ram": []}
+
+    # Obtener estadísticas
+    if not procesos:
+        return estadisticas
+
+    estadisticas["top_ram"] = heapq.nlargest(top, procesos, key=lambda p: p["ram_mb"])
+
+    # Procesos procesados
+    procesos_con_recursos = [p for p in procesos if p["ram_mb"] > 0 or p["cpu"] > 0]
+
+    if not procesos_con_recursos:
+        return estadisticas
+
+    # math.fsum da la suma correctamente redondeada: mismo resultado en ambos motores
+    ram_values = [p["ram_mb"] for p in procesos_con_recursos]
+    ram_promedio = math.fsum(ram_values) / len(ram_values)
+    diferencias = [x - ram_promedio for x in ram_values]
+    ram_desv = math.sqrt(math.fsum(d * d for d in diferencias) / len(ram_values))
+
+    cpu_values = [p["cpu"] for p in procesos_con_recursos if p["cpu"] > 0]
+    cpu_promedio = math.fsum(cpu_values) / len(cpu_values) if cpu_values else 0
+
+    # Procesos con mucha más RAM que la media y >500 MB, o >10% CPU
+    sospechosos = []
+    for proc in procesos_con_recursos:
+        razon_ram = proc["ram_mb"] / ram_promedio if ram_promedio > 0 else 0
+
+        if (proc["ram_mb"] > 500 and razon_ram > 2) or proc["cpu"] > 10:
+            sospechosos.append({
+                "nombre": proc["nombre"],
+                "ram_mb": proc["ram_mb"],
+                "cpu": proc["cpu"],
+                "razon": _razon_sospecha(proc["ram_mb"])
+            })
+
+    estadisticas.update({
+        "ram_promedio": ram_promedio,
+        "ram_desv": ram_desv,
+        "cpu_promedio": cpu_promedio,
+        "sospechosos": sorted(sospechosos, key=lambda x: x["ram_mb"], reverse=True)
+    })
+    return estadisticas
+
+
+def _orden_descendente(np, valores, indices):
+    """Índices ordenados por valor descendente, conservando el orden original en empates (como sorted)"""
+    return indices[np.argsort(-valores[indices], kind="stable")]
+
+
+def _estadisticas_numpy(procesos, top):
+    import numpy as np
+
+    estadisticas = {"ram_promedio": 0, "ram_desv": 0, "cpu_promedio": 0, "sospechosos": [], "top_ram": []}
+    if not procesos:
+        return estadisticas
+
+    n = len(procesos)
+    ram = np.fromiter(map(operator.itemgetter("ram_mb"), procesos), dtype=np.float64, count=n)
+    cpu = np.fromiter(map(operator.itemgetter("cpu"), procesos), dtype=np.float64, count=n)
+
+    # Top por RAM: np.partition da el umbral; se ordenan solo los candidatos (empates incluidos)
+    k = min(top, n)
+    if k > 0:
+        umbral = np.partition(ram, n - k)[n - k]
+        candidatos = _orden_descendente(np, ram, np.flatnonzero(ram >= umbral))[:k]
+        estadisticas["top_ram"] = [procesos[i] for i in candidatos.tolist()]
+
+    con_recursos = np.flatnonzero((ram > 0) | (cpu > 0))
+    if con_recursos.size == 0:
+        return estadisticas
+
+    ram_r = ram[con_recursos]
+    cpu_r = cpu[con_recursos]
+
+    ram_promedio = math.fsum(ram_r.tolist()) / ram_r.size
+    diferencias = ram_r - ram_promedio
+    ram_desv = math.sqrt(math.fsum((diferencias * diferencias).tolist()) / ram_r.size)
+
+    cpu_activos = cpu_r[cpu_r > 0]
+    cpu_promedio = math.fsum(cpu_activos.tolist()) / cpu_activos.size if cpu_activos.size else 0
+
+    razon_ram = ram_r / ram_promedio if ram_promedio > 0 else np.zeros_like(ram_r)
+    marcados = con_recursos[((ram_r > 500) & (razon_ram > 2)) | (cpu_r > 10)]
+
+    estadisticas.update({
+        "ram_promedio": ram_promedio,
+        "ram_desv": ram_desv,
+        "cpu_promedio": cpu_promedio,
+        "sospechosos": [
+            {
+                "nombre": procesos[i]["nombre"],
+                "ram_mb": procesos[i]["ram_mb"],
+                "cpu": procesos[i]["cpu"],
+                "razon": _razon_sospecha(procesos[i]["ram_mb"])
+            }
+            for i in _orden_descendente(np, ram, marcados).tolist()
+        ]
+    })
+    return estadisticas
+
+
+def estadisticas_procesos(procesos, motor=None, top=5):
+    """
+    Calcula de una vez las estadísticas de la tabla de procesos: media y
+    desviación de RAM, media de CPU, procesos sospechosos y top por RAM.
+    `motor` es "python" o "numpy" (por defecto, "motor_analisis" de la config);
+    los dos dan exactamente el mismo resultado. Si NumPy no está instalado
+    se usa el motor de Python.
+    """
+    motor = motor or cargar_config().get("motor_analisis", "python")
+
+    if motor == "numpy":
+        try:
+            return _estadisticas_numpy(procesos, top)
+        except ImportError:
+            pass
+    return _estadisticas_python(procesos, top)
+
+
+def detectar_procesos_sospechosos(procesos, motor=None):
+    """Detecta procesos que consumen recursos anormales"""
+    return estadisticas_procesos(procesos, motor)["sospechosos"]
+
+def _resumen_cambios(anteriores, actuales, diferencias, parcial):
+    """Lo que se guarda en el snapshot y muestra el reporte de la comparación con el análisis anterior"""
+    por_nombre = [] if parcial else diferenciar_procesos(anteriores, actuales, por_nombre=True)["cambiados"]
+    por_nombre = [c for c in por_nombre if c["delta"]["ram_mb"] or c["delta"]["instancias"]]
+    mayores = heapq.nlargest(5, por_nombre, key=lambda c: abs(c["delta"]["ram_mb"]))
+
+    return {
+        "parcial": parcial,
+        "iniciados": len(diferencias["iniciados"]),
+        "terminados": len(diferencias["terminados"]),
+        "cambiados": len(diferencias["cambiados"]),
+        "mayores_cambios_por_nombre": [
+            {
+                "nombre": c["nombre"],
+                "delta_ram_mb": c["delta"]["ram_mb"],
+                "delta_instancias": c["delta"]["instancias"]
+            }
+            for c in mayores
+        ]
+    }
+
+
+def analisis_avanzado(snapshot, historial, incrementales=None, procesos_anteriores=None, detector=None):
+    """
+    Análisis avanzado y preciso del sistema.
+    `procesos_anteriores` es la tabla completa del análisis anterior; si no se
+    conoce se usa la del último snapshot guardado, que solo tiene el top-K, y
+    entonces los procesos iniciados/terminados no son fiables y no se informan.
+    """
+    incrementales = incrementales or obtener_estadisticas_incrementales()
+    detector = detector or obtener_detector_fugas()
+
+    parcial = procesos_anteriores is None
+    if parcial:
+        procesos_anteriores = historial[-1]["procesos"] if historial else []
+    diferencias = diferenciar_procesos(procesos_anteriores, snapshot["procesos"])
+    if parcial:
+        diferencias["iniciados"] = []
+        diferencias["terminados"] = []
+
+    tendencia_cpu, tendencia_ram, procesos_crecientes = analizar_tendencias(snapshot, incrementales, diferencias)
+
+    # Ritmo de crecimiento (regresión sobre la ventana) y fugas lentas que el diff no ve
+    pendientes = detector.pendientes_por_pid()
+    for proc in procesos_crecientes:
+        proc["mb_hora"] = pendientes.get(proc["pid"])
+
+    config_fugas = cargar_deteccion_fugas()
+    ya_incluidos = {proc["pid"] for proc in procesos_crecientes}
+    for fuga in detector.fugas(config_fugas["umbral_mb_hora"], config_fugas["min_muestras"]):
+        if fuga["pid"] not in ya_incluidos:
+            procesos_crecientes.append({
+                "nombre": fuga["nombre"],
+                "pid": fuga["pid"],
+                "ram_anterior": fuga["ram_inicial"],
+                "ram_actual": fuga["ram_actual"],
+                "mb_hora": fuga["mb_hora"]
+            })
+    estadisticas = estadisticas_procesos(snapshot["procesos"])
+    sospechosos = estadisticas["sospechosos"]
+    
+    # Procesos frecuentes (top 5 por RAM)
+    procesos_frecuentes = [p["nombre"] for p in estadisticas["top_ram"]]
+    
+    # Promedios históricos (línea base incremental)
+    cpu_promedio = incrementales.media("cpu_percent")
+    ram_promedio = incrementales.media("ram_percent")
+    if cpu_promedio is None:
+        cpu_promedio = snapshot["cpu_percent"]
+        ram_promedio = snapshot["ram_percent"]
+
+    # Valores muy por encima de lo habitual según la varianza observada
+    anomalias = incrementales.anomalias(snapshot["cpu_percent"], snapshot["ram_percent"], snapshot["procesos"])
+    
+    # Determinar riesgo
+    riesgo = "BAJO"
+    if len(sospechosos) > 3:
+        riesgo = "ALTO"
+    elif len(sospechosos) > 0:
+        riesgo = "MEDIO"
+    elif snapshot["cpu_percent"] > 80 or snapshot["ram_percent"] > 85:
+        riesgo = "MEDIO"
+    elif anomalias:
+        riesgo = "MEDIO"
+    
+    # Recomendaciones
+    recomendaciones = []
+    if snapshot["cpu_percent"] > 80:
+        recomendaciones.append("CPU muy alta. Considera cerrar aplicaciones innecesarias.")
+    if snapshot["ram_percent"] > 85:
+        recomendaciones.append("RAM muy alta. Reinicia el sistema si es posible.")
+    if len(sospechosos) > 0:
+        recomendaciones.append(f"Detectados {len(sospechosos)} proceso(s) con alto consumo de recursos.")
+    for anomalia in anomalias:
+        recomendaciones.append(
+            f"{anomalia['nombre']} fuera de lo habitual: {anomalia['valor']} "
+            f"(media {anomalia['media']} ± {anomalia['desviacion']})."
+        )
+    if not recomendaciones:
+        recomendaciones.append("El sistema funciona correctamente.")
+    
+    return {
+        "tendencias": {
+            "cpu": tendencia_cpu,
+            "ram": tendencia_ram,
+            "procesos_crecientes": procesos_crecientes
+        },
+        "sospechosos_persistentes": sospechosos,
+        "anomalias": anomalias,
+        "huella_del_sistema": {
+            "cpu_promedio": round(cpu_promedio, 2),
+            "ram_promedio": round(ram_promedio, 2),
+            "cpu_desviacion": round(incrementales.desviacion("cpu_percent") or 0, 2),
+            "ram_desviacion": round(incrementales.desviacion("ram_percent") or 0, 2),
+            "procesos_frecuentes": procesos_frecuentes,
+            "procesos_pesados_constantes": procesos_frecuentes[:3]
+        },
+        "procesos_nuevos": [p["nombre"] for p in heapq.nlargest(3, diferencias["iniciados"], key=lambda p: p["ram_mb"])],
+        "cambios_procesos": _resumen_cambios(procesos_anteriores, snapshot["procesos"], diferencias, parcial),
+        "score_detallado": {
+            "riesgo_sistema": riesgo
+        },
+        "resumen_historico": {
+            "24h": resumen_periodo(24),
+            "7d": resumen_periodo(24 * 7),
+            "30d": resumen_periodo(24 * 30)
+        },
+        "recomendaciones": recomendaciones
+    }
+
+# ============================================================
+# GENERAR REPORTES HTML
+# ============================================================
+
+REPORTES_DIR = os.path.join(DATA_DIR, "reportes")
+os.makedirs(REPORTES_DIR, exist_ok=True)
+
+REPORTES_CSS = "prismov.css"
+
+# Estilos del dashboard. Se escriben una sola vez junto a los reportes y el
+# dashboard los enlaza en lugar de llevar su propia copia.
+ESTILO_REPORTE = """* {
+    margin: 0;
+    padding: 0;
+    box-sizing: border-box;
+}
+body {
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    padding: 20px;
+    min-height: 100vh;
+}
+.container {
+    max-width: 1000px;
+    margin: 0 auto;
+    background: white;
+    border-radius: 10px;
+    box-shadow: 0 10px 40px rgba(0,0,0,0.2);
+    overflow: hidden;
+}
+.header {
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    color: white;
+    padding: 30px;
+    text-align: center;
+}
+.header h1 {
+    font-size: 32px;
+    margin-bottom: 10px;
+}
+.header p {
+    font-size: 14px;
+    opacity: 0.9;
+}
+.content {
+    padding: 30px;
+}
+.section {
+    margin-bottom: 30px;
+    border-bottom: 1px solid #eee;
+    padding-bottom: 20px;
+}
+.section:last-child {
+    border-bottom: none;
+}
+.section h2 {
+    color: #667eea;
+    font-size: 20px;
+    margin-bottom: 15px;
+    display: flex;
+    align-items: center;
+    gap: 10px;
+}
+.stats {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+    gap: 15px;
+    margin-bottom: 20px;
+}
+.stat-card {
+    background: #f5f5f5;
+    padding: 20px;
+    border-radius: 8px;
+    text-align: center;
+}
+.stat-card .label {
+    color: #666;
+    font-size: 12px;
+    text-transform: uppercase;
+    margin-bottom: 8px;
+}
+.stat-card .value {
+    font-size: 28px;
+    font-weight: bold;
+    color: #667eea;
+}
+.stat-card .unit {
+    font-size: 14px;
+    color: #999;
+}
+.risk-box {
+    background: var(--fondo-riesgo);
+    border-left: 5px solid var(--color-riesgo);
+    padding: 20px;
+    border-radius: 5px;
+    margin: 15px 0;
+}
+.risk-box .risk-label {
+    font-size: 12px;
+    color: #666;
+    text-transform: uppercase;
+    margin-bottom: 5px;
+}
+.risk-box .risk-value {
+    font-size: 24px;
+    font-weight: bold;
+    color: var(--color-riesgo);
+}
+table {
+    width: 100%;
+    border-collapse: collapse;
+    margin: 15px 0;
+}
+table th {
+    background: #f5f5f5;
+    padding: 12px;
+    text-align: left;
+    font-weight: 600;
+    color: #333;
+    border-bottom: 2px solid #ddd;
+}
+table td {
+    padding: 12px;
+    border-bottom: 1px solid #eee;
+}
+table tr:hover {
+    background: #f9f9f9;
+}
+.trend-good {
+    color: #4CAF50;
+    font-weight: bold;
+}
+.trend-warning {
+    color: #FF9800;
+    font-weight: bold;
+}
+.trend-danger {
+    color: #F44336;
+    font-weight: bold;
+}
+ul {
+    margin-left: 20px;
+    margin-top: 10px;
+}
+ul li {
+    margin-bottom: 8px;
+    color: #333;
+}
+.footer {
+    background: #f5f5f5;
+    padding: 20px;
+    text-align: center;
+    color: #999;
+    font-size: 12px;
+    border-top: 1px solid #eee;
+}
+.riesgo-bajo {
+    --color-riesgo: #4CAF50;
+    --fondo-riesgo: #E8F5E9;
+}
+.riesgo-medio {
+    --color-riesgo: #FF9800;
+    --fondo-riesgo: #FFF3E0;
+}
+.riesgo-alto {
+    --color-riesgo: #F44336;
+    --fondo-riesgo: #FFEBEE;
+}
+.rangos {
+    float: right;
+}
+.rangos button {
+    border: 1px solid #667eea;
+    background: white;
+    color: #667eea;
+    padding: 5px 12px;
+    border-radius: 4px;
+    cursor: pointer;
+    margin-left: 5px;
+}
+.rangos button.activo {
+    background: #667eea;
+    color: white;
+}
+.grafico {
+    width: 100%;
+    height: 260px;
+}
+.leyenda span {
+    margin-right: 15px;
+    font-size: 13px;
+    color: #555;
+}
+.leyenda i {
+    display: inline-block;
+    width: 12px;
+    height: 12px;
+    margin-right: 5px;
+    border-radius: 2px;
+}
+.stat-card .valor-riesgo {
+    color: var(--color-riesgo);
+}
+.vacio {
+    text-align: center;
+    color: #999;
+}
+"""
+
+_estilo_escrito = False
+
+# Los nombres de proceso se repiten de un reporte a otro: cachear el escapado
+# evita pasar las mismas cadenas por html.escape en cada análisis.
+_escapar = functools.lru_cache(maxsize=4096)(html.escape)
+
+def _compilar_plantilla(plantilla):
+    """
+    Divide la plantilla en trozos fijos y claves. En el resultado los índices
+    pares son texto literal y los impares el nombre de la clave a rellenar.
+    """
+    return re.split(r"\{\{(\w+)\}\}", plantilla)
+
+def _renderizar(partes, valores):
+    salida = list(partes)
+    salida[1::2] = [valores[clave] for clave in partes[1::2]]
+    return "".join(salida)
+
+def _escribir_si_cambia(ruta, contenido):
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            actual = f.read()
+    except (OSError, UnicodeDecodeError):
+        actual = None
+    if actual != contenido:
+        tmp = ruta + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        os.replace(tmp, ruta)
+
+def asegurar_estilo_reportes():
+    """Escribe prismov.css junto a los reportes si falta o está desactualizado"""
+    global _estilo_escrito
+    if _estilo_escrito:
+        return
+    _escribir_si_cambia(os.path.join(REPORTES_DIR, REPORTES_CSS), ESTILO_REPORTE)
+    _estilo_escrito = True
+
+def generar_reporte_html(snapshot):
+    """Genera un reporte HTML detallado y atractivo"""
+    a = snapshot["analisis_avanzado"]
+    esc = _escapar
+    timestamp = esc(snapshot["timestamp"])
+    
+    # Determinar color según riesgo
     riesgo = a["score_detallado"]["riesgo_sistema"]
     if riesgo == "BAJO":
         color_riesgo = "#4CAF50"  # Verde
@@ -415,10 +2798,10 @@ def generar_reporte_html(snapshot):
         for proc in a["sospechosos_persistentes"]:
             procesos_html += f"""
             <tr>
-                <td>{proc['nombre']}</td>
+                <td>{esc(proc['nombre'])}</td>
                 <td>{proc['ram_mb']:.2f} MB</td>
                 <td>{proc['cpu']:.2f}%</td>
-                <td>{proc['razon']}</td>
+                <td>{esc(proc['razon'])}</td>
             </tr>
             """
     else:
@@ -428,27 +2811,69 @@ def generar_reporte_html(snapshot):
     procesos_crec_html = ""
     if a["tendencias"]["procesos_crecientes"]:
         for proc in a["tendencias"]["procesos_crecientes"]:
+            mb_hora = proc.get("mb_hora")
             procesos_crec_html += f"""
             <tr>
-                <td>{proc['nombre']}</td>
+                <td>{esc(proc['nombre'])}</td>
                 <td>{proc['ram_anterior']:.2f} MB</td>
                 <td>{proc['ram_actual']:.2f} MB</td>
                 <td>↑ +{proc['ram_actual'] - proc['ram_anterior']:.2f} MB</td>
+                <td>{f"{mb_hora:+.1f} MB/h" if mb_hora is not None else "—"}</td>
             </tr>
             """
     else:
-        procesos_crec_html = "<tr><td colspan='4' style='text-align:center; color:#999;'>✓ Ninguno detectado</td></tr>"
+        procesos_crec_html = "<tr><td colspan='5' style='text-align:center; color:#999;'>✓ Ninguno detectado</td></tr>"
     
+    # Cambios desde el análisis anterior
+    cambios = a.get("cambios_procesos")
+    if cambios and not cambios["parcial"]:
+        resumen_cambios_html = (
+            f"<p>{cambios['iniciados']} proceso(s) iniciado(s), {cambios['terminados']} terminado(s) "
+            f"y {cambios['cambiados']} con cambios.</p>"
+        )
+    else:
+        resumen_cambios_html = "<p style='color:#999;'>Sin análisis anterior completo en esta sesión.</p>"
+
+    cambios_html = ""
+    for c in (cambios or {}).get("mayores_cambios_por_nombre", []):
+        cambios_html += f"""
+            <tr>
+                <td>{esc(c['nombre'])}</td>
+                <td>{c['delta_instancias']:+.0f}</td>
+                <td>{c['delta_ram_mb']:+.2f} MB</td>
+            </tr>
+            """
+    if not cambios_html:
+        cambios_html = "<tr><td colspan='3' style='text-align:center; color:#999;'>✓ Sin cambios</td></tr>"
+
     # Procesos frecuentes
     procesos_freq_html = ""
     if a["huella_del_sistema"]["procesos_frecuentes"]:
         for proc in a["huella_del_sistema"]["procesos_frecuentes"]:
-            procesos_freq_html += f"<li>{proc}</li>"
+            procesos_freq_html += f"<li>{esc(proc)}</li>"
     
+    # Histórico (desde el nivel de agregados más barato para cada periodo)
+    historico_html = ""
+    periodos = {"24h": "Últimas 24 horas", "7d": "Últimos 7 días", "30d": "Últimos 30 días"}
+    for clave, etiqueta in periodos.items():
+        r = a.get("resumen_historico", {}).get(clave)
+        if not r:
+            continue
+        historico_html += f"""
+            <tr>
+                <td>{etiqueta}</td>
+                <td>{r['cpu_percent']['avg']:.1f}% / {r['cpu_percent']['p95']:.1f}% / {r['cpu_percent']['max']:.1f}%</td>
+                <td>{r['ram_percent']['avg']:.1f}% / {r['ram_percent']['p95']:.1f}% / {r['ram_percent']['max']:.1f}%</td>
+                <td>{r['muestras']}</td>
+            </tr>
+            """
+    if not historico_html:
+        historico_html = "<tr><td colspan='4' style='text-align:center; color:#999;'>Sin datos históricos</td></tr>"
+
     # Recomendaciones
     recomendaciones_html = ""
     for rec in a["recomendaciones"]:
-        recomendaciones_html += f"<li>{rec}</li>"
+        recomendaciones_html += f"<li>{esc(rec)}</li>"
     
     html = f"""
     <!DOCTYPE html>
@@ -606,179 +3031,1293 @@ def generar_reporte_html(snapshot):
         </style>
     </head>
     <body>
-        <div class="container">
-            <div class="header">
-                <h1>📊 PRISMOV</h1>
-                <p>Informe de Análisis del Sistema</p>
-                <p>{timestamp}</p>
-            </div>
-            
-            <div class="content">
-                <!-- RESUMEN RÁPIDO -->
-                <div class="section">
-                    <h2>⚡ Resumen Rápido</h2>
-                    <div class="stats">
-                        <div class="stat-card">
-                            <div class="label">Uso de CPU</div>
-                            <div class="value">{snapshot['cpu_percent']:.1f}<span class="unit">%</span></div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="label">Uso de RAM</div>
-                            <div class="value">{snapshot['ram_percent']:.1f}<span class="unit">%</span></div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="label">Procesos Activos</div>
-                            <div class="value">{len(snapshot['procesos'])}</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="label">Riesgo del Sistema</div>
-                            <div class="value" style="color: {color_riesgo};">{riesgo}</div>
-                        </div>
+        <div class="container">
+            <div class="header">
+                <h1>📊 PRISMOV</h1>
+                <p>Informe de Análisis del Sistema</p>
+                <p>{timestamp}</p>
+            </div>
+            
+            <div class="content">
+                <!-- RESUMEN RÁPIDO -->
+                <div class="section">
+                    <h2>⚡ Resumen Rápido</h2>
+                    <div class="stats">
+                        <div class="stat-card">
+                            <div class="label">Uso de CPU</div>
+                            <div class="value">{snapshot['cpu_percent']:.1f}<span class="unit">%</span></div>
+                        </div>
+                        <div class="stat-card">
+                            <div class="label">Uso de RAM</div>
+                            <div class="value">{snapshot['ram_percent']:.1f}<span class="unit">%</span></div>
+                        </div>
+                        <div class="stat-card">
+                            <div class="label">Procesos Activos</div>
+                            <div class="value">{len(snapshot['procesos']) + snapshot.get('otros_procesos', {}).get('cantidad', 0)}</div>
+                        </div>
+                        <div class="stat-card">
+                            <div class="label">Riesgo del Sistema</div>
+                            <div class="value" style="color: {color_riesgo};">{riesgo}</div>
+                        </div>
+                    </div>
+                </div>
+
+                <!-- EVALUACIÓN DE RIESGO -->
+                <div class="section">
+                    <h2>⚠️ Evaluación de Riesgo</h2>
+                    <div class="risk-box">
+                        <div class="risk-label">Nivel de Riesgo del Sistema</div>
+                        <div class="risk-value">{riesgo}</div>
+                    </div>
+                </div>
+
+                <!-- TENDENCIAS -->
+                <div class="section">
+                    <h2>📈 Tendencias</h2>
+                    <table>
+                        <tr>
+                            <th>Recurso</th>
+                            <th>Tendencia</th>
+                            <th>Media móvil (EWMA ± desviación)</th>
+                        </tr>
+                        <tr>
+                            <td>CPU</td>
+                            <td><span class="trend-good">{esc(a['tendencias']['cpu'])}</span></td>
+                            <td>{a['huella_del_sistema']['cpu_promedio']:.2f}% ± {a['huella_del_sistema'].get('cpu_desviacion', 0):.2f}</td>
+                        </tr>
+                        <tr>
+                            <td>RAM</td>
+                            <td><span class="trend-good">{esc(a['tendencias']['ram'])}</span></td>
+                            <td>{a['huella_del_sistema']['ram_promedio']:.2f}% ± {a['huella_del_sistema'].get('ram_desviacion', 0):.2f}</td>
+                        </tr>
+                    </table>
+                </div>
+
+                <!-- HISTÓRICO -->
+                <div class="section">
+                    <h2>🗓️ Histórico</h2>
+                    <table>
+                        <tr>
+                            <th>Periodo</th>
+                            <th>CPU (media / p95 / máx)</th>
+                            <th>RAM (media / p95 / máx)</th>
+                            <th>Muestras</th>
+                        </tr>
+                        {historico_html}
+                    </table>
+                </div>
+
+                <!-- PROCESOS SOSPECHOSOS -->
+                <div class="section">
+                    <h2>🕵️ Procesos con Alto Consumo</h2>
+                    <table>
+                        <tr>
+                            <th>Nombre del Proceso</th>
+                            <th>Memoria (MB)</th>
+                            <th>CPU (%)</th>
+                            <th>Razón</th>
+                        </tr>
+                        {procesos_html}
+                    </table>
+                </div>
+
+                <!-- PROCESOS CON AUMENTO DE RECURSOS -->
+                <div class="section">
+                    <h2>📊 Procesos con Aumento de Recursos</h2>
+                    <table>
+                        <tr>
+                            <th>Proceso</th>
+                            <th>RAM Anterior (MB)</th>
+                            <th>RAM Actual (MB)</th>
+                            <th>Cambio</th>
+                            <th>Crecimiento (MB/h)</th>
+                        </tr>
+                        {procesos_crec_html}
+                    </table>
+                </div>
+
+                <!-- CAMBIOS DESDE EL ANÁLISIS ANTERIOR -->
+                <div class="section">
+                    <h2>🔄 Cambios desde el Análisis Anterior</h2>
+                    {resumen_cambios_html}
+                    <table>
+                        <tr>
+                            <th>Programa</th>
+                            <th>Instancias</th>
+                            <th>Cambio de RAM</th>
+                        </tr>
+                        {cambios_html}
+                    </table>
+                </div>
+
+                <!-- PROCESOS PRINCIPALES -->
+                <div class="section">
+                    <h2>🔝 Procesos Principales</h2>
+                    <ul>
+                        {procesos_freq_html if procesos_freq_html else "<li>No hay procesos principales detectados</li>"}
+                    </ul>
+                </div>
+
+                <!-- RECOMENDACIONES -->
+                <div class="section">
+                    <h2>💡 Recomendaciones</h2>
+                    <ul>
+                        {recomendaciones_html}
+                    </ul>
+                </div>
+            </div>
+
+            <div class="footer">
+                <p>PRISMOV © 2026 - Sistema de Monitorización Avanzado del Sistema</p>
+                <p>Reporte generado automáticamente</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return html
+
+def guardar_reporte(snapshot):
+    """Guarda el reporte en HTML"""
+    html = generar_reporte_html(snapshot)
+    
+    # Nombre del archivo con timestamp
+    timestamp = snapshot["timestamp"].replace(":", "-").replace(" ", "_")
+    filename = f"reporte_{timestamp}.html"
+    filepath = os.path.join(REPORTES_DIR, filename)
+    
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(html)
+
+    obtener_catalogo_reportes().registrar(
+        filepath,
+        snapshot["timestamp"],
+        snapshot["analisis_avanzado"]["score_detallado"]["riesgo_sistema"]
+    )
+    
+    return filepath
+
+
+
+def generar_vista_previa_html(contenido_log, nombre_archivo):
+    html_template = f"""
+    <html>
+    <head>
+        <title>Log: {nombre_archivo}</title>
+        <style>
+            body {{ background-color: #1e1e1e; color: #d4d4d4; font-family: 'Consolas', monospace; padding: 20px; }}
+            .container {{ border-left: 3px solid #007acc; padding-left: 15px; white-space: pre-wrap; }}
+            h2 {{ color: #569cd6; border-bottom: 1px solid #333; padding-bottom: 10px; }}
+        </style>
+    </head>
+    <body>
+        <h2>Vista de Log: {nombre_archivo}</h2>
+        <div class="container">{contenido_log}</div>
+    </body>
+    </html>
+    """
+    import webbrowser
+
+    # Guardar temporalmente y abrir
+    with open("temp_log.html", "w", encoding="utf-8") as f:
+        f.write(html_template)
+    
+    webbrowser.open('file://' + os.path.realpath("temp_log.html"))
+
+def _extraer_reporte_archivado(filepath):
+    """Descomprime un reporte archivado en una carpeta temporal"""
+    carpeta = os.path.join(tempfile.gettempdir(), "prismov_reportes")
+    os.makedirs(carpeta, exist_ok=True)
+
+    destino = os.path.join(carpeta, os.path.basename(filepath)[:-len(".gz")])
+    with gzip.open(filepath, "rb") as origen, open(destino, "wb") as f:
+        shutil.copyfileobj(origen, f)
+    return destino
+
+def abrir_reporte(filepath):
+    """Abre el reporte en el navegador por defecto"""
+    import webbrowser
+
+    try:
+        if filepath.endswith(".gz"):
+            filepath = _extraer_reporte_archivado(filepath)
+        webbrowser.open(f"file:///{filepath.replace(chr(92), '/')}")
+        return True
+    except:
+        return False
+
+# ============================================================
+# CATÁLOGO DE REPORTES
+# ============================================================
+
+CATALOGO_REPORTES_PATH = os.path.join(REPORTES_DIR, "catalogo.jsonl")
+
+_PATRON_RIESGO_REPORTE = re.compile(r'class="risk-value">\s*([^<\s]+)\s*<')
+
+
+def _timestamp_de_reporte(nombre):
+    """'reporte_2026-01-01_12-00-00.html[.gz]' -> '2026-01-01 12:00:00'"""
+    base, _, extension = nombre.partition(".")
+    if not base.startswith("reporte_") or extension not in ("html", "html.gz"):
+        return None
+    fecha, _, hora = base[len("reporte_"):].partition("_")
+    timestamp = f"{fecha} {hora.replace('-', ':')}"
+    try:
+        datetime.datetime.strptime(timestamp, FORMATO_TIMESTAMP)
+    except ValueError:
+        return None
+    return timestamp
+
+
+class CatalogoReportes:
+    """
+    Índice de los reportes generados (timestamp, ruta, riesgo y tamaño).
+
+    Se guarda como JSON Lines junto a los reportes; cada reporte nuevo añade
+    una línea. En memoria se mantiene ordenado por timestamp, así que el último
+    reporte es O(1) y las búsquedas por fecha son una búsqueda binaria. Si el
+    archivo se pierde se reconstruye a partir de los reportes del directorio.
+    """
+
+    def __init__(self, ruta=CATALOGO_REPORTES_PATH, directorio=REPORTES_DIR):
+        self.ruta = ruta
+        self.directorio = directorio
+        self._lock = threading.RLock()
+        self._timestamps = []
+        self._entradas = []
+        self._por_riesgo = {}
+
+        if os.path.exists(ruta):
+            self._cargar()
+        else:
+            self.reconstruir()
+
+    def _cargar(self):
+        with open(self.ruta, "r", encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    self._insertar(json.loads(linea))
+                except (ValueError, KeyError, TypeError):
+                    continue  # Línea cortada por un cierre a medias
+
+    def _insertar(self, entrada):
+        timestamp = entrada["timestamp"]
+        i = bisect.bisect_left(self._timestamps, timestamp)
+
+        # Dos análisis en el mismo segundo sobrescriben el mismo archivo
+        if i < len(self._timestamps) and self._timestamps[i] == timestamp:
+            anterior = self._entradas[i]
+            self._por_riesgo[anterior["riesgo"]].remove(timestamp)
+            self._entradas[i] = entrada
+        else:
+            self._timestamps.insert(i, timestamp)
+            self._entradas.insert(i, entrada)
+        bisect.insort(self._por_riesgo.setdefault(entrada["riesgo"], []), timestamp)
+
+    def registrar(self, ruta, timestamp, riesgo, tamano=None):
+        entrada = {
+            "timestamp": timestamp,
+            "ruta": os.path.relpath(ruta, self.directorio),
+            "riesgo": riesgo,
+            "bytes": tamano if tamano is not None else os.path.getsize(ruta)
+        }
+        with self._lock:
+            self._insertar(entrada)
+            with open(self.ruta, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        return entrada
+
+    def ruta_absoluta(self, entrada):
+        return os.path.join(self.directorio, entrada["ruta"])
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def ultimo(self, riesgo=None):
+        with self._lock:
+            if riesgo is None:
+                return self._entradas[-1] if self._entradas else None
+            timestamps = self._por_riesgo.get(riesgo)
+            return self.buscar(timestamps[-1]) if timestamps else None
+
+    def buscar(self, timestamp):
+        """Reporte con ese timestamp o, si no lo hay, el más reciente anterior"""
+        with self._lock:
+            i = bisect.bisect_right(self._timestamps, timestamp)
+            return self._entradas[i - 1] if i else None
+
+    def rango(self, desde=None, hasta=None, riesgo=None):
+        with self._lock:
+            inicio = bisect.bisect_left(self._timestamps, desde) if desde else 0
+            fin = bisect.bisect_right(self._timestamps, hasta) if hasta else len(self._timestamps)
+            entradas = self._entradas[inicio:fin]
+        if riesgo is not None:
+            entradas = [e for e in entradas if e["riesgo"] == riesgo]
+        return entradas
+
+    def por_riesgo(self, riesgo):
+        with self._lock:
+            return [self.buscar(t) for t in self._por_riesgo.get(riesgo, [])]
+
+    def mover(self, entrada, ruta, tamano):
+        """Apunta una entrada a su nueva ubicación (por ejemplo, ya comprimida)"""
+        with self._lock:
+            entrada["ruta"] = os.path.relpath(ruta, self.directorio)
+            entrada["bytes"] = tamano
+
+    def eliminar(self, entrada):
+        with self._lock:
+            timestamp = entrada["timestamp"]
+            i = bisect.bisect_left(self._timestamps, timestamp)
+            if i < len(self._timestamps) and self._timestamps[i] == timestamp:
+                del self._timestamps[i]
+                del self._entradas[i]
+                self._por_riesgo[entrada["riesgo"]].remove(timestamp)
+
+    def guardar(self):
+        """Reescribe el catálogo completo, sin las líneas que ya no aplican"""
+        with self._lock:
+            tmp = self.ruta + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for e in self._entradas:
+                    f.write(json.dumps(e, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.ruta)
+
+    def reconstruir(self):
+        """Vuelve a generar el catálogo recorriendo los reportes del directorio"""
+        with self._lock:
+            self._timestamps, self._entradas, self._por_riesgo = [], [], {}
+
+            # Incluye los reportes comprimidos de archivo/AAAA-MM/
+            for carpeta, _, archivos in os.walk(self.directorio):
+                for nombre in archivos:
+                    timestamp = _timestamp_de_reporte(nombre)
+                    if timestamp is None:
+                        continue
+                    ruta = os.path.join(carpeta, nombre)
+                    abrir = gzip.open if nombre.endswith(".gz") else open
+                    try:
+                        with abrir(ruta, "rt", encoding="utf-8", errors="replace") as f:
+                            coincidencia = _PATRON_RIESGO_REPORTE.search(f.read())
+                        tamano = os.path.getsize(ruta)
+                    except (OSError, EOFError):
+                        continue
+                    self._insertar({
+                        "timestamp": timestamp,
+                        "ruta": os.path.relpath(ruta, self.directorio),
+                        "riesgo": coincidencia.group(1) if coincidencia else "DESCONOCIDO",
+                        "bytes": tamano
+                    })
+
+            self.guardar()
+
+
+_catalogo_reportes = None
+
+
+def obtener_catalogo_reportes():
+    global _catalogo_reportes
+    if _catalogo_reportes is None:
+        _catalogo_reportes = CatalogoReportes()
+    return _catalogo_reportes
+
+
+def ultimo_reporte(riesgo=None):
+    """Ruta del reporte más reciente (opcionalmente de un nivel de riesgo), o None"""
+    catalogo = obtener_catalogo_reportes()
+    entrada = catalogo.ultimo(riesgo)
+
+    # Si alguien ha borrado reportes a mano el catálogo ya no cuadra con el disco
+    if entrada is not None and not os.path.exists(catalogo.ruta_absoluta(entrada)):
+        catalogo.reconstruir()
+        entrada = catalogo.ultimo(riesgo)
+
+    return catalogo.ruta_absoluta(entrada) if entrada else None
+
+
+# ============================================================
+# RETENCIÓN DE REPORTES
+# ============================================================
+
+ARCHIVO_REPORTES_DIR = os.path.join(REPORTES_DIR, "archivo")
+
+_retencion_reportes_hilo = None
+
+
+def cargar_retencion_reportes():
+    config = cargar_config()
+    ret = config.get("retencion_reportes", {})
+
+    return {
+        # Reportes más recientes que se dejan sin comprimir
+        "recientes": ret.get("recientes", 50),
+        # Antigüedad y espacio total máximos (None = sin límite)
+        "max_dias": ret.get("max_dias", 365),
+        "max_mb": ret.get("max_mb", 200)
+    }
+
+
+def _comprimir_reporte(ruta, timestamp):
+    """Mueve un reporte a archivo/AAAA-MM/ comprimido con gzip y devuelve la nueva ruta"""
+    carpeta = os.path.join(ARCHIVO_REPORTES_DIR, timestamp[:7])
+    os.makedirs(carpeta, exist_ok=True)
+    destino = os.path.join(carpeta, os.path.basename(ruta) + ".gz")
+
+    tmp = destino + ".tmp"
+    with open(ruta, "rb") as origen, gzip.open(tmp, "wb") as f:
+        f.write(origen.read())
+    os.replace(tmp, destino)
+    os.remove(ruta)
+    return destino
+
+
+def _borrar_reporte(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def aplicar_retencion_reportes(ahora=None):
+    """
+    Comprime los reportes que quedan fuera de los `recientes` y borra los que
+    superan la antigüedad máxima o, empezando por los más antiguos, los que no
+    caben en el espacio máximo. El reporte más reciente nunca se borra.
+    """
+    ahora = ahora or datetime.datetime.now()
+    politica = cargar_retencion_reportes()
+    catalogo = obtener_catalogo_reportes()
+
+    entradas = catalogo.rango()
+    recientes = max(1, politica["recientes"])
+    antiguas, conservadas = entradas[:-recientes], entradas[-recientes:]
+
+    # Antigüedad máxima
+    if politica["max_dias"] is not None:
+        limite = (ahora - datetime.timedelta(days=politica["max_dias"])).strftime(FORMATO_TIMESTAMP)
+        while antiguas and antiguas[0]["timestamp"] < limite:
+            entrada = antiguas.pop(0)
+            _borrar_reporte(catalogo.ruta_absoluta(entrada))
+            catalogo.eliminar(entrada)
+
+    # Comprimir lo que no está entre los recientes
+    archivadas = []
+    for entrada in antiguas:
+        ruta = catalogo.ruta_absoluta(entrada)
+        if not ruta.endswith(".gz"):
+            try:
+                destino = _comprimir_reporte(ruta, entrada["timestamp"])
+            except FileNotFoundError:
+                catalogo.eliminar(entrada)
+                continue
+            catalogo.mover(entrada, destino, os.path.getsize(destino))
+        archivadas.append(entrada)
+
+    # Espacio máximo: se sacrifican primero los más antiguos
+    if politica["max_mb"] is not None:
+        presupuesto = politica["max_mb"] * 1024 * 1024
+        total = sum(e["bytes"] for e in archivadas) + sum(e["bytes"] for e in conservadas)
+        pendientes = archivadas + conservadas[:-1]
+        while total > presupuesto and pendientes:
+            entrada = pendientes.pop(0)
+            _borrar_reporte(catalogo.ruta_absoluta(entrada))
+            catalogo.eliminar(entrada)
+            total -= entrada["bytes"]
+
+    catalogo.guardar()
+
+    # Carpetas de archivo que se han quedado vacías
+    if os.path.isdir(ARCHIVO_REPORTES_DIR):
+        for nombre in os.listdir(ARCHIVO_REPORTES_DIR):
+            carpeta = os.path.join(ARCHIVO_REPORTES_DIR, nombre)
+            if os.path.isdir(carpeta) and not os.listdir(carpeta):
+                os.rmdir(carpeta)
+
+
+def programar_retencion_reportes():
+    """Lanza la retención de reportes en segundo plano si no hay otra en curso"""
+    global _retencion_reportes_hilo
+
+    if _retencion_reportes_hilo is not None and _retencion_reportes_hilo.is_alive():
+        return _retencion_reportes_hilo
+
+    def _trabajo():
+        try:
+            aplicar_retencion_reportes()
+        except Exception as e:
+            print("❌ Error al aplicar la retención de reportes:", e)
+
+    _retencion_reportes_hilo = threading.Thread(target=_trabajo, daemon=True)
+    _retencion_reportes_hilo.start()
+    return _retencion_reportes_hilo
+
+# ============================================================
+# DASHBOARD
+# ============================================================
+
+DASHBOARD_PATH = os.path.join(REPORTES_DIR, "dashboard.html")
+DASHBOARD_DATOS = "dashboard_datos.js"
+DASHBOARD_DATOS_PATH = os.path.join(REPORTES_DIR, DASHBOARD_DATOS)
+
+# Cuando el archivo de datos supera este tamaño se rehace desde los agregados
+DASHBOARD_MAX_BYTES = 2 * 1024 * 1024
+# Resolución de los datos al compactar: crudo el último día, por horas hasta
+# los 30 días y por días el resto
+DASHBOARD_DIAS_CRUDO = 1
+DASHBOARD_DIAS_HORA = 30
+
+MODOS_REPORTE = ("individual", "dashboard", "ambos")
+
+PLANTILLA_DASHBOARD = """<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>PRISMOV - Dashboard</title>
+    <link rel="stylesheet" href="{{hoja_estilos}}">
+    <script src="{{datos}}"></script>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>📊 PRISMOV</h1>
+            <p>Dashboard del Sistema</p>
+            <p id="ultimo-analisis"></p>
+        </div>
+
+        <div class="content">
+            <div class="section">
+                <h2>⚡ Último Análisis</h2>
+                <div class="stats">
+                    <div class="stat-card">
+                        <div class="label">Uso de CPU</div>
+                        <div class="value"><span id="cpu-actual">—</span><span class="unit">%</span></div>
+                    </div>
+                    <div class="stat-card">
+                        <div class="label">Uso de RAM</div>
+                        <div class="value"><span id="ram-actual">—</span><span class="unit">%</span></div>
+                    </div>
+                    <div class="stat-card">
+                        <div class="label">Procesos Activos</div>
+                        <div class="value" id="procesos-actual">—</div>
                     </div>
+                    <div class="stat-card" id="tarjeta-riesgo">
+                        <div class="label">Riesgo del Sistema</div>
+                        <div class="value valor-riesgo" id="riesgo-actual">—</div>
+                    </div>
+                </div>
+            </div>
+
+            <div class="section">
+                <div class="rangos">
+                    <button data-horas="24">24 horas</button>
+                    <button data-horas="168">7 días</button>
+                    <button data-horas="720">30 días</button>
+                    <button data-horas="0">Todo</button>
                 </div>
+                <h2>📈 CPU y RAM (%)</h2>
+                <canvas id="grafico-recursos" class="grafico"></canvas>
+                <div class="leyenda" id="leyenda-recursos"></div>
+            </div>
+
+            <div class="section">
+                <h2>🔝 Memoria de los Procesos Principales (MB)</h2>
+                <canvas id="grafico-procesos" class="grafico"></canvas>
+                <div class="leyenda" id="leyenda-procesos"></div>
+            </div>
+        </div>
+
+        <div class="footer">
+            <p>PRISMOV © 2026 - Sistema de Monitorización Avanzado del Sistema</p>
+            <p>Los datos se actualizan con cada análisis</p>
+        </div>
+    </div>
+
+    <script>
+    (function () {
+        var datos = (window.PRISMOV_DATOS || []).slice().sort(function (a, b) {
+            return a.t < b.t ? -1 : a.t > b.t ? 1 : 0;
+        });
+        var COLORES = ["#667eea", "#F44336", "#4CAF50", "#FF9800", "#9C27B0", "#00BCD4"];
+        var CLASES_RIESGO = {BAJO: "riesgo-bajo", MEDIO: "riesgo-medio", ALTO: "riesgo-alto"};
+
+        function fecha(t) {
+            return new Date(t.replace(" ", "T"));
+        }
+
+        function dibujar(canvas, series, maximo, unidad) {
+            var ratio = window.devicePixelRatio || 1;
+            var ancho = canvas.clientWidth, alto = canvas.clientHeight;
+            canvas.width = ancho * ratio;
+            canvas.height = alto * ratio;
+            var ctx = canvas.getContext("2d");
+            ctx.scale(ratio, ratio);
+            ctx.clearRect(0, 0, ancho, alto);
+
+            var margen = {izq: 50, der: 10, arr: 10, aba: 25};
+            var w = ancho - margen.izq - margen.der, h = alto - margen.arr - margen.aba;
+            var t0 = Infinity, t1 = -Infinity;
+            series.forEach(function (s) {
+                s.puntos.forEach(function (p) { t0 = Math.min(t0, p[0]); t1 = Math.max(t1, p[0]); });
+            });
+            if (t0 === Infinity) {
+                ctx.fillStyle = "#999";
+                ctx.fillText("Sin datos en este periodo", margen.izq + w / 2 - 60, margen.arr + h / 2);
+                return;
+            }
+            if (t1 === t0) { t1 = t0 + 1; }
+            maximo = maximo || 1;
+
+            ctx.font = "11px 'Segoe UI', sans-serif";
+            ctx.strokeStyle = "#eee";
+            ctx.fillStyle = "#666";
+            for (var i = 0; i <= 4; i++) {
+                var y = margen.arr + h - h * i / 4;
+                ctx.beginPath();
+                ctx.moveTo(margen.izq, y);
+                ctx.lineTo(margen.izq + w, y);
+                ctx.stroke();
+                ctx.fillText((maximo * i / 4).toFixed(0) + unidad, 5, y + 4);
+            }
+            ctx.fillText(new Date(t0).toLocaleString(), margen.izq, alto - 5);
+            var fin = new Date(t1).toLocaleString();
+            ctx.fillText(fin, margen.izq + w - ctx.measureText(fin).width, alto - 5);
+
+            series.forEach(function (s) {
+                ctx.strokeStyle = s.color;
+                ctx.lineWidth = 2;
+                ctx.beginPath();
+                s.puntos.forEach(function (p, j) {
+                    var x = margen.izq + (p[0] - t0) / (t1 - t0) * w;
+                    var y = margen.arr + h - Math.min(p[1], maximo) / maximo * h;
+                    if (j === 0) { ctx.moveTo(x, y); } else { ctx.lineTo(x, y); }
+                });
+                ctx.stroke();
+            });
+        }
+
+        function leyenda(id, series) {
+            document.getElementById(id).innerHTML = "";
+            series.forEach(function (s) {
+                var item = document.createElement("span");
+                item.innerHTML = "<i></i>";
+                item.firstChild.style.background = s.color;
+                item.appendChild(document.createTextNode(s.nombre));
+                document.getElementById(id).appendChild(item);
+            });
+        }
+
+        function mostrar(horas) {
+            var desde = horas ? Date.now() - horas * 3600 * 1000 : -Infinity;
+            var puntos = datos.filter(function (d) { return fecha(d.t).getTime() >= desde; });
+
+            var recursos = [
+                {nombre: "CPU", color: COLORES[0], puntos: []},
+                {nombre: "RAM", color: COLORES[1], puntos: []}
+            ];
+            var totales = {};
+            puntos.forEach(function (d) {
+                var t = fecha(d.t).getTime();
+                recursos[0].puntos.push([t, d.cpu]);
+                recursos[1].puntos.push([t, d.ram]);
+                Object.keys(d.top || {}).forEach(function (n) { totales[n] = (totales[n] || 0) + d.top[n]; });
+            });
+
+            var nombres = Object.keys(totales).sort(function (a, b) { return totales[b] - totales[a]; }).slice(0, 5);
+            var maximo = 0;
+            var procesos = nombres.map(function (n, i) {
+                var serie = {nombre: n, color: COLORES[(i + 2) % COLORES.length], puntos: []};
+                puntos.forEach(function (d) {
+                    if (d.top && d.top[n] !== undefined) {
+                        serie.puntos.push([fecha(d.t).getTime(), d.top[n]]);
+                        maximo = Math.max(maximo, d.top[n]);
+                    }
+                });
+                return serie;
+            });
+
+            dibujar(document.getElementById("grafico-recursos"), recursos, 100, "%");
+            leyenda("leyenda-recursos", recursos);
+            dibujar(document.getElementById("grafico-procesos"), procesos, maximo * 1.1, "");
+            leyenda("leyenda-procesos", procesos);
+
+            Array.prototype.forEach.call(document.querySelectorAll(".rangos button"), function (b) {
+                b.className = Number(b.getAttribute("data-horas")) === horas ? "activo" : "";
+            });
+        }
+
+        var ultimo = null;
+        for (var i = datos.length - 1; i >= 0 && !ultimo; i--) {
+            if (datos[i].riesgo) { ultimo = datos[i]; }
+        }
+        if (ultimo) {
+            document.getElementById("ultimo-analisis").textContent = ultimo.t;
+            document.getElementById("cpu-actual").textContent = ultimo.cpu.toFixed(1);
+            document.getElementById("ram-actual").textContent = ultimo.ram.toFixed(1);
+            document.getElementById("procesos-actual").textContent = ultimo.procesos;
+            document.getElementById("riesgo-actual").textContent = ultimo.riesgo;
+            document.body.className = CLASES_RIESGO[ultimo.riesgo] || "riesgo-alto";
+        }
+
+        var horas = Number(location.hash.slice(1) || 24);
+        Array.prototype.forEach.call(document.querySelectorAll(".rangos button"), function (b) {
+            b.onclick = function () {
+                horas = Number(b.getAttribute("data-horas"));
+                location.hash = horas;
+                mostrar(horas);
+            };
+        });
+        window.onresize = function () { mostrar(horas); };
+        mostrar(horas);
+
+        // Cada análisis añade una línea a los datos: recargar para verla
+        setTimeout(function () { location.reload(); }, 60000);
+    })();
+    </script>
+</body>
+</html>
+"""
+
+_dashboard_lock = threading.Lock()
+_dashboard_escrito = False
+
+
+def cargar_reportes():
+    config = cargar_config()
+    rep = config.get("reportes", {})
+
+    # "individual": un archivo HTML por análisis (por defecto)
+    # "dashboard": una sola página con los datos de cada análisis; "ambos": las dos cosas
+    modo = rep.get("modo", "individual")
+    return {"modo": modo if modo in MODOS_REPORTE else "individual"}
+
+
+def _completar_timestamp(clave):
+    """'2026-01-01 12' -> '2026-01-01 12:00:00' (inicio de un cubo de agregados)"""
+    return clave + "2000-01-01 00:00:00"[len(clave):]
+
+
+def _punto_de_cubo(cubo):
+    return {
+        "t": _completar_timestamp(cubo["inicio"]),
+        "cpu": cubo["cpu_percent"]["avg"],
+        "ram": cubo["ram_percent"]["avg"],
+        "top": {p["nombre"]: p["ram_mb_avg"] for p in cubo["top_procesos"]}
+    }
+
+
+def _punto_de_snapshot(snapshot):
+    top = heapq.nlargest(
+        TOP_PROCESOS_AGREGADOS,
+        _agrupar_por_nombre(snapshot.get("procesos", [])).items(),
+        key=lambda item: item[1][0]
+    )
+    punto = {
+        "t": snapshot["timestamp"],
+        "cpu": snapshot["cpu_percent"],
+        "ram": snapshot["ram_percent"],
+        "procesos": len(snapshot.get("procesos", [])) + snapshot.get("otros_procesos", {}).get("cantidad", 0),
+        "top": {nombre: round(totales[0], 2) for nombre, totales in top}
+    }
+    riesgo = snapshot.get("analisis_avanzado", {}).get("score_detallado", {}).get("riesgo_sistema")
+    if riesgo:
+        punto["riesgo"] = riesgo
+    return punto
+
+
+def _linea_dashboard(punto):
+    return "PRISMOV_DATOS.push(" + json.dumps(punto, ensure_ascii=False, separators=(",", ":")) + ");\n"
+
+
+def compactar_dashboard(ahora=None):
+    """
+    Rehace el archivo de datos del dashboard con menos resolución para lo
+    antiguo: snapshots crudos del último día, cubos por hora hasta los 30 días
+    y cubos por día para el resto.
+    """
+    ahora = ahora or datetime.datetime.now()
+    un_segundo = datetime.timedelta(seconds=1)
+    inicio_crudo = (ahora - datetime.timedelta(days=DASHBOARD_DIAS_CRUDO)).replace(minute=0, second=0, microsecond=0)
+    inicio_hora = (ahora - datetime.timedelta(days=DASHBOARD_DIAS_HORA)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    puntos = [
+        _punto_de_cubo(c)
+        for c in _leer_agregados("dia", "0000-00-00 00:00:00", (inicio_hora - un_segundo).strftime(FORMATO_TIMESTAMP))
+    ]
+    puntos += [
+        _punto_de_cubo(c)
+        for c in _leer_agregados(
+            "hora", inicio_hora.strftime(FORMATO_TIMESTAMP), (inicio_crudo - un_segundo).strftime(FORMATO_TIMESTAMP)
+        )
+    ]
+    puntos += [_punto_de_snapshot(s) for s in LectorHistorial().rango(inicio_crudo.strftime(FORMATO_TIMESTAMP))]
+
+    with _dashboard_lock:
+        tmp = DASHBOARD_DATOS_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("var PRISMOV_DATOS = [];\n")
+            for punto in puntos:
+                f.write(_linea_dashboard(punto))
+        os.replace(tmp, DASHBOARD_DATOS_PATH)
+    return len(puntos)
+
+
+def actualizar_dashboard(snapshot):
+    """
+    Añade el snapshot a los datos del dashboard. La página solo se escribe la
+    primera vez (o si ha cambiado); cada análisis añade una línea a los datos.
+    """
+    global _dashboard_escrito
+
+    if not _dashboard_escrito:
+        asegurar_estilo_reportes()
+        _escribir_si_cambia(DASHBOARD_PATH, _renderizar(_compilar_plantilla(PLANTILLA_DASHBOARD), {
+            "hoja_estilos": REPORTES_CSS,
+            "datos": DASHBOARD_DATOS
+        }))
+        _dashboard_escrito = True
+
+    # La primera vez se genera con todo lo que ya hay en el historial
+    if not os.path.exists(DASHBOARD_DATOS_PATH):
+        compactar_dashboard()
+        return DASHBOARD_PATH
+
+    with _dashboard_lock:
+        with open(DASHBOARD_DATOS_PATH, "a", encoding="utf-8") as f:
+            f.write(_linea_dashboard(_punto_de_snapshot(snapshot)))
+        tamano = os.path.getsize(DASHBOARD_DATOS_PATH)
+
+    if tamano > DASHBOARD_MAX_BYTES:
+        compactar_dashboard()
+    return DASHBOARD_PATH
+
+# ============================================================
+# EXPORTACIÓN A PDF
+# ============================================================
+
+PDF_DIR = os.path.join(REPORTES_DIR, "pdf")
+
+# Filas por tabla: las tablas largas se parten en bloques de este tamaño para
+# que reportlab no tenga que medir y dividir una tabla enorme en cada página
+PDF_FILAS_POR_TABLA = 40
+PDF_LARGO_NOMBRE = 45
+# Flowables que se tienen preparados por delante de lo que se está maquetando
+PDF_FLOWABLES_POR_TRAMO = 32
+
+_exportador_pdf = None
+_exportador_pdf_lock = threading.Lock()
+
+
+def cargar_exportacion_pdf():
+    config = cargar_config()
+    pdf = config.get("pdf", {})
+
+    return {
+        # Exportar automáticamente cada análisis a PDF (en segundo plano)
+        "activo": pdf.get("activo", False),
+        "directorio": pdf.get("directorio", PDF_DIR)
+    }
+
+
+def _estilos_pdf():
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    estilos = getSampleStyleSheet()
+    estilos["Heading2"].keepWithNext = 1
+    estilos["Heading3"].keepWithNext = 1
+    return estilos
+
+
+def _tablas_pdf(cabecera, filas, anchos=None):
+    """Genera tablas de como mucho PDF_FILAS_POR_TABLA filas, repitiendo la cabecera"""
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    estilo = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#667eea")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f5f5f5")]),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#dddddd")),
+    ])
+
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) == PDF_FILAS_POR_TABLA:
+            yield Table([cabecera] + bloque, colWidths=anchos, repeatRows=1, style=estilo)
+            bloque = []
+    if bloque:
+        yield Table([cabecera] + bloque, colWidths=anchos, repeatRows=1, style=estilo)
+
+
+def _nombre_pdf(nombre):
+    nombre = nombre or "?"
+    return nombre if len(nombre) <= PDF_LARGO_NOMBRE else nombre[:PDF_LARGO_NOMBRE - 1] + "…"
+
+
+def _flowables_snapshot(snapshot, estilos, nivel="Heading2"):
+    """Flowables del reporte de un snapshot, en el mismo orden que el reporte HTML"""
+    from reportlab.platypus import Paragraph, Spacer
+
+    esc = _escapar
+    a = snapshot.get("analisis_avanzado") or {}
+    score = a.get("score_detallado", {})
+    otros = snapshot.get("otros_procesos", {})
+
+    yield Paragraph(
+        f"CPU {snapshot['cpu_percent']:.1f}% · RAM {snapshot['ram_percent']:.1f}% · "
+        f"{len(snapshot.get('procesos', [])) + otros.get('cantidad', 0)} procesos · "
+        f"Riesgo <b>{esc(score.get('riesgo_sistema', '—'))}</b>",
+        estilos["Normal"]
+    )
+    if a.get("tendencias"):
+        yield Paragraph(
+            f"Tendencia de CPU: {esc(a['tendencias']['cpu'])} · Tendencia de RAM: {esc(a['tendencias']['ram'])}",
+            estilos["Normal"]
+        )
+    yield Spacer(1, 6)
+
+    if a.get("sospechosos_persistentes"):
+        yield Paragraph("Procesos con alto consumo", estilos[nivel])
+        yield from _tablas_pdf(
+            ["Proceso", "Memoria (MB)", "CPU (%)", "Razón"],
+            (
+                [_nombre_pdf(p["nombre"]), f"{p['ram_mb']:.2f}", f"{p['cpu']:.2f}", p["razon"]]
+                for p in a["sospechosos_persistentes"]
+            )
+        )
+
+    crecientes = a.get("tendencias", {}).get("procesos_crecientes")
+    if crecientes:
+        yield Paragraph("Procesos con aumento de recursos", estilos[nivel])
+        yield from _tablas_pdf(
+            ["Proceso", "RAM anterior (MB)", "RAM actual (MB)", "Crecimiento (MB/h)"],
+            (
+                [
+                    _nombre_pdf(p["nombre"]),
+                    f"{p['ram_anterior']:.2f}",
+                    f"{p['ram_actual']:.2f}",
+                    f"{p['mb_hora']:+.1f}" if p.get("mb_hora") is not None else "—"
+                ]
+                for p in crecientes
+            )
+        )
+
+    if snapshot.get("procesos"):
+        yield Paragraph("Procesos", estilos[nivel])
+        filas = (
+            [str(p.get("pid", "")), _nombre_pdf(p["nombre"]), f"{p['cpu']:.2f}", f"{p['ram_mb']:.2f}"]
+            for p in snapshot["procesos"]
+        )
+        if otros.get("cantidad"):
+            filas = itertools.chain(filas, [[
+                "", f"Otros {otros['cantidad']} procesos", f"{otros['cpu']:.2f}", f"{otros['ram_mb']:.2f}"
+            ]])
+        yield from _tablas_pdf(["PID", "Proceso", "CPU (%)", "RAM (MB)"], filas)
+
+    if a.get("recomendaciones"):
+        yield Paragraph("Recomendaciones", estilos[nivel])
+        for rec in a["recomendaciones"]:
+            yield Paragraph(f"• {esc(rec)}", estilos["Normal"])
+
+
+def _construir_pdf(ruta, titulo, flowables):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    class DocumentoPorTramos(SimpleDocTemplate):
+        """
+        Recibe los flowables de un iterador y los va añadiendo por tramos a la
+        lista que maqueta `build`, desde el hook afterFlowable, para no tener
+        el documento entero en memoria.
+        """
+
+        def __init__(self, fuente, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._fuente = iter(fuente)
+            self.pendientes = []
+            self._rellenar()
+
+        def _rellenar(self):
+            self.pendientes.extend(itertools.islice(self._fuente, PDF_FLOWABLES_POR_TRAMO))
+
+        def afterFlowable(self, flowable):
+            if len(self.pendientes) < PDF_FLOWABLES_POR_TRAMO:
+                self._rellenar()
+
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = ruta + ".tmp"
+    documento = DocumentoPorTramos(flowables, tmp, pagesize=A4, title=titulo, author="PRISMOV")
+    documento.build(documento.pendientes)
+    os.replace(tmp, ruta)
+    return ruta
+
+
+def exportar_pdf(snapshot, ruta=None):
+    """Exporta el reporte de un snapshot a PDF y devuelve la ruta"""
+    from reportlab.platypus import Paragraph
+
+    if ruta is None:
+        nombre = "reporte_" + snapshot["timestamp"].replace(":", "-").replace(" ", "_") + ".pdf"
+        ruta = os.path.join(cargar_exportacion_pdf()["directorio"], nombre)
+
+    def flowables():
+        estilos = _estilos_pdf()
+        yield Paragraph("PRISMOV - Informe de Análisis del Sistema", estilos["Title"])
+        yield Paragraph(_escapar(snapshot["timestamp"]), estilos["Normal"])
+        yield from _flowables_snapshot(snapshot, estilos)
+
+    return _construir_pdf(ruta, f"PRISMOV {snapshot['timestamp']}", flowables())
+
+
+def exportar_pdf_rango(desde, hasta, ruta=None):
+    """
+    Exporta a un único PDF todos los snapshots del historial entre `desde` y
+    `hasta`. Los snapshots se leen y se maquetan de uno en uno, así que el
+    tamaño del rango no afecta a la memoria usada.
+    """
+    from reportlab.platypus import Paragraph
+
+    if ruta is None:
+        nombre = f"historico_{desde}_{hasta}".replace(":", "-").replace(" ", "_") + ".pdf"
+        ruta = os.path.join(cargar_exportacion_pdf()["directorio"], nombre)
+
+    def flowables():
+        estilos = _estilos_pdf()
+        yield Paragraph("PRISMOV - Histórico del Sistema", estilos["Title"])
+        yield Paragraph(f"Desde {_escapar(desde)} hasta {_escapar(hasta)}", estilos["Normal"])
+
+        vacio = True
+        for snapshot in LectorHistorial().rango(desde, hasta):
+            vacio = False
+            yield Paragraph(_escapar(snapshot["timestamp"]), estilos["Heading2"])
+            yield from _flowables_snapshot(snapshot, estilos, nivel="Heading3")
+        if vacio:
+            yield Paragraph("No hay snapshots en este periodo.", estilos["Normal"])
+
+    return _construir_pdf(ruta, f"PRISMOV {desde} - {hasta}", flowables())
+
+
+def _obtener_exportador_pdf():
+    global _exportador_pdf
+    with _exportador_pdf_lock:
+        if _exportador_pdf is None:
+            from concurrent.futures import ThreadPoolExecutor
+            # Un solo hilo: las exportaciones se hacen en orden y no compiten entre sí
+            _exportador_pdf = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prismov-pdf")
+        return _exportador_pdf
+
+
+def _avisar_error_pdf(futuro):
+    error = futuro.exception()
+    if error is not None:
+        print("❌ Error al exportar el PDF:", error)
+
+
+def exportar_pdf_en_segundo_plano(snapshot, ruta=None):
+    """Encola la exportación y devuelve un Future con la ruta del PDF"""
+    futuro = _obtener_exportador_pdf().submit(exportar_pdf, snapshot, ruta)
+    futuro.add_done_callback(_avisar_error_pdf)
+    return futuro
 
-                <!-- EVALUACIÓN DE RIESGO -->
-                <div class="section">
-                    <h2>⚠️ Evaluación de Riesgo</h2>
-                    <div class="risk-box">
-                        <div class="risk-label">Nivel de Riesgo del Sistema</div>
-                        <div class="risk-value">{riesgo}</div>
-                    </div>
-                </div>
 
-                <!-- TENDENCIAS -->
-                <div class="section">
-                    <h2>📈 Tendencias</h2>
-                    <table>
-                        <tr>
-                            <th>Recurso</th>
-                            <th>Tendencia</th>
-                            <th>Promedio (últimas 10 muestras)</th>
-                        </tr>
-                        <tr>
-                            <td>CPU</td>
-                            <td><span class="trend-good">{a['tendencias']['cpu']}</span></td>
-                            <td>{a['huella_del_sistema']['cpu_promedio']:.2f}%</td>
-                        </tr>
-                        <tr>
-                            <td>RAM</td>
-                            <td><span class="trend-good">{a['tendencias']['ram']}</span></td>
-                            <td>{a['huella_del_sistema']['ram_promedio']:.2f}%</td>
-                        </tr>
-                    </table>
-                </div>
+def exportar_pdf_rango_en_segundo_plano(desde, hasta, ruta=None):
+    futuro = _obtener_exportador_pdf().submit(exportar_pdf_rango, desde, hasta, ruta)
+    futuro.add_done_callback(_avisar_error_pdf)
+    return futuro
 
-                <!-- PROCESOS SOSPECHOSOS -->
-                <div class="section">
-                    <h2>🕵️ Procesos con Alto Consumo</h2>
-                    <table>
-                        <tr>
-                            <th>Nombre del Proceso</th>
-                            <th>Memoria (MB)</th>
-                            <th>CPU (%)</th>
-                            <th>Razón</th>
-                        </tr>
-                        {procesos_html}
-                    </table>
-                </div>
+# ============================================================
+# MONITOR EN VIVO
+# ============================================================
 
-                <!-- PROCESOS CON AUMENTO DE RECURSOS -->
-                <div class="section">
-                    <h2>📊 Procesos con Aumento de Recursos</h2>
-                    <table>
-                        <tr>
-                            <th>Proceso</th>
-                            <th>RAM Anterior (MB)</th>
-                            <th>RAM Actual (MB)</th>
-                            <th>Cambio</th>
-                        </tr>
-                        {procesos_crec_html}
-                    </table>
-                </div>
+def cargar_monitor_vivo():
+    config = cargar_config()
+    monitor = config.get("monitor_vivo", {})
 
-                <!-- PROCESOS PRINCIPALES -->
-                <div class="section">
-                    <h2>🔝 Procesos Principales</h2>
-                    <ul>
-                        {procesos_freq_html if procesos_freq_html else "<li>No hay procesos principales detectados</li>"}
-                    </ul>
-                </div>
+    return {
+        # Cada cuánto se toma una muestra de CPU y RAM
+        "refresco_ms": monitor.get("refresco_ms", 1000),
+        # Muestras que se conservan en memoria (600 a 1 Hz = 10 minutos)
+        "capacidad": monitor.get("capacidad", 600),
+        # Procesos que se muestran y cada cuántas muestras se recorre la tabla
+        "top_n": monitor.get("top_n", 5),
+        "top_cada": monitor.get("top_cada", 5)
+    }
 
-                <!-- RECOMENDACIONES -->
-                <div class="section">
-                    <h2>💡 Recomendaciones</h2>
-                    <ul>
-                        {recomendaciones_html}
-                    </ul>
-                </div>
-            </div>
 
-            <div class="footer">
-                <p>PRISMOV © 2026 - Sistema de Monitorización Avanzado del Sistema</p>
-                <p>Reporte generado automáticamente</p>
-            </div>
-        </div>
-    </body>
-    </html>
+class BufferCircular:
+    """
+    Buffer de tamaño fijo: al llenarse, cada valor nuevo sobrescribe el más
+    antiguo. La memoria no crece por mucho tiempo que esté abierto el monitor.
+    `total` cuenta todos los valores añadidos, también los ya sobrescritos,
+    y sirve para saber cuántos son nuevos desde la última lectura.
     """
-    
-    return html
 
-def guardar_reporte(snapshot):
-    """Guarda el reporte en HTML"""
-    html = generar_reporte_html(snapshot)
-    
-    # Nombre del archivo con timestamp
-    timestamp = snapshot["timestamp"].replace(":", "-").replace(" ", "_")
-    filename = f"reporte_{timestamp}.html"
-    filepath = os.path.join(REPORTES_DIR, filename)
-    
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(html)
-    
-    return filepath
+    def __init__(self, capacidad):
+        self.capacidad = max(1, int(capacidad))
+        self._valores = [0.0] * self.capacidad
+        self.total = 0
 
+    def agregar(self, valor):
+        self._valores[self.total % self.capacidad] = valor
+        self.total += 1
 
+    def __len__(self):
+        return min(self.total, self.capacidad)
 
-def generar_vista_previa_html(contenido_log, nombre_archivo):
-    html_template = f"""
-    <html>
-    <head>
-        <title>Log: {nombre_archivo}</title>
-        <style>
-            body {{ background-color: #1e1e1e; color: #d4d4d4; font-family: 'Consolas', monospace; padding: 20px; }}
-            .container {{ border-left: 3px solid #007acc; padding-left: 15px; white-space: pre-wrap; }}
-            h2 {{ color: #569cd6; border-bottom: 1px solid #333; padding-bottom: 10px; }}
-        </style>
-    </head>
-    <body>
-        <h2>Vista de Log: {nombre_archivo}</h2>
-        <div class="container">{contenido_log}</div>
-    </body>
-    </html>
+    def ultimos(self, n, hasta=None):
+        """
+        Los últimos `n` valores, del más antiguo al más reciente. Con `hasta`
+        se devuelven los anteriores al valor número `hasta` (sin incluirlo).
+        """
+        hasta = self.total if hasta is None else min(hasta, self.total)
+        n = min(n, hasta - (self.total - len(self)))
+        if n <= 0:
+            return []
+        inicio = (hasta - n) % self.capacidad
+        fin = inicio + n
+        if fin <= self.capacidad:
+            return self._valores[inicio:fin]
+        return self._valores[inicio:] + self._valores[:fin - self.capacidad]
+
+    def ultimo(self):
+        return self._valores[(self.total - 1) % self.capacidad] if self.total else None
+
+
+class MonitorVivo:
+    """
+    Muestreador ligero para el monitor en vivo. Un hilo toma CPU y RAM del
+    sistema cada `refresco_ms` y las guarda en buffers circulares; la tabla
+    de procesos, que es lo caro, solo se recorre cada `top_cada` muestras.
+    Usa sus propios contadores y su propio RegistroProcesos para no alterar
+    los deltas que mide ejecutar_analisis entre un análisis y el siguiente.
     """
-    # Guardar temporalmente y abrir
-    with open("temp_log.html", "w", encoding="utf-8") as f:
-        f.write(html_template)
-    
-    webbrowser.open('file://' + os.path.realpath("temp_log.html"))
 
-def abrir_reporte(filepath):
-    """Abre el reporte en el navegador por defecto"""
-    try:
-        webbrowser.open(f"file:///{filepath.replace(chr(92), '/')}")
-        return True
-    except:
-        return False
+    def __init__(self, politica=None):
+        politica = politica or cargar_monitor_vivo()
+        self.intervalo = max(0.1, politica["refresco_ms"] / 1000)
+        self.top_n = politica["top_n"]
+        self.top_cada = max(1, politica["top_cada"])
+
+        self._lock = threading.Lock()
+        self.cpu = BufferCircular(politica["capacidad"])
+        self.ram = BufferCircular(politica["capacidad"])
+        self.top = []
+
+        self._registro = RegistroProcesos()
+        self._tiempos_cpu = psutil.cpu_times()
+        self._hilo = None
+        self._parar = threading.Event()
+
+    def muestrear(self):
+        """Toma una muestra y la añade a los buffers"""
+        actual = psutil.cpu_times()
+        cpu = _porcentaje_cpu(self._tiempos_cpu, actual)
+        self._tiempos_cpu = actual
+        ram = psutil.virtual_memory().percent
+
+        top = None
+        if self.cpu.total % self.top_cada == 0:
+            top = heapq.nlargest(self.top_n, self._registro.recorrer(), key=lambda p: (p["cpu"], p["ram_mb"]))
+
+        with self._lock:
+            self.cpu.agregar(cpu)
+            self.ram.agregar(ram)
+            if top is not None:
+                self.top = top
+
+    def leer(self, vistos, maximo):
+        """
+        Devuelve (total, cpu nuevos, ram nuevos, top) con las muestras
+        añadidas desde que se habían leído `vistos`, como mucho `maximo`.
+        """
+        with self._lock:
+            total = self.cpu.total
+            nuevos = min(total - vistos, maximo)
+            return total, self.cpu.ultimos(nuevos), self.ram.ultimos(nuevos), list(self.top)
+
+    def historico(self, metrica, n, hasta):
+        """Las `n` muestras de "cpu" o "ram" anteriores a la número `hasta`, para redibujar desde cero"""
+        with self._lock:
+            return getattr(self, metrica).ultimos(n, hasta)
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        # Se vuelven a cebar los contadores: la primera muestra no abarca el tiempo parado
+        self._tiempos_cpu = psutil.cpu_times()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        if not self._hilo:
+            return
+        self._parar.set()
+        self._hilo.join()
+        self._hilo = None
+
+    def _bucle(self):
+        # Programado sobre el reloj monótono: el tiempo de muestrear no se acumula
+        siguiente = time.monotonic()
+        while True:
+            siguiente += self.intervalo
+            espera = siguiente - time.monotonic()
+            if espera < 0:
+                siguiente = time.monotonic()
+                espera = 0
+            if self._parar.wait(espera):
+                return
+            try:
+                self.muestrear()
+            except Exception as e:
+                print("❌ Error al muestrear el monitor en vivo:", e)
+
 
 # ============================================================
 # EJECUTAR ANÁLISIS
 # ============================================================
 
-def ejecutar_analisis(historial):
-    """Ejecuta un análisis completo y genera reporte"""
+# Snapshots anteriores que necesita analisis_avanzado
+MUESTRAS_ANALISIS = 1
+
+# Tabla completa de procesos del análisis anterior de este proceso, para el diff
+_tabla_procesos_anterior = None
+
+# Un solo análisis a la vez: lo pueden lanzar el menú, el planificador y la vigilancia
+_analisis_lock = threading.Lock()
+
+
+def ejecutar_analisis(historial=None, progreso=None, bloquear=True):
+    """
+    Ejecuta un análisis completo y genera reporte.
+    `historial` puede ser un LectorHistorial (por defecto) o, por compatibilidad,
+    una lista en memoria a la que se añade el nuevo snapshot.
+    `progreso`, si se pasa, recibe un texto corto al empezar cada fase.
+    Si ya hay un análisis en marcha espera a que termine; con bloquear=False
+    no espera y devuelve None.
+    """
+    if not _analisis_lock.acquire(blocking=bloquear):
+        return None
+    try:
+        return _ejecutar_analisis(historial, progreso)
+    finally:
+        _analisis_lock.release()
+
+
+def _ejecutar_analisis(historial, progreso):
+    global _tabla_procesos_anterior
+
+    avisar = progreso or (lambda mensaje: None)
+    if historial is None:
+        historial = LectorHistorial()
+
     print("🔥 DEBUG → entrando en ejecutar_analisis")
-    cpu = psutil.cpu_percent(interval=1)
+    avisar("Midiendo CPU, RAM y procesos")
+    cpu = leer_cpu()
     ram = psutil.virtual_memory().percent
     procesos = analizar_procesos()
 
@@ -789,44 +4328,61 @@ def ejecutar_analisis(historial):
         "procesos": procesos
     }
 
-    # Análisis avanzado con datos reales
-    analisis = analisis_avanzado(snapshot_base, historial)
+    # Análisis avanzado con datos reales (solo hacen falta los últimos snapshots)
+    avisar("Analizando")
+    if isinstance(historial, LectorHistorial):
+        recientes = historial.ultimos(MUESTRAS_ANALISIS)
+    else:
+        recientes = historial[-MUESTRAS_ANALISIS:]
+    config_fugas = cargar_deteccion_fugas()
+    obtener_detector_fugas().actualizar(
+        time.time(), procesos, config_fugas["ventana"], config_fugas["ram_minima_mb"]
+    )
+
+    analisis = analisis_avanzado(snapshot_base, recientes, procesos_anteriores=_tabla_procesos_anterior)
+    _tabla_procesos_anterior = procesos
+
+    # El análisis usa la tabla completa; en el snapshot solo se guarda el top-K
+    capturados, otros = capturar_procesos(procesos)
 
     snapshot = {
-        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": datetime.datetime.now().strftime(FORMATO_TIMESTAMP),
         "cpu_percent": cpu,
         "ram_percent": ram,
-        "procesos": procesos,
+        "procesos": capturados,
+        "otros_procesos": otros,
         "analisis_avanzado": analisis
     }
 
-    historial.append(snapshot)
-    guardar_historial(historial)
-
-    # Guardar reporte HTML
-    filepath_reporte = guardar_reporte(snapshot)
-
-    # Enviar a Telegram si está configurado
-    if telegram_configurado():
-        # Crear mensaje resumido para Telegram
-        a = snapshot["analisis_avanzado"]
-        mensaje = f"""
-📊 *PRISMOV - Informe Rápido*
-📅 {snapshot["timestamp"]}
+    avisar("Guardando en el historial")
+    if isinstance(historial, list):
+        historial.append(snapshot)
+    agregar_snapshot(snapshot)
+    aplicar_retencion_si_toca()
 
-🖥 *Recursos*
-• CPU: {snapshot["cpu_percent"]:.1f}%
-• RAM: {snapshot["ram_percent"]:.1f}%
+    # La línea base se actualiza después del análisis: no incluye el snapshot que se compara con ella
+    obtener_estadisticas_incrementales().actualizar(cpu, ram, procesos)
+    guardar_estadisticas_incrementales()
+    guardar_detector_fugas()
 
-📈 *Tendencias*
-• CPU: {a["tendencias"]["cpu"]}
-• RAM: {a["tendencias"]["ram"]}
+    # Guardar reporte HTML y/o actualizar el dashboard
+    avisar("Generando el reporte")
+    modo = cargar_reportes()["modo"]
+    filepath_reporte = None
+    if modo in ("individual", "ambos"):
+        filepath_reporte = guardar_reporte(snapshot)
+        programar_retencion_reportes()
+    if modo in ("dashboard", "ambos"):
+        ruta_dashboard = actualizar_dashboard(snapshot)
+        filepath_reporte = filepath_reporte or ruta_dashboard
 
-⚠️ *Riesgo: {a["score_detallado"]["riesgo_sistema"]}*
+    # El PDF se genera en segundo plano: no retrasa el análisis
+    if cargar_exportacion_pdf()["activo"]:
+        exportar_pdf_en_segundo_plano(snapshot)
 
-💾 Reporte completo guardado localmente.
-        """
-        enviar_telegram(mensaje)
+    # Telegram: se encola y lo envía el notificador en segundo plano
+    if telegram_configurado():
+        obtener_notificador_telegram().encolar(snapshot)
 
     return filepath_reporte
 
@@ -836,22 +4392,355 @@ def ejecutar_analisis(historial):
 # MODO AUTOMÁTICO
 # ============================================================
 
+# Sin acentos, para aceptar "miércoles" o "sábado" en la configuración
+_SIN_ACENTOS = str.maketrans("áéíóú", "aeiou")
+
+
+def _normalizar_dia(dia):
+    return dia.strip().lower().translate(_SIN_ACENTOS)
+
+
+def dias_desconocidos(dias):
+    """Nombres de la lista que no son un día de la semana ni DIAS_TODOS"""
+    validos = set(DIAS_SEMANA) | {DIAS_TODOS}
+    return [d for d in dias if _normalizar_dia(d) not in validos]
+
+
+def dias_programados(dias):
+    """
+    Días de la semana de la programación. Lanza ValueError si hay nombres
+    desconocidos: una errata en config.json no debe desactivar días sin avisar.
+    """
+    desconocidos = dias_desconocidos(dias)
+    if desconocidos:
+        raise ValueError(f"días no reconocidos: {', '.join(desconocidos)}")
+    dias = {_normalizar_dia(d) for d in dias}
+    if DIAS_TODOS in dias:
+        return set(DIAS_SEMANA)
+    return dias
+
+
+def _hora(texto):
+    return datetime.datetime.strptime(texto, "%H:%M").time()
+
+
+def proximo_disparo(prog, desde):
+    """
+    Primer momento posterior a `desde` en el que toca analizar según la
+    programación, o None si está desactivada. Los disparos van alineados a
+    hora_inicio + k * intervalo y caen dentro de la ventana [hora_inicio,
+    hora_fin]; si hora_fin es anterior a hora_inicio la ventana cruza la
+    medianoche y cuenta como del día en que empieza. Para analizar todos
+    los días hay que indicar DIAS_TODOS; sin días no hay disparos.
+    """
+    if not prog["activo"]:
+        return None
+
+    dias = dias_programados(prog["dias"])
+    if not dias:
+        return None
+    intervalo = datetime.timedelta(minutes=max(1, int(prog["intervalo_minutos"])))
+    h_inicio = _hora(prog["hora_inicio"])
+    h_fin = _hora(prog["hora_fin"])
+
+    # Desde el día anterior por si su ventana cruza la medianoche y sigue abierta
+    for desplazamiento in range(-1, 8):
+        dia = desde.date() + datetime.timedelta(days=desplazamiento)
+        if DIAS_SEMANA[dia.weekday()] not in dias:
+            continue
+
+        inicio = datetime.datetime.combine(dia, h_inicio)
+        fin = datetime.datetime.combine(dia, h_fin)
+        if fin < inicio:
+            fin += datetime.timedelta(days=1)
+
+        if desde < inicio:
+            candidato = inicio
+        else:
+            candidato = inicio + ((desde - inicio) // intervalo + 1) * intervalo
+        if candidato <= fin:
+            return candidato
+
+    return None
+
+
+# Tramo máximo de espera en consola: time.sleep no se puede despertar, así que
+# cada tanto se relee config.json por si la programación se cambió desde la GUI
+PLANIFICADOR_ESPERA_MAXIMA = 300
+
+# Planificadores en marcha, para avisarles cuando se guarda la programación
+_planificadores_activos = set()
+_planificadores_lock = threading.Lock()
+
+
+def avisar_planificadores():
+    with _planificadores_lock:
+        for planificador in list(_planificadores_activos):
+            planificador.despertar()
+
+
+class Planificador:
+    """
+    Ejecuta `tarea` en los momentos que marca la programación. Duerme hasta
+    el próximo disparo en lugar de despertarse cada intervalo, así que la
+    duración de la tarea no desplaza los siguientes disparos. Si un disparo
+    se pasa (la tarea tardó más que el intervalo o el equipo estuvo
+    suspendido) se ejecuta una sola vez con retraso, sin ponerse al día.
+
+    Espera de una vez hasta el próximo disparo (o sin límite si no hay
+    ninguno): guardar_programacion lo despierta para que recalcule. Con un
+    `esperar` que no se puede interrumpir (time.sleep) hay que pasar
+    `espera_maxima` para que la espera se parta en tramos y se noten los
+    cambios. `reloj` y `esperar` se pueden sustituir para probarlo sin esperar.
+    """
+
+    def __init__(self, tarea, reloj=datetime.datetime.now, esperar=None,
+                 al_programar=None, espera_maxima=None):
+        self.tarea = tarea
+        self.reloj = reloj
+        self.espera_maxima = espera_maxima
+        # Recibe el próximo disparo (o None) cada vez que cambia
+        self.al_programar = al_programar or (lambda proximo: None)
+
+        self._despertar = threading.Event()
+        self._parar = threading.Event()
+        self._esperar = esperar or self._esperar_evento
+        self._hilo = None
+        self.proximo = None
+
+    def _esperar_evento(self, segundos):
+        if self._despertar.wait(segundos):
+            self._despertar.clear()
+
+    def _tramo(self, segundos):
+        """Lo que se espera de una vez: `segundos` (None = hasta que lo despierten) o el máximo"""
+        if self.espera_maxima is None:
+            return segundos
+        return self.espera_maxima if segundos is None else min(segundos, self.espera_maxima)
+
+    def despertar(self):
+        self._despertar.set()
+
+    def ejecutar(self):
+        """Bucle del planificador; vuelve cuando se llama a detener()"""
+        with _planificadores_lock:
+            _planificadores_activos.add(self)
+        try:
+            self._bucle()
+        finally:
+            with _planificadores_lock:
+                _planificadores_activos.discard(self)
+
+    def _bucle(self):
+        referencia = self.reloj()
+        anunciado = False
+        while not self._parar.is_set():
+            try:
+                proximo = proximo_disparo(cargar_programacion(), referencia)
+            except (KeyError, TypeError, ValueError) as e:
+                print("❌ Error en la programación:", e)
+                proximo = None
+
+            if proximo != self.proximo or not anunciado:
+                self.proximo = proximo
+                self.al_programar(proximo)
+                anunciado = True
+
+            if proximo is None:
+                self._esperar(self._tramo(None))
+                continue
+
+            # En segundos reales: con timestamp() la resta tiene en cuenta el cambio de hora
+            restante = proximo.timestamp() - self.reloj().timestamp()
+            if restante > 0:
+                self._esperar(self._tramo(restante))
+                continue
+
+            try:
+                self.tarea()
+            except Exception as e:
+                print("❌ Error al ejecutar el análisis programado:", e)
+            referencia = max(proximo, self.reloj())
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self.ejecutar, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        self._despertar.set()
+        if self._hilo and self._hilo is not threading.current_thread():
+            self._hilo.join()
+        self._hilo = None
+
+
+def describir_disparo(proximo):
+    if proximo is None:
+        return "⏸ Programación desactivada o sin ventanas: se espera a que cambie."
+    return f"⏰ Próximo análisis: {proximo.strftime('%Y-%m-%d %H:%M')}"
+
+
 def iniciar_modo_automatico(historial):
-    while True:
-        prog = cargar_programacion()
+    # En consola se duerme con time.sleep: en Windows es lo que deja cortar con
+    # CTRL+C. Nadie puede despertarlo, así que duerme en tramos
+    planificador = Planificador(
+        lambda: ejecutar_analisis(historial),
+        esperar=time.sleep,
+        espera_maxima=PLANIFICADOR_ESPERA_MAXIMA,
+        al_programar=lambda proximo: print(describir_disparo(proximo))
+    )
+    try:
+        planificador.ejecutar()
+    except KeyboardInterrupt:
+        print("\nModo automático detenido.")
+
+
+# ============================================================
+# VIGILANCIA
+# ============================================================
+
+# Métricas que vigila el Vigilante y cómo se llaman en los avisos
+METRICAS_VIGILANCIA = {"cpu": "CPU", "ram": "RAM", "swap": "Swap"}
+
+
+def cargar_vigilancia():
+    config = cargar_config()
+    vig = config.get("vigilancia", {})
+
+    return {
+        "activo": vig.get("activo", False),
+        "intervalo_segundos": vig.get("intervalo_segundos", 5),
+        # Umbrales en %: disparan si se superan durante `confirmaciones` muestras seguidas
+        "cpu_umbral": vig.get("cpu_umbral", 90),
+        "ram_umbral": vig.get("ram_umbral", 90),
+        "swap_umbral": vig.get("swap_umbral", 80),
+        "confirmaciones": vig.get("confirmaciones", 2),
+        # Subidas en puntos porcentuales respecto al mínimo de la ventana
+        "cpu_subida": vig.get("cpu_subida", 50),
+        "ram_subida": vig.get("ram_subida", 15),
+        "swap_subida": vig.get("swap_subida", 10),
+        "ventana_segundos": vig.get("ventana_segundos", 60),
+        # Tiempo mínimo entre dos análisis lanzados por la vigilancia
+        "enfriamiento_minutos": vig.get("enfriamiento_minutos", 10)
+    }
+
+
+class Vigilante:
+    """
+    Vigilancia barata de alta frecuencia: cada pocos segundos lee solo CPU,
+    RAM y swap del sistema (sin recorrer procesos ni tocar el disco) y llama
+    a `disparar(motivo)` cuando se supera un umbral de forma sostenida o una
+    métrica sube de golpe dentro de la ventana. Tras un disparo no vuelve a
+    disparar hasta que pasa el enfriamiento. La política se relee en cada
+    muestra, así que los cambios de config.json se aplican sin reiniciar:
+    el hilo se arranca aunque la vigilancia esté desactivada y empieza a
+    muestrear en cuanto se activa.
+    """
+
+    def __init__(self, disparar, reloj=time.monotonic, esperar=None):
+        self.disparar = disparar
+        self.reloj = reloj
+        self._parar = threading.Event()
+        self._esperar = esperar or self._parar.wait
+        self._hilo = None
+
+        self._ultimo_disparo = None
+        self._reiniciar()
+
+    def _reiniciar(self):
+        # Al (re)activarse no cuentan las muestras de antes: la CPU se mide desde ahora
+        self._tiempos_cpu = psutil.cpu_times()
+        self._seguidas = dict.fromkeys(METRICAS_VIGILANCIA, 0)
+        self._ventanas = {}
+
+    def muestrear(self):
+        actual = psutil.cpu_times()
+        cpu = _porcentaje_cpu(self._tiempos_cpu, actual)
+        self._tiempos_cpu = actual
+        return {
+            "cpu": cpu,
+            "ram": psutil.virtual_memory().percent,
+            "swap": psutil.swap_memory().percent
+        }
 
-        if prog["activo"]:
-            ahora = datetime.datetime.now()
-            dia = ahora.strftime("%A").lower()
+    def _ventana(self, metrica, politica):
+        # Se rehace si cambian el intervalo o la ventana en la configuración
+        capacidad = max(1, round(politica["ventana_segundos"] / politica["intervalo_segundos"]))
+        ventana = self._ventanas.get(metrica)
+        if ventana is None or ventana.capacidad != capacidad:
+            ventana = self._ventanas[metrica] = BufferCircular(capacidad)
+        return ventana
 
-            if dia in prog["dias"]:
-                h_inicio = datetime.datetime.strptime(prog["hora_inicio"], "%H:%M").time()
-                h_fin = datetime.datetime.strptime(prog["hora_fin"], "%H:%M").time()
+    def evaluar(self, muestra, politica):
+        """Devuelve los motivos para analizar que cumple `muestra` (lista vacía si ninguno)"""
+        motivos = []
+        for metrica, nombre in METRICAS_VIGILANCIA.items():
+            valor = muestra[metrica]
 
-                if h_inicio <= ahora.time() <= h_fin:
-                    ejecutar_analisis(historial)
+            umbral = politica[f"{metrica}_umbral"]
+            self._seguidas[metrica] = self._seguidas[metrica] + 1 if valor >= umbral else 0
+            if self._seguidas[metrica] >= politica["confirmaciones"]:
+                motivos.append(f"{nombre} al {valor:.0f}% (umbral {umbral}%)")
 
-        time.sleep(prog["intervalo_minutos"] * 60)
+            ventana = self._ventana(metrica, politica)
+            if len(ventana):
+                subida = valor - min(ventana.ultimos(ventana.capacidad))
+                if subida >= politica[f"{metrica}_subida"]:
+                    motivos.append(
+                        f"{nombre} sube {subida:.0f} puntos en {politica['ventana_segundos']} s"
+                    )
+            ventana.agregar(valor)
+
+        return motivos
+
+    def comprobar(self, politica=None):
+        """Toma una muestra y dispara si toca. Devuelve el motivo del disparo o None"""
+        politica = politica or cargar_vigilancia()
+        motivos = self.evaluar(self.muestrear(), politica)
+        if not motivos:
+            return None
+
+        ahora = self.reloj()
+        enfriamiento = politica["enfriamiento_minutos"] * 60
+        if self._ultimo_disparo is not None and ahora - self._ultimo_disparo < enfriamiento:
+            return None
+
+        self._ultimo_disparo = ahora
+        motivo = "; ".join(motivos)
+        self.disparar(motivo)
+        return motivo
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._reiniciar()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo and self._hilo is not threading.current_thread():
+            self._hilo.join()
+        self._hilo = None
+
+    def _bucle(self):
+        activo = True
+        while not self._parar.is_set():
+            politica = cargar_vigilancia()
+            if politica["activo"] and not activo:
+                self._reiniciar()
+            activo = politica["activo"]
+            self._esperar(max(1, politica["intervalo_segundos"]))
+            if self._parar.is_set() or not activo:
+                continue
+            try:
+                self.comprobar(politica)
+            except Exception as e:
+                print("❌ Error en la vigilancia:", e)
 
 
 # ============================================================
@@ -862,8 +4751,8 @@ def iniciar_modo_automatico(historial):
 def main():
     print("=== PRISMOV - Sistema de Monitorización ===")
 
-    # Cargar historial
-    historial = cargar_historial()
+    # Abrir historial (se lee bajo demanda, no se carga entero)
+    historial = LectorHistorial()
 
     # =============================
     # CONFIGURAR TELEGRAM SI NO EXISTE
@@ -884,6 +4773,21 @@ def main():
         else:
             print("❌ No se pudo obtener el chat_id. Telegram seguirá desactivado.")
 
+    # =============================
+    # VIGILANCIA EN SEGUNDO PLANO
+    # =============================
+    def analizar_por_pico(motivo):
+        print(f"\n⚡ {motivo}: lanzando análisis...")
+        if ejecutar_analisis(historial, bloquear=False) is None:
+            print("⏳ Ya había un análisis en curso.")
+
+    # Siempre en marcha: si está desactivada, empieza al activarla en config.json
+    Vigilante(analizar_por_pico).iniciar()
+    if cargar_vigilancia()["activo"]:
+        print("✔ Vigilancia de picos activa.")
+    else:
+        print("⏸ Vigilancia de picos desactivada: se activa desde config.json sin reiniciar.")
+
     # =============================
     # MENÚ PRINCIPAL (LOGIN NO OBLIGATORIO)
     # =============================
@@ -892,7 +4796,8 @@ def main():
         print("1) Ejecutar análisis ahora")
         print("2) Iniciar modo automático")
         print("3) Configurar programación")
-        print("4) Salir")
+        print("4) Exportar histórico a PDF")
+        print("5) Salir")
 
         opcion = input("Selecciona una opción: ")
 
@@ -911,6 +4816,18 @@ def main():
             configurar_programacion_consola()
 
         elif opcion == "4":
+            desde = input("Desde (AAAA-MM-DD): ").strip()
+            hasta = input("Hasta (AAAA-MM-DD): ").strip()
+            try:
+                datetime.datetime.strptime(desde, "%Y-%m-%d")
+                datetime.datetime.strptime(hasta, "%Y-%m-%d")
+            except ValueError:
+                print("❌ Fecha no válida.")
+                continue
+            exportar_pdf_rango_en_segundo_plano(f"{desde} 00:00:00", f"{hasta} 23:59:59")
+            print(f"✔ Exportando en segundo plano a {cargar_exportacion_pdf()['directorio']}")
+
+        elif opcion == "5":
             print("Saliendo...")
             break
 
@@ -0,0 +1,19 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def prismov(tmp_path, monkeypatch):
+    """
+    prismov recargado sobre un LOCALAPPDATA vacío: las rutas de datos y las
+    cachés del módulo se calculan al importar, así que cada prueba parte de
+    una instalación limpia.
+    """
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+    import prismov as modulo
+    return importlib.reload(modulo)
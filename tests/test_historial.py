@@ -0,0 +1,163 @@
+import datetime
+import json
+import os
+
+
+def _snapshot(prismov, momento, cpu=10.0, ram=40.0):
+    return {
+        "timestamp": momento.strftime(prismov.FORMATO_TIMESTAMP),
+        "cpu_percent": cpu,
+        "ram_percent": ram,
+        "procesos": [
+            {"pid": 100, "nombre": "python.exe", "cpu": 1.0, "ram_mb": 50.0},
+            {"pid": 200, "nombre": "chrome.exe", "cpu": 2.0, "ram_mb": 300.0},
+        ],
+    }
+
+
+def _historial_antiguo(prismov, n, inicio=datetime.datetime(2026, 1, 1, 8, 0)):
+    historial = [
+        _snapshot(prismov, inicio + datetime.timedelta(minutes=10 * i), cpu=float(i % 50))
+        for i in range(n)
+    ]
+    with open(prismov.HISTORIAL_PATH, "w", encoding="utf-8") as f:
+        json.dump(historial, f, indent=4)
+    return historial
+
+
+def test_migracion_en_bloque(prismov, monkeypatch):
+    historial = _historial_antiguo(prismov, 500)
+    monkeypatch.setattr(prismov, "HISTORIAL_SEGMENTO_MAX_BYTES", 16 * 1024)
+
+    escrituras = []
+    original = prismov._escribir_json_atomico
+    monkeypatch.setattr(prismov, "_escribir_json_atomico",
+                        lambda ruta, data: (escrituras.append(ruta), original(ruta, data)))
+
+    assert prismov.cargar_historial() == historial
+    assert len(prismov._segmentos_historial()) > 1
+    assert os.path.exists(prismov.HISTORIAL_PATH + ".migrado")
+    # Una escritura de los cubos abiertos y otra del índice, no una por snapshot
+    assert len(escrituras) <= 2
+
+    # Los agregados en bloque coinciden con los que se calculan snapshot a snapshot
+    _, por_hora = prismov.consultar_metricas("2026-01-01 00:00:00", "2026-01-05 00:00:00", nivel="hora")
+    assert sum(c["muestras"] for c in por_hora) == 500
+
+
+def test_mismo_segundo_no_se_pierde(prismov):
+    momento = datetime.datetime(2026, 3, 1, 12, 0, 0)
+    historial = [_snapshot(prismov, momento, cpu=1.0), _snapshot(prismov, momento, cpu=2.0)]
+    prismov.guardar_historial(historial)
+
+    historial.append(_snapshot(prismov, momento, cpu=3.0))
+    prismov.guardar_historial(historial)
+    assert [s["cpu_percent"] for s in prismov.cargar_historial()] == [1.0, 2.0, 3.0]
+
+    # Una instancia nueva del módulo cuenta los ya guardados desde el disco
+    prismov._ultimo_timestamp_guardado = None
+    prismov.guardar_historial(historial)
+    assert len(prismov.cargar_historial()) == 3
+
+
+def test_agregados_con_diario(prismov, monkeypatch):
+    escrituras = []
+    original = prismov._escribir_json_atomico
+    monkeypatch.setattr(prismov, "_escribir_json_atomico",
+                        lambda ruta, data: (escrituras.append(ruta), original(ruta, data)))
+
+    inicio = datetime.datetime(2026, 2, 1, 0, 0)
+    for i in range(200):
+        prismov._acumular_agregados(_snapshot(prismov, inicio + datetime.timedelta(seconds=20 * i), cpu=float(i % 100)))
+
+    # abiertos.json solo se reescribe cada AGREGADOS_DIARIO_MAX_LINEAS snapshots
+    assert escrituras.count(prismov.AGREGADOS_ABIERTOS_PATH) == 200 // prismov.AGREGADOS_DIARIO_MAX_LINEAS
+    # y su tamaño no depende de cuántas muestras lleva el día
+    tamano = os.path.getsize(prismov.AGREGADOS_ABIERTOS_PATH)
+    assert tamano < 8 * 1024
+
+    esperado = prismov._leer_agregados("dia", "2026-02-01", "2026-02-01")
+
+    # Al volver a cargar, abiertos.json más el diario dan los mismos cubos
+    prismov._agregados_abiertos = None
+    assert prismov._leer_agregados("dia", "2026-02-01", "2026-02-01") == esperado
+    assert esperado[0]["muestras"] == 200
+
+
+def test_p95_del_histograma(prismov):
+    valores = [float(v) for v in range(100)] + [99.5] * 5
+    metrica = prismov._nueva_metrica()
+    for valor in valores:
+        prismov._sumar_a_metrica(metrica, valor)
+
+    resumen = prismov._resumen_de_metrica(metrica, len(valores))
+    exacto = prismov._resumen_metrica(valores)
+    assert (resumen["min"], resumen["max"], resumen["avg"]) == (exacto["min"], exacto["max"], exacto["avg"])
+    assert abs(resumen["p95"] - exacto["p95"]) <= 1
+
+
+def test_cubos_abiertos_antiguos(prismov):
+    # abiertos.json de versiones anteriores, con las muestras en listas
+    antiguo = {"hora": {"clave": "2026-02-01 10", "n": 3, "cpu": [10, 20, 30], "ram": [50, 50, 50], "procesos": {}}}
+    with open(prismov.AGREGADOS_ABIERTOS_PATH, "w", encoding="utf-8") as f:
+        json.dump(antiguo, f)
+
+    cubo, = prismov._leer_agregados("hora", "2026-02-01 00", "2026-02-01 23")
+    assert cubo["muestras"] == 3
+    assert cubo["cpu_percent"]["avg"] == 20
+
+
+def test_retencion_como_mucho_cada_hora(prismov, monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(prismov, "aplicar_retencion", llamadas.append)
+
+    ahora = datetime.datetime(2026, 3, 1, 12, 0)
+    assert prismov.aplicar_retencion_si_toca(ahora)
+    assert not prismov.aplicar_retencion_si_toca(ahora + datetime.timedelta(minutes=59))
+
+    # La última retención se guarda con los agregados y sobrevive a un reinicio
+    prismov._agregados_abiertos = None
+    assert not prismov.aplicar_retencion_si_toca(ahora + datetime.timedelta(minutes=30))
+    assert prismov.aplicar_retencion_si_toca(ahora + datetime.timedelta(hours=1))
+    assert llamadas == [ahora, ahora + datetime.timedelta(hours=1)]
+
+
+def test_resumen_periodo_cacheado_hasta_cerrar_una_hora(prismov, monkeypatch):
+    lecturas = []
+    original = prismov._leer_agregados
+    monkeypatch.setattr(prismov, "_leer_agregados",
+                        lambda *args, **kwargs: (lecturas.append(args[0]), original(*args, **kwargs))[1])
+
+    inicio = datetime.datetime(2026, 3, 1, 9, 0)
+    for i in range(120):
+        prismov.agregar_snapshot(_snapshot(prismov, inicio + datetime.timedelta(minutes=i)))
+    ahora = inicio + datetime.timedelta(minutes=125)
+
+    assert prismov.resumen_periodo(24, ahora)["muestras"] == 120
+    # Los snapshots de la hora en curso se ven sin volver a leer los cubos cerrados
+    prismov.agregar_snapshot(_snapshot(prismov, inicio + datetime.timedelta(minutes=119, seconds=30)))
+    assert prismov.resumen_periodo(24, ahora)["muestras"] == 121
+    assert lecturas == ["hora"]
+
+    # Al cerrarse la hora se vuelven a leer
+    prismov.agregar_snapshot(_snapshot(prismov, inicio + datetime.timedelta(hours=3)))
+    assert prismov.resumen_periodo(24, ahora + datetime.timedelta(hours=1))["muestras"] == 122
+    assert lecturas == ["hora", "hora"]
+
+
+def test_primer_analisis_tras_actualizar_ve_el_historial_antiguo(prismov, monkeypatch):
+    ahora = datetime.datetime.now().replace(microsecond=0)
+    _historial_antiguo(prismov, 30, inicio=ahora - datetime.timedelta(hours=6))
+    monkeypatch.setattr(prismov, "telegram_configurado", lambda: False)
+
+    lector = prismov.LectorHistorial()
+    prismov.ejecutar_analisis(lector)
+
+    assert len(list(lector)) == 31
+    # La línea base se reconstruye con los 30 snapshots antiguos antes de sumar el nuevo
+    with open(prismov.ESTADISTICAS_PATH, "r", encoding="utf-8") as f:
+        assert json.load(f)["snapshots"] == 31
+
+    tendencias = lector.ultimo()["analisis_avanzado"]["tendencias"]
+    assert tendencias["cpu"] != "Datos insuficientes"
+    assert tendencias["ram"] != "Datos insuficientes"
@@ -0,0 +1,188 @@
+import pytest
+
+POLITICA = {
+    "digest_minutos": 60,
+    "confirmaciones_subida": 1,
+    "confirmaciones_bajada": 3,
+    "rafaga": 3,
+    "mensajes_por_minuto": 6,
+}
+
+
+class _Reloj:
+    def __init__(self, inicio=1_000_000.0):
+        self.ahora = inicio
+        self.esperas = []
+
+    def __call__(self):
+        return self.ahora
+
+    def dormir(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+
+@pytest.fixture
+def reloj():
+    return _Reloj()
+
+
+@pytest.fixture
+def enviados(prismov):
+    prismov.guardar_chat_id(42)
+    return []
+
+
+def _notificador(prismov, tmp_path, reloj, enviados):
+    return prismov.NotificadorTelegram(
+        enviar=lambda mensaje: enviados.append(mensaje) or True,
+        reloj=reloj, dormir=reloj.dormir, ruta=str(tmp_path / "notificaciones.json")
+    )
+
+
+def _evento(i, riesgo="BAJO", cpu=10.0):
+    return {
+        "timestamp": f"2026-05-01 10:{i:02d}:00", "cpu": cpu, "ram": 40.0, "riesgo": riesgo,
+        "tendencia_cpu": "Estable", "tendencia_ram": "Estable",
+    }
+
+
+def test_digest_agrupa_los_analisis(prismov, tmp_path, reloj, enviados):
+    notificador = _notificador(prismov, tmp_path, reloj, enviados)
+
+    for i in range(5):
+        notificador.procesar(_evento(i, cpu=10.0 * (i + 1)), POLITICA)
+        reloj.ahora += 60
+    assert enviados == []
+
+    reloj.ahora += POLITICA["digest_minutos"] * 60
+    notificador.procesar(None, POLITICA)
+    assert len(enviados) == 1
+    assert "5 análisis" in enviados[0]
+    assert "30.0% / 50.0%" in enviados[0]
+    assert notificador.pendientes == []
+
+
+def test_histeresis_no_avisa_si_el_riesgo_oscila(prismov, tmp_path, reloj, enviados):
+    notificador = _notificador(prismov, tmp_path, reloj, enviados)
+    politica = dict(POLITICA, digest_minutos=10_000)
+
+    notificador.procesar(_evento(0, "ALTO"), politica)
+    for i in range(1, 20):
+        notificador.procesar(_evento(i, "MEDIO" if i % 2 else "ALTO"), politica)
+    assert enviados == []
+
+    # La bajada se avisa cuando se confirma
+    for i in range(20, 23):
+        notificador.procesar(_evento(i, "MEDIO"), politica)
+    assert len(enviados) == 1
+    assert "ALTO → MEDIO" in enviados[0]
+
+
+def test_cubo_de_fichas_usa_el_reloj_del_notificador(prismov, tmp_path, reloj, enviados):
+    notificador = _notificador(prismov, tmp_path, reloj, enviados)
+
+    for i in range(5):
+        assert notificador._enviar_limitado(f"mensaje {i}", POLITICA)
+    # Ráfaga de 3 y luego una ficha cada 10 s, medidos con el reloj inyectado
+    assert reloj.esperas == [pytest.approx(10.0), pytest.approx(10.0)]
+    assert len(enviados) == 5
+
+
+class _Respuesta:
+    def __init__(self, status_code, datos):
+        self.status_code = status_code
+        self._datos = datos
+
+    def json(self):
+        return self._datos
+
+
+class _Sesion:
+    def __init__(self, respuestas):
+        self.respuestas = list(respuestas)
+        self.peticiones = []
+
+    def post(self, url, data=None, timeout=None):
+        self.peticiones.append((url, data))
+        respuesta = self.respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+
+def test_cliente_respeta_retry_after(prismov):
+    pytest.importorskip("requests")
+    esperas = []
+    cliente = prismov.ClienteTelegram(token="t", dormir=esperas.append)
+    cliente._sesion = _Sesion([
+        _Respuesta(429, {"ok": False, "parameters": {"retry_after": 7}}),
+        _Respuesta(200, {"ok": True, "result": {"message_id": 1}}),
+    ])
+
+    assert cliente.enviar_mensaje(42, "hola") == {"message_id": 1}
+    assert esperas == [7]
+    assert len(cliente._sesion.peticiones) == 2
+
+
+def test_cliente_no_espera_un_retry_after_excesivo(prismov):
+    pytest.importorskip("requests")
+    esperas = []
+    cliente = prismov.ClienteTelegram(token="t", dormir=esperas.append, espera_maxima=30.0)
+    cliente._sesion = _Sesion([_Respuesta(429, {"ok": False, "parameters": {"retry_after": 120}})])
+
+    with pytest.raises(prismov.ErrorTelegram):
+        cliente.enviar_mensaje(42, "hola")
+    assert esperas == []
+
+
+def test_cliente_reintenta_errores_de_red_y_envuelve_el_resto(prismov):
+    requests = pytest.importorskip("requests")
+    esperas = []
+    cliente = prismov.ClienteTelegram(token="t", dormir=esperas.append)
+    cliente._sesion = _Sesion([
+        requests.ConnectionError("caída"),
+        requests.exceptions.ChunkedEncodingError("cortada"),
+        _Respuesta(200, {"ok": True, "result": {"message_id": 1}}),
+    ])
+    assert cliente.enviar_mensaje(42, "hola") == {"message_id": 1}
+    assert esperas == [1.0, 2.0]
+
+    cliente._sesion = _Sesion([requests.exceptions.InvalidURL("url rara")])
+    with pytest.raises(prismov.ErrorTelegram, match="InvalidURL"):
+        cliente.enviar_mensaje(42, "hola")
+    assert len(cliente._sesion.peticiones) == 1
+
+
+def test_cambio_sin_resumen_duplicado(prismov, tmp_path, reloj, enviados):
+    notificador = _notificador(prismov, tmp_path, reloj, enviados)
+    politica = dict(POLITICA, digest_minutos=0)
+
+    notificador.procesar(_evento(0, "BAJO"), politica)
+    assert len(enviados) == 1 and "Resumen" in enviados[0]
+
+    reloj.ahora += 60
+    notificador.procesar(_evento(1, "ALTO"), politica)
+    assert len(enviados) == 2
+    assert "BAJO → ALTO" in enviados[1]
+    assert notificador.pendientes == []
+
+
+def test_cambio_no_enviado_se_reintenta(prismov, tmp_path, reloj, enviados):
+    disponible = [False]
+    notificador = prismov.NotificadorTelegram(
+        enviar=lambda mensaje: disponible[0] and (enviados.append(mensaje) or True),
+        reloj=reloj, dormir=reloj.dormir, ruta=str(tmp_path / "notificaciones.json")
+    )
+    politica = dict(POLITICA, digest_minutos=10_000)
+
+    notificador.procesar(_evento(0, "BAJO"), politica)
+    notificador.procesar(_evento(1, "ALTO"), politica)
+    assert enviados == []
+    assert notificador.riesgo_notificado == "BAJO"
+
+    disponible[0] = True
+    notificador.procesar(_evento(2, "ALTO"), politica)
+    assert len(enviados) == 1
+    assert "BAJO → ALTO" in enviados[0]
+    assert notificador.riesgo_notificado == "ALTO"
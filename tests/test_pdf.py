@@ -0,0 +1,38 @@
+import datetime
+import re
+
+import pytest
+
+from test_historial import _snapshot
+
+pytest.importorskip("reportlab")
+
+
+def _paginas(ruta):
+    with open(ruta, "rb") as f:
+        return len(re.findall(rb"/Type /Page\b", f.read()))
+
+
+def test_pdf_de_rango_con_varias_paginas(prismov, tmp_path, monkeypatch):
+    inicio = datetime.datetime(2026, 2, 1, 8, 0)
+    historial = [_snapshot(prismov, inicio + datetime.timedelta(minutes=i), cpu=float(i % 50))
+                 for i in range(120)]
+    prismov.guardar_historial(historial)
+
+    desde = historial[0]["timestamp"]
+    hasta = historial[-1]["timestamp"]
+    ruta = prismov.exportar_pdf_rango(desde, hasta, str(tmp_path / "pdf" / "rango.pdf"))
+    paginas = _paginas(ruta)
+    assert paginas > 1
+
+    # Maquetar por tramos da el mismo documento que pasarle a reportlab la lista entera
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    def construir_de_una_vez(ruta, titulo, flowables):
+        SimpleDocTemplate(ruta, pagesize=A4).build(list(flowables))
+        return ruta
+
+    monkeypatch.setattr(prismov, "_construir_pdf", construir_de_una_vez)
+    referencia = prismov.exportar_pdf_rango(desde, hasta, str(tmp_path / "referencia.pdf"))
+    assert paginas == _paginas(referencia)
@@ -0,0 +1,185 @@
+import datetime
+
+import pytest
+
+
+def _prog(dias=("todos",), inicio="00:00", fin="23:59", intervalo=60, activo=True):
+    return {"activo": activo, "dias": list(dias), "hora_inicio": inicio,
+            "hora_fin": fin, "intervalo_minutos": intervalo}
+
+
+def _disparos(prismov, prog, desde, hasta):
+    disparos = []
+    proximo = prismov.proximo_disparo(prog, desde)
+    while proximo is not None and proximo < hasta:
+        disparos.append(proximo)
+        proximo = prismov.proximo_disparo(prog, proximo)
+    return disparos
+
+
+def test_dias_explicitos(prismov):
+    desde = datetime.datetime(2026, 6, 1, 12, 0)  # lunes
+    assert prismov.proximo_disparo(_prog(dias=[]), desde) is None
+    with pytest.raises(ValueError, match="lunnes"):
+        prismov.proximo_disparo(_prog(dias=["martes", "lunnes"]), desde)
+    assert prismov.proximo_disparo(_prog(), desde) == datetime.datetime(2026, 6, 1, 13, 0)
+    assert prismov.proximo_disparo(_prog(dias=["Miércoles"]), desde) == datetime.datetime(2026, 6, 3, 0, 0)
+
+
+@pytest.mark.parametrize("dia", [datetime.date(2026, 3, 29), datetime.date(2026, 10, 25)])
+def test_cambio_de_hora(prismov, dia):
+    # Último domingo de marzo y de octubre: los disparos siguen la hora de pared
+    inicio = datetime.datetime.combine(dia, datetime.time(0, 0))
+    disparos = _disparos(prismov, _prog(intervalo=30), inicio - datetime.timedelta(minutes=1),
+                         inicio + datetime.timedelta(days=1))
+    assert len(disparos) == 48
+    assert [d.time() for d in disparos[4:8]] == [
+        datetime.time(2, 0), datetime.time(2, 30), datetime.time(3, 0), datetime.time(3, 30)
+    ]
+
+
+def test_cambio_de_mes_y_de_año(prismov):
+    prog = _prog(inicio="08:00", fin="18:00")
+    assert prismov.proximo_disparo(prog, datetime.datetime(2026, 1, 31, 19, 0)) == \
+        datetime.datetime(2026, 2, 1, 8, 0)
+    assert prismov.proximo_disparo(prog, datetime.datetime(2026, 12, 31, 18, 30)) == \
+        datetime.datetime(2027, 1, 1, 8, 0)
+
+    # Ventana que cruza la medianoche el último día del mes
+    nocturna = _prog(dias=["jueves"], inicio="22:00", fin="02:00")
+    assert prismov.proximo_disparo(nocturna, datetime.datetime(2026, 4, 30, 23, 10)) == \
+        datetime.datetime(2026, 5, 1, 0, 0)
+    assert prismov.proximo_disparo(nocturna, datetime.datetime(2026, 5, 1, 2, 0)) == \
+        datetime.datetime(2026, 5, 7, 22, 0)
+
+
+class _Reloj:
+    def __init__(self, inicio):
+        self.ahora = inicio
+
+    def __call__(self):
+        return self.ahora
+
+    def esperar(self, segundos):
+        self.ahora += datetime.timedelta(seconds=segundos)
+
+
+def _planificar(prismov, reloj, duraciones, esperar=None):
+    """Ejecuta el planificador hasta agotar `duraciones` y devuelve cuándo empezó cada tarea"""
+    ejecuciones = []
+    pendientes = list(duraciones)
+
+    def tarea():
+        ejecuciones.append(reloj.ahora)
+        reloj.ahora += datetime.timedelta(minutes=pendientes.pop(0))
+        if not pendientes:
+            planificador.detener()
+
+    planificador = prismov.Planificador(tarea, reloj=reloj, esperar=esperar or reloj.esperar)
+    planificador.ejecutar()
+    return ejecuciones
+
+
+def test_sin_deriva(prismov):
+    prismov.guardar_programacion(_prog(inicio="08:00", fin="20:00", intervalo=15))
+    reloj = _Reloj(datetime.datetime(2026, 6, 1, 7, 59, 30))
+
+    # Tareas de 7 minutos: los disparos siguen alineados a 08:00 + k * 15 min
+    ejecuciones = _planificar(prismov, reloj, [7] * 6)
+    assert ejecuciones == [datetime.datetime(2026, 6, 1, 8, 15 * k) for k in range(4)] + [
+        datetime.datetime(2026, 6, 1, 9, 0), datetime.datetime(2026, 6, 1, 9, 15)
+    ]
+
+
+def test_tarea_larga_no_encadena_disparos(prismov):
+    prismov.guardar_programacion(_prog(inicio="08:00", fin="20:00", intervalo=15))
+    reloj = _Reloj(datetime.datetime(2026, 6, 1, 7, 59))
+
+    # La primera tarea dura 40 minutos: 08:15 y 08:30 no se ejecutan al terminar
+    ejecuciones = _planificar(prismov, reloj, [40, 1, 1])
+    assert ejecuciones == [
+        datetime.datetime(2026, 6, 1, 8, 0),
+        datetime.datetime(2026, 6, 1, 8, 45),
+        datetime.datetime(2026, 6, 1, 9, 0),
+    ]
+
+
+def test_suspension_ejecuta_una_sola_vez(prismov):
+    prismov.guardar_programacion(_prog(inicio="08:00", fin="20:00", intervalo=15))
+    reloj = _Reloj(datetime.datetime(2026, 6, 1, 7, 59, 30))
+    suspendido = []
+
+    def esperar(segundos):
+        # El equipo se suspende dos horas durante la primera espera
+        if not suspendido:
+            suspendido.append(True)
+            reloj.ahora += datetime.timedelta(hours=2)
+        else:
+            reloj.esperar(segundos)
+
+    ejecuciones = _planificar(prismov, reloj, [0, 0], esperar=esperar)
+    assert ejecuciones == [
+        datetime.datetime(2026, 6, 1, 9, 59, 30),
+        datetime.datetime(2026, 6, 1, 10, 0),
+    ]
+
+
+def test_espera_de_una_vez_hasta_el_disparo(prismov):
+    prismov.guardar_programacion(_prog(inicio="08:00", fin="20:00", intervalo=15))
+    reloj = _Reloj(datetime.datetime(2026, 6, 1, 6, 0))
+    esperas = []
+
+    def esperar(segundos):
+        esperas.append(segundos)
+        reloj.esperar(segundos)
+
+    assert _planificar(prismov, reloj, [0], esperar=esperar) == [datetime.datetime(2026, 6, 1, 8, 0)]
+    assert esperas == [2 * 3600]
+
+
+def test_guardar_programacion_despierta_al_planificador(prismov):
+    import threading
+
+    prismov.guardar_programacion(_prog(activo=False))
+    anunciados = []
+    avisado = threading.Event()
+
+    def al_programar(proximo):
+        anunciados.append(proximo)
+        avisado.set()
+
+    planificador = prismov.Planificador(lambda: None, al_programar=al_programar)
+    planificador.iniciar()
+    try:
+        assert avisado.wait(5)
+        avisado.clear()
+        # Sin disparos espera sin límite: solo el aviso le hace recalcular
+        prismov.guardar_programacion(_prog(inicio="00:00", fin="23:59", intervalo=1440))
+        assert avisado.wait(5)
+    finally:
+        planificador.detener()
+    assert anunciados[0] is None and anunciados[1] is not None
+
+
+def test_planificador_avisa_de_dias_desconocidos(prismov, capsys):
+    prismov.guardar_programacion(_prog(dias=["lunes", "marte"]))
+    anunciados = []
+
+    def esperar(segundos):
+        planificador.detener()
+
+    planificador = prismov.Planificador(lambda: None, esperar=esperar, al_programar=anunciados.append)
+    planificador.ejecutar()
+    assert "días no reconocidos: marte" in capsys.readouterr().out
+    assert anunciados == [None]
+
+
+def test_consola_rechaza_dias_desconocidos(prismov, monkeypatch, capsys):
+    respuestas = iter(["lunes, lunnes", "", "Lunes, todos", "08:00", "18:00", "30"])
+    monkeypatch.setattr("builtins.input", lambda mensaje="": next(respuestas))
+
+    prismov.configurar_programacion_consola()
+    salida = capsys.readouterr().out
+    assert "Días no reconocidos: lunnes" in salida
+    assert "al menos un día" in salida
+    assert prismov.cargar_programacion()["dias"] == [prismov.DIAS_TODOS]
@@ -0,0 +1,117 @@
+import os
+
+import psutil
+
+
+class _ProcesoTerminado:
+    """Objeto psutil.Process de un proceso que ya no existe con ese pid"""
+
+    def is_running(self):
+        return False
+
+
+def test_pid_reutilizado_se_da_de_alta_de_nuevo(prismov):
+    registro = prismov.RegistroProcesos()
+    pid = os.getpid()
+
+    # Entrada de un proceso anterior con el mismo pid y menos tiempo de CPU
+    # acumulado que el actual: antes solo se detectaba si el tiempo bajaba
+    registro._entradas[pid] = {
+        "proceso": _ProcesoTerminado(),
+        "create_time": 1.0,
+        "nombre": "anterior.exe",
+        "cpu_total": 0.0,
+        "momento": 0.0,
+        "denegado": False
+    }
+
+    propio = next(p for p in registro.recorrer() if p["pid"] == pid)
+    actual = psutil.Process(pid)
+    assert propio["nombre"] == actual.name()
+    assert propio["create_time"] == actual.create_time()
+
+
+def test_pid_reutilizado_tras_acceso_denegado(prismov):
+    registro = prismov.RegistroProcesos()
+    pid = os.getpid()
+    registro._entradas[pid] = {"proceso": _ProcesoTerminado(), "denegado": True}
+
+    assert any(p["pid"] == pid for p in registro.recorrer())
+
+
+def test_mismo_proceso_conserva_su_entrada(prismov):
+    registro = prismov.RegistroProcesos()
+    registro.recorrer()
+    entrada = registro._entradas[os.getpid()]
+    registro.recorrer()
+    assert registro._entradas[os.getpid()] is entrada
+
+
+def _proc(pid, nombre, ram_mb, create_time=None, cpu=0.0):
+    proceso = {"pid": pid, "nombre": nombre, "cpu": cpu, "ram_mb": ram_mb}
+    if create_time is not None:
+        proceso["create_time"] = create_time
+    return proceso
+
+
+def test_diferencias_por_pid_y_create_time(prismov):
+    anteriores = [
+        _proc(10, "chrome.exe", 100.0, 1.0),
+        _proc(11, "chrome.exe", 200.0, 1.0),
+        _proc(12, "viejo.exe", 50.0, 1.0),
+    ]
+    actuales = [
+        _proc(10, "chrome.exe", 100.0, 1.0),
+        _proc(11, "chrome.exe", 260.0, 1.0),
+        # Mismo pid y nombre, pero es otro proceso: el anterior terminó
+        _proc(12, "viejo.exe", 50.0, 2.0),
+    ]
+
+    diferencias = prismov.diferenciar_procesos(anteriores, actuales)
+    cambio, = diferencias["cambiados"]
+    assert (cambio["pid"], cambio["delta"]["ram_mb"]) == (11, 60.0)
+    assert [p["create_time"] for p in diferencias["iniciados"]] == [2.0]
+    assert [p["create_time"] for p in diferencias["terminados"]] == [1.0]
+
+
+def test_diferencias_de_filas_sin_create_time(prismov):
+    # Snapshots antiguos: se compara por (pid, nombre)
+    anteriores = [_proc(10, "chrome.exe", 100.0), _proc(12, "viejo.exe", 50.0)]
+    actuales = [_proc(10, "chrome.exe", 150.0, 1.0), _proc(12, "nuevo.exe", 50.0, 1.0)]
+
+    diferencias = prismov.diferenciar_procesos(anteriores, actuales)
+    assert [c["nombre"] for c in diferencias["cambiados"]] == ["chrome.exe"]
+    assert [p["nombre"] for p in diferencias["iniciados"]] == ["nuevo.exe"]
+    assert [p["nombre"] for p in diferencias["terminados"]] == ["viejo.exe"]
+
+
+def test_diferencias_por_nombre(prismov):
+    anteriores = [_proc(10, "chrome.exe", 100.0, 1.0), _proc(11, "chrome.exe", 200.0, 1.0)]
+    actuales = [_proc(10, "chrome.exe", 100.0, 1.0)]
+
+    cambio, = prismov.diferenciar_procesos(anteriores, actuales, por_nombre=True)["cambiados"]
+    assert cambio["nombre"] == "chrome.exe"
+    assert cambio["delta"]["ram_mb"] == -200.0
+    assert cambio["delta"]["instancias"] == -1
+
+
+def test_comparacion_parcial_con_el_top_k(prismov):
+    # Sin la tabla completa anterior solo se tiene el top-K guardado: los
+    # procesos que no estaban en él no se dan por iniciados ni terminados
+    historial = [{"cpu_percent": 10.0, "ram_percent": 40.0,
+                  "procesos": [_proc(10, "chrome.exe", 100.0, 1.0), _proc(12, "viejo.exe", 90.0, 1.0)]}]
+    snapshot = {"cpu_percent": 10.0, "ram_percent": 40.0,
+                "procesos": [_proc(10, "chrome.exe", 400.0, 1.0), _proc(13, "pequeño.exe", 5.0, 1.0)]}
+
+    analisis = prismov.analisis_avanzado(snapshot, historial)
+    cambios = analisis["cambios_procesos"]
+    assert cambios["parcial"]
+    assert (cambios["iniciados"], cambios["terminados"], cambios["cambiados"]) == (0, 0, 1)
+    assert cambios["mayores_cambios_por_nombre"] == []
+    assert analisis["procesos_nuevos"] == []
+    assert [p["pid"] for p in analisis["tendencias"]["procesos_crecientes"]] == [10]
+
+    completo = prismov.analisis_avanzado(snapshot, historial, procesos_anteriores=historial[0]["procesos"])
+    assert not completo["cambios_procesos"]["parcial"]
+    assert (completo["cambios_procesos"]["iniciados"], completo["cambios_procesos"]["terminados"]) == (1, 1)
+    assert completo["procesos_nuevos"] == ["pequeño.exe"]
@@ -0,0 +1,159 @@
+import gzip
+import os
+
+
+def _snapshot(timestamp, riesgo="BAJO"):
+    return {
+        "timestamp": timestamp,
+        "cpu_percent": 12.0,
+        "ram_percent": 45.0,
+        "procesos": [],
+        "otros_procesos": {"cantidad": 0},
+        "analisis_avanzado": {
+            "tendencias": {"cpu": "Estable", "ram": "Estable", "procesos_crecientes": []},
+            "sospechosos_persistentes": [
+                {"nombre": "<raro>.exe", "ram_mb": 900.0, "cpu": 3.0, "razon": "Alto consumo de RAM"}
+            ],
+            "huella_del_sistema": {"cpu_promedio": 10.0, "ram_promedio": 40.0, "procesos_frecuentes": []},
+            "score_detallado": {"riesgo_sistema": riesgo},
+            "recomendaciones": []
+        }
+    }
+
+
+def _nombre(timestamp):
+    return "reporte_" + timestamp.replace(":", "-").replace(" ", "_") + ".html"
+
+
+def _escribir_reporte(prismov, directorio, timestamp, riesgo, comprimido=False):
+    contenido = prismov.generar_reporte_html(_snapshot(timestamp, riesgo))
+    if comprimido:
+        carpeta = os.path.join(directorio, "archivo", timestamp[:7])
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, _nombre(timestamp) + ".gz")
+        with gzip.open(ruta, "wt", encoding="utf-8") as f:
+            f.write(contenido)
+    else:
+        ruta = os.path.join(directorio, _nombre(timestamp))
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write(contenido)
+    return ruta
+
+
+def test_catalogo_se_reconstruye_desde_los_reportes(prismov, tmp_path):
+    directorio = str(tmp_path / "reportes")
+    os.makedirs(directorio)
+    _escribir_reporte(prismov, directorio, "2026-01-15 08:00:00", "ALTO", comprimido=True)
+    _escribir_reporte(prismov, directorio, "2026-02-01 10:00:00", "MEDIO")
+    _escribir_reporte(prismov, directorio, "2026-02-01 11:00:00", "BAJO")
+    with open(os.path.join(directorio, "notas.html"), "w") as f:
+        f.write("<div class=\"risk-value\">ALTO</div>")
+
+    ruta_catalogo = os.path.join(directorio, "catalogo.jsonl")
+    catalogo = prismov.CatalogoReportes(ruta_catalogo, directorio)
+
+    assert [(e["timestamp"], e["riesgo"]) for e in catalogo.rango()] == [
+        ("2026-01-15 08:00:00", "ALTO"),
+        ("2026-02-01 10:00:00", "MEDIO"),
+        ("2026-02-01 11:00:00", "BAJO"),
+    ]
+    assert catalogo.ultimo("ALTO")["ruta"] == os.path.join("archivo", "2026-01", _nombre("2026-01-15 08:00:00") + ".gz")
+    assert os.path.exists(catalogo.ruta_absoluta(catalogo.ultimo()))
+
+    # La siguiente instancia lee el catálogo guardado en lugar de recorrer el directorio
+    assert prismov.CatalogoReportes(ruta_catalogo, directorio).rango() == catalogo.rango()
+
+
+def test_catalogo_consultas_por_fecha(prismov, tmp_path):
+    directorio = str(tmp_path)
+    catalogo = prismov.CatalogoReportes(os.path.join(directorio, "catalogo.jsonl"), directorio)
+    for timestamp, riesgo in [("2026-03-02 09:00:00", "ALTO"), ("2026-03-01 09:00:00", "BAJO"),
+                              ("2026-03-03 09:00:00", "BAJO"), ("2026-03-01 18:00:00", "MEDIO")]:
+        catalogo.registrar(os.path.join(directorio, _nombre(timestamp)), timestamp, riesgo, tamano=100)
+
+    marcas = [e["timestamp"] for e in catalogo.rango("2026-03-01 12:00:00", "2026-03-03 09:00:00")]
+    assert marcas == ["2026-03-01 18:00:00", "2026-03-02 09:00:00", "2026-03-03 09:00:00"]
+    assert [e["timestamp"] for e in catalogo.rango(riesgo="BAJO")] == ["2026-03-01 09:00:00", "2026-03-03 09:00:00"]
+    assert catalogo.buscar("2026-03-02 23:59:59")["timestamp"] == "2026-03-02 09:00:00"
+    assert catalogo.buscar("2026-02-28 00:00:00") is None
+    assert catalogo.ultimo("BAJO")["timestamp"] == "2026-03-03 09:00:00"
+
+    # Dos análisis en el mismo segundo escriben el mismo archivo: queda una sola entrada
+    catalogo.registrar(os.path.join(directorio, _nombre("2026-03-03 09:00:00")), "2026-03-03 09:00:00", "ALTO", tamano=100)
+    assert len(catalogo) == 4
+    assert catalogo.ultimo("BAJO")["timestamp"] == "2026-03-01 09:00:00"
+    assert catalogo.ultimo()["riesgo"] == "ALTO"
+
+
+def _politica(prismov, **valores):
+    config = prismov.cargar_config()
+    config["retencion_reportes"] = valores
+    prismov.guardar_config(config)
+
+
+def _guardar_reportes(prismov, timestamps):
+    return {t: prismov.guardar_reporte(_snapshot(t)) for t in timestamps}
+
+
+def test_retencion_comprime_archiva_y_borra(prismov):
+    import datetime
+
+    timestamps = ["2026-01-10 08:00:00", "2026-02-20 08:00:00", "2026-03-05 08:00:00",
+                  "2026-03-10 08:00:00", "2026-03-11 08:00:00"]
+    rutas = _guardar_reportes(prismov, timestamps)
+    with open(rutas["2026-02-20 08:00:00"], encoding="utf-8") as f:
+        original = f.read()
+    # Uno borrado a mano: su entrada desaparece del catálogo sin error
+    os.remove(rutas["2026-03-05 08:00:00"])
+
+    _politica(prismov, recientes=2, max_dias=60, max_mb=None)
+    prismov.aplicar_retencion_reportes(ahora=datetime.datetime(2026, 3, 12))
+
+    # Los más antiguos que max_dias se borran
+    assert not os.path.exists(rutas["2026-01-10 08:00:00"])
+    # Los dos más recientes se quedan sin comprimir donde estaban
+    for t in timestamps[-2:]:
+        assert os.path.exists(rutas[t])
+    # El resto va comprimido a archivo/AAAA-MM
+    archivado = os.path.join(prismov.ARCHIVO_REPORTES_DIR, "2026-02", os.path.basename(rutas["2026-02-20 08:00:00"]) + ".gz")
+    assert not os.path.exists(rutas["2026-02-20 08:00:00"])
+    with gzip.open(archivado, "rt", encoding="utf-8") as f:
+        assert f.read() == original
+
+    # El catálogo, en memoria y en disco, apunta a lo que queda
+    catalogo = prismov.obtener_catalogo_reportes()
+    esperado = [("2026-02-20 08:00:00", archivado)] + [(t, rutas[t]) for t in timestamps[-2:]]
+    assert [(e["timestamp"], catalogo.ruta_absoluta(e)) for e in catalogo.rango()] == esperado
+    assert catalogo.rango()[0]["bytes"] == os.path.getsize(archivado)
+    recargado = prismov.CatalogoReportes()
+    assert recargado.rango() == catalogo.rango()
+
+
+def test_retencion_por_espacio_conserva_el_ultimo(prismov):
+    import datetime
+
+    timestamps = [f"2026-04-0{d} 08:00:00" for d in range(1, 6)]
+    rutas = _guardar_reportes(prismov, timestamps)
+
+    # Presupuesto en el que solo cabe un reporte comprimido: se borran desde el más antiguo
+    _politica(prismov, recientes=1, max_dias=None, max_mb=1e-6)
+    prismov.aplicar_retencion_reportes(ahora=datetime.datetime(2026, 4, 6))
+
+    catalogo = prismov.obtener_catalogo_reportes()
+    assert [e["timestamp"] for e in catalogo.rango()] == [timestamps[-1]]
+    assert os.path.exists(rutas[timestamps[-1]])
+    # Las carpetas de archivo que quedan vacías se eliminan
+    assert not os.path.exists(prismov.ARCHIVO_REPORTES_DIR) or not os.listdir(prismov.ARCHIVO_REPORTES_DIR)
+
+
+def test_modo_de_reporte_individual_por_defecto(prismov):
+    assert prismov.cargar_reportes() == {"modo": "individual"}
+
+    config = prismov.cargar_config()
+    config["reportes"] = {"modo": "dashboard"}
+    prismov.guardar_config(config)
+    assert prismov.cargar_reportes() == {"modo": "dashboard"}
+
+    config["reportes"] = {"modo": "desconocido"}
+    prismov.guardar_config(config)
+    assert prismov.cargar_reportes() == {"modo": "individual"}
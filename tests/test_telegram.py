@@ -0,0 +1,78 @@
+import json
+
+
+class _Sesion:
+    def __init__(self):
+        self.peticiones = []
+
+    def post(self, url, data=None, timeout=None):
+        self.peticiones.append((url, data, timeout))
+        return _Respuesta()
+
+
+class _Respuesta:
+    status_code = 200
+
+    def json(self):
+        return {"ok": True, "result": []}
+
+
+def test_long_polling_alarga_el_timeout_de_lectura(prismov):
+    cliente = prismov.ClienteTelegram(token="t", timeout=(5, 15))
+    cliente._sesion = _Sesion()
+
+    assert cliente.obtener_actualizaciones(offset=8, espera=30, tipos=["message"]) == []
+    url, datos, timeout = cliente._sesion.peticiones[0]
+    assert url.endswith("/bott/getUpdates")
+    assert datos == {"timeout": 30, "offset": 8, "allowed_updates": json.dumps(["message"])}
+    assert timeout == (5, 45)
+
+
+class _ClienteActualizaciones:
+    def __init__(self, lotes):
+        self.lotes = list(lotes)
+        self.offsets = []
+        self.esperas = []
+
+    def obtener_actualizaciones(self, offset=None, espera=0, tipos=None):
+        self.offsets.append(offset)
+        self.esperas.append(espera)
+        return self.lotes.pop(0) if self.lotes else []
+
+
+def _actualizacion(update_id, texto, chat_id=42):
+    return {"update_id": update_id, "message": {"text": texto, "chat": {"id": chat_id}}}
+
+
+def test_offset_de_actualizaciones_se_guarda(prismov, monkeypatch):
+    cliente = _ClienteActualizaciones([[_actualizacion(5, "hola"), _actualizacion(7, "adiós")], []])
+    monkeypatch.setattr(prismov, "_cliente_telegram", cliente)
+
+    assert len(prismov.consumir_actualizaciones()) == 2
+    assert prismov.cargar_config()["telegram_offset"] == 8
+    assert prismov.consumir_actualizaciones() == []
+    assert cliente.offsets == [None, 8]
+    assert prismov.cargar_config()["telegram_offset"] == 8
+
+
+def test_codigo_de_vinculacion_aunque_no_sea_el_ultimo(prismov, monkeypatch):
+    codigo = prismov.cargar_codigo_vinculacion()
+    cliente = _ClienteActualizaciones([[
+        _actualizacion(1, f"mi código es {codigo.lower()}", chat_id=99),
+        _actualizacion(2, "otro mensaje", chat_id=7),
+    ]])
+    monkeypatch.setattr(prismov, "_cliente_telegram", cliente)
+
+    assert prismov.obtener_chat_id_y_validar_codigo(espera=0) == (99, True)
+    assert prismov.cargar_config()["telegram_offset"] == 3
+
+
+def test_vinculacion_sigue_esperando_hasta_que_llega_el_codigo(prismov, monkeypatch):
+    codigo = prismov.cargar_codigo_vinculacion()
+    cliente = _ClienteActualizaciones([[], [_actualizacion(4, codigo, chat_id=99)]])
+    monkeypatch.setattr(prismov, "_cliente_telegram", cliente)
+
+    assert prismov.obtener_chat_id_y_validar_codigo(espera=60) == (99, True)
+    # Cada consulta es un long poll con lo que queda de la espera total
+    assert len(cliente.esperas) == 2
+    assert all(50 <= espera <= 60 for espera in cliente.esperas)
@@ -0,0 +1,26 @@
+def _guardar_vigilancia(prismov, **valores):
+    config = prismov.cargar_config()
+    config["vigilancia"] = valores
+    prismov.guardar_config(config)
+
+
+def test_vigilancia_se_activa_sin_reiniciar(prismov):
+    _guardar_vigilancia(prismov, activo=False, cpu_umbral=0, confirmaciones=1)
+    esperas = []
+    motivos = []
+
+    def esperar(segundos):
+        esperas.append(segundos)
+        if len(esperas) == 3:
+            _guardar_vigilancia(prismov, activo=True, cpu_umbral=0, confirmaciones=1)
+
+    def disparar(motivo):
+        motivos.append(motivo)
+        vigilante.detener()
+
+    vigilante = prismov.Vigilante(disparar, esperar=esperar)
+    vigilante._bucle()
+
+    # Mientras estaba desactivada no muestreó; al activarla dispara en la siguiente vuelta
+    assert len(esperas) == 4
+    assert len(motivos) == 1 and "CPU" in motivos[0]